@@ -1,4 +1,5 @@
 import pickle
+from types import MappingProxyType
 import numpy as np
 from shapely.geometry import Polygon, MultiPolygon, Point, MultiPoint
 from shapely.affinity import scale
@@ -161,6 +162,9 @@ class Annotation:
     def get_cont_as_mask(self, cont_name):
         """Transforms contour to binarized mask
         
+        Note:
+            Masks are rasterized once per session (see LazyLuna.utils.to_mask_cached)
+        
         Args:
             cont_name (str): contour name
             
@@ -170,7 +174,7 @@ class Annotation:
         if not self.has_contour(cont_name): return np.zeros((self.h, self.w))
         mp = self.get_contour(cont_name)
         if not mp.geom_type=='MultiPolygon': mp = MultiPolygon([mp])
-        return utils.to_mask(mp, self.h, self.w)
+        return utils.to_mask_cached(mp, self.h, self.w, self.sop, cont_name)
     
     def get_image_size(self):
         """Returns the image height and width of the referenced dicom image
@@ -263,19 +267,7 @@ class Annotation:
         h, w = self.h, self.w
         if not self.has_contour('lv_endo'): return np.ones((h,w))*np.nan
         p = self.get_contour('lv_endo').centroid
-        x,y = p.x, p.y
-        mask = np.zeros((self.h,self.w,3))
-        for i in range(h): mask[i,:,0] = i
-        for j in range(w): mask[:,j,1] = j
-        mask[:,:,0] -= y
-        mask[:,:,1] -= x
-        mask[:,:,2]  = np.sqrt(mask[:,:,0]**2+mask[:,:,1]**2) + 10**-9
-        angle_img = np.zeros((h,w))
-        angle_img[:int(y),int(x):] = np.arccos(mask[:int(y),int(x):,1] / mask[:int(y),int(x):,2]) * 180/np.pi
-        angle_img[:int(y),:int(x)] = np.arcsin(np.abs(mask[:int(y),:int(x),1]) / mask[:int(y),:int(x),2]) * 180/np.pi +90
-        angle_img[int(y):,:int(x)] = np.arccos(np.abs(mask[int(y):,:int(x),1]) / mask[int(y):,:int(x),2]) * 180/np.pi + 180
-        angle_img[int(y):,int(x):] = np.arcsin(mask[int(y):,int(x):,1] / mask[int(y):,int(x):,2]) * 180/np.pi + 270
-        return angle_img
+        return utils.angles_to_point(np.arange(h)[:,None], np.arange(w)[None,:], p.x, p.y)
 
     def get_angle_mask_to_middle_point_by_reference_point(self, refpoint=None):
         """Returns angle mask according to lv endocardial centroid, rotated by the sax reference point
@@ -312,6 +304,44 @@ class Annotation:
         angle = np.arccos(np.clip(np.dot(v1_u, v2_u), -1.0, 1.0))*180/np.pi
         return angle
 
+    def get_myo_segment_labels(self, nr_bins=6, refpoint=None):
+        """Returns segment labels of lv_myo pixels, segments are angle bins around the lv endocardial centroid rotated by the reference point
+        
+        Note:
+            Segment i contains the pixels with angles in [i*360/nr_bins, (i+1)*360/nr_bins) (see get_myo_mask_by_angles).
+            Angles are calculated for lv_myo pixels only.
+        
+        Args:
+            nr_bins (int): number of bins into which the lv_myo is divided
+            refpoint (float): (optional) only if sax_ref is provided by another reader
+        
+        Returns:
+            ndarray (2D array of int): segment label per pixel, -1 outside lv_myo or without lv_endo / reference point
+        """
+        labels     = np.full((self.h, self.w), -1, dtype=np.intp)
+        rows, cols = np.nonzero(self.get_cont_as_mask('lv_myo'))
+        if len(rows)==0 or not self.has_contour('lv_endo'): return labels
+        p      = self.get_contour('lv_endo').centroid
+        angles = (utils.angles_to_point(rows, cols, p.x, p.y) - self.get_reference_angle(refpoint)) % 360
+        bins   = [i*360/nr_bins for i in range(0, nr_bins+1)]
+        segs   = np.searchsorted(bins, angles, side='right') - 1
+        inside = segs < nr_bins # excludes np.nan angles
+        labels[rows[inside], cols[inside]] = segs[inside]
+        return labels
+
+    def get_myo_segment_stats(self, img, nr_bins=6, refpoint=None):
+        """Returns mean, standard deviation and number of lv_myo pixel values per angle bin (see get_myo_segment_labels)
+        
+        Args:
+            img (ndarray 2D array of floats): image from which pixels are extracted
+            nr_bins (int): number of bins into which the lv_myo is divided
+            refpoint (float): (optional) only if sax_ref is provided by another reader
+        
+        Returns:
+            (ndarray, ndarray, ndarray): means, stds and counts per bin
+        """
+        return utils.segment_stats(img, self.get_myo_segment_labels(nr_bins, refpoint), nr_bins)
+
     def get_myo_mask_by_angles(self, img, nr_bins=6, refpoint=None):
         """Returns dict of angle tuples to list of values inside lv_myo contour and angle limits 
         
@@ -326,13 +356,29 @@ class Annotation:
         Returns:
             dict of (float, float): array of floats
         """
-        h, w       = img.shape
-        myo_mask   = self.get_cont_as_mask('lv_myo')
-        angle_mask = self.get_angle_mask_to_middle_point_by_reference_point(refpoint)
-        bins       = [i*360/nr_bins for i in range(0, nr_bins+1)]
-        bin_dict   = dict()
-        for i in range(nr_bins):
-            low, high = bins[i], bins[i+1]
-            vals = img[(low<=angle_mask) & (angle_mask<high) & (myo_mask!=0)]
-            bin_dict[(low, high)] = vals
-        return bin_dict
+        labels = self.get_myo_segment_labels(nr_bins, refpoint)
+        bins   = [i*360/nr_bins for i in range(0, nr_bins+1)]
+        inside = labels>=0
+        vals, segs = img[inside], labels[inside]
+        vals   = np.split(vals[np.argsort(segs, kind='stable')], np.cumsum(np.bincount(segs, minlength=nr_bins))[:-1])
+        return {(bins[i], bins[i+1]): vals[i] for i in range(nr_bins)}
+
+
+class Empty_Annotation(Annotation):
+    """Empty_Annotation is an immutable Annotation without contours or points
+
+    A single instance (EMPTY_ANNOTATION) is shared for all images without an annotation file.
+    """
+    def __init__(self):
+        super().__init__(None)
+        self.anno    = MappingProxyType(dict())
+        self._frozen = True
+
+    def __setattr__(self, key, value):
+        if getattr(self, '_frozen', False): raise AttributeError('Empty_Annotation is immutable')
+        super().__setattr__(key, value)
+
+    def __reduce__(self):
+        return (Empty_Annotation, ())
+
+EMPTY_ANNOTATION = Empty_Annotation()
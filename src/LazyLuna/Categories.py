@@ -4,11 +4,12 @@
 
 from operator import itemgetter
 import numpy as np
-import pydicom
-from time import time
+from LazyLuna.profiling import span
 import traceback
 
 from LazyLuna.Annotation import Annotation
+from LazyLuna.header_index import image_geometry
+from LazyLuna import geometry
 from LazyLuna import utils
 
 
@@ -24,59 +25,66 @@ class SAX_slice_phase_Category:
 
     # try a sort function as in dcmlabeling_1_tab
     def get_sop2depthandtime(self, sop2filepath, debug=False):
-        if debug: st = time()
-        if hasattr(self.case, 'categories'):
-            for c in self.case.categories:
-                if hasattr(c, 'sop2depthandtime'):
-                    if debug: print('calculating sop2sorting takes: ', time()-st)
-                    return c.sop2depthandtime
-        # returns dict sop --> (depth, time)
-        imgs = {k:pydicom.dcmread(sop2filepath[k], stop_before_pixels=True) for k in sop2filepath.keys()} # stop_before_pixels=TRUE?
+        with span(type(self).__name__ + '.get_sop2depthandtime', debug=debug):
+            if hasattr(self.case, 'categories'):
+                for c in self.case.categories:
+                    if hasattr(c, 'sop2depthandtime'):
+                        return c.sop2depthandtime
+            # returns dict sop --> (depth, time)
+            imgs = {k:self.case.load_header(k) for k in sop2filepath.keys()}
         
-        sortable = [[k,v.SliceLocation,v.InstanceNumber] for k,v in imgs.items()]
-        #sortable = [[k,float(v.SliceLocation),float(v.AcquisitionNumber)] for k,v in imgs.items()]
-        slice_nrs = {x:i for i,x in enumerate(sorted(list(set([x[1] for x in sortable]))))}
-        sortable = [s+[slice_nrs[s[1]]] for s in sortable]
-        sortable_by_slice = {d:[] for d in slice_nrs.values()}
-        for s in sortable: sortable_by_slice[s[-1]].append(s)
-        for d in range(len(sortable_by_slice.keys())):
-            sortable_by_slice[d] = sorted(sortable_by_slice[d], key=lambda s:s[2])
-            for p in range(len(sortable_by_slice[d])):
-                sortable_by_slice[d][p].append(p)
-        sop2depthandtime = dict()
-        for d in range(len(sortable_by_slice.keys())):
-            for s in sortable_by_slice[d]:
-                sop2depthandtime[s[0]] = (s[-2],s[-1])
+            sortable = [[k,v.SliceLocation,v.InstanceNumber] for k,v in imgs.items()]
+            #sortable = [[k,float(v.SliceLocation),float(v.AcquisitionNumber)] for k,v in imgs.items()]
+            slice_nrs = {x:i for i,x in enumerate(sorted(list(set([x[1] for x in sortable]))))}
+            sortable = [s+[slice_nrs[s[1]]] for s in sortable]
+            sortable_by_slice = {d:[] for d in slice_nrs.values()}
+            for s in sortable: sortable_by_slice[s[-1]].append(s)
+            for d in range(len(sortable_by_slice.keys())):
+                sortable_by_slice[d] = sorted(sortable_by_slice[d], key=lambda s:s[2])
+                for p in range(len(sortable_by_slice[d])):
+                    sortable_by_slice[d][p].append(p)
+            sop2depthandtime = dict()
+            for d in range(len(sortable_by_slice.keys())):
+                for s in sortable_by_slice[d]:
+                    sop2depthandtime[s[0]] = (s[-2],s[-1])
         
-        # potentially flip slice direction: base top x0<x1, y0>y1, z0>z1, apex top x0>x1, y0<y1, z0<z1
-        depthandtime2sop = {v:k for k,v in sop2depthandtime.items()}
-        try: img1, img2 = imgs[depthandtime2sop[(0,0)]], imgs[depthandtime2sop[(1,0)]]
-        except: return sop2depthandtime
-        img1x,img1y,img1z = list(map(float,img1.ImagePositionPatient))
-        img2x,img2y,img2z = list(map(float,img2.ImagePositionPatient))
-        if img1x<img2x and img1y>img2y and img1z>img2z: pass
-        else: #img1x>img2x or img1y<img2y or img1z<img2z:
-            max_depth = max(sortable_by_slice.keys())
-            for sop in sop2depthandtime.keys():
-                sop2depthandtime[sop] = (max_depth-sop2depthandtime[sop][0], sop2depthandtime[sop][1])
-        if debug: print('calculating sop2sorting takes: ', time()-st)
-        return sop2depthandtime
+            # potentially flip slice direction: base top x0<x1, y0>y1, z0>z1, apex top x0>x1, y0<y1, z0<z1
+            depthandtime2sop = {v:k for k,v in sop2depthandtime.items()}
+            try: img1, img2 = imgs[depthandtime2sop[(0,0)]], imgs[depthandtime2sop[(1,0)]]
+            except: return sop2depthandtime
+            img1x,img1y,img1z = list(map(float,img1.ImagePositionPatient))
+            img2x,img2y,img2z = list(map(float,img2.ImagePositionPatient))
+            if img1x<img2x and img1y>img2y and img1z>img2z: pass
+            else: #img1x>img2x or img1y<img2y or img1z<img2z:
+                max_depth = max(sortable_by_slice.keys())
+                for sop in sop2depthandtime.keys():
+                    sop2depthandtime[sop] = (max_depth-sop2depthandtime[sop][0], sop2depthandtime[sop][1])
+            return sop2depthandtime
 
     def set_image_height_width_depth(self, debug=False):
-        if debug: st = time()
-        nr_slices = self.nr_slices
-        for slice_nr in range(nr_slices):
-            sop = self.depthandtime2sop[(slice_nr, 0)]
-            dcm = self.case.load_dcm(sop)
-            self.height, self.width    = dcm.pixel_array.shape
-            self.pixel_h, self.pixel_w = list(map(float, dcm.PixelSpacing))
-            try: self.spacing_between_slices = dcm.SpacingBetweenSlices
-            except Exception as e:
-                self.spacing_between_slices = dcm.SliceThickness
-                print('Exception in SAX_Slice_Phase_Category, ', e)
-            try: self.slice_thickness = dcm.SliceThickness
-            except Exception as e: print('Exception in SAX_Slice_Phase_Category, ', e)
-        if debug: print('Setting stuff took: ', time()-st)
+        with span(type(self).__name__ + '.set_image_height_width_depth', debug=debug):
+            headers = [self.case.load_header(self.depthandtime2sop[(d, 0)]) for d in range(self.nr_slices)]
+            self.set_geometry(image_geometry(headers))
+
+    def set_geometry(self, geo):
+        # geometry is resolved from headers (see LazyLuna.header_index.image_geometry)
+        self.height, self.width    = geo['height'],  geo['width']
+        self.pixel_h, self.pixel_w = geo['pixel_h'], geo['pixel_w']
+        self.spacing_between_slices = geo['spacing_between_slices']
+        if self.spacing_between_slices is None:
+            self.spacing_between_slices = geo['slice_thickness']
+            print('Exception in SAX_Slice_Phase_Category, SpacingBetweenSlices missing')
+        if geo['slice_thickness'] is not None: self.slice_thickness = geo['slice_thickness']
+        else: print('Exception in SAX_Slice_Phase_Category, SliceThickness missing')
+
+    def set_missing_slices(self, geo):
+        # spacing is the smallest distance between neighbouring slices, larger gaps are missing slices
+        self.spacing_between_slices = min(geo['slice_spacings'])
+        self.missing_slices = []
+        for d, curr_spacing in enumerate(geo['slice_spacings']):
+            if round(curr_spacing / self.spacing_between_slices) != 1:
+                for m in range(int(round(curr_spacing / self.spacing_between_slices))-1):
+                    self.missing_slices += [(d + m)]
 
     def set_nr_slices_phases(self):
         dat = list(self.depthandtime2sop.keys())
@@ -109,22 +117,68 @@ class SAX_slice_phase_Category:
     def get_annos_phase(self, phase):
         return [self.get_anno(d,phase) for d in range(self.nr_slices)]
 
+    def get_contour_areas(self):
+        # area tensor is shared between all categories on the same images of a case
+        if getattr(self, 'contour_areas', None) is not None: return self.contour_areas
+        for c in getattr(self.case, 'categories', []):
+            if c is self or getattr(c, 'sop2depthandtime', None) is not self.sop2depthandtime: continue
+            if getattr(c, 'contour_areas', None) is not None:
+                self.contour_areas = c.contour_areas
+                return self.contour_areas
+        self.contour_areas = Contour_Areas(self)
+        return self.contour_areas
+
+    def get_areas(self, cont_name):
+        # returns ndarray (slices, phases) of contour areas in mm²
+        return self.get_contour_areas().get(cont_name) * (self.pixel_h * self.pixel_w)
+
+    def get_base_apex_curve(self, cont_name):
+        # returns base and apex slice index per phase (-1 where the phase has no contours)
+        has_conts = self.get_areas(cont_name) != 0
+        any_conts = has_conts.any(axis=0)
+        base_idx  = np.where(any_conts, has_conts.argmax(axis=0), -1)
+        apex_idx  = np.where(any_conts, self.nr_slices - has_conts[::-1].argmax(axis=0) - 1, -1)
+        return base_idx, apex_idx
+
+    def get_volume_curve(self, cont_name):
+        areas = self.get_areas(cont_name)
+        base_idx, apex_idx = self.get_base_apex_curve(cont_name)
+        phases = np.arange(self.nr_phases)[base_idx!=-1]
+        pixel_depth = np.full(areas.shape, float(self.spacing_between_slices))
+        pixel_depth[base_idx[phases], phases] = (self.spacing_between_slices + self.slice_thickness)/2.0
+        pixel_depth[apex_idx[phases], phases] = (self.spacing_between_slices + self.slice_thickness)/2.0
+        return (areas * pixel_depth).sum(axis=0) / 1000.0
+
     def get_volume(self, cont_name, phase):
         if np.isnan(phase): return 0.0
-        annos = self.get_annos_phase(phase)
-        pixel_area = self.pixel_h * self.pixel_w
-        areas = [a.get_contour(cont_name).area*pixel_area if a is not None else 0.0 for a in annos]
-        has_conts = [a!=0 for a in areas]
-        if True not in has_conts: return 0
-        base_idx, apex_idx  = has_conts.index(True), self.nr_slices - has_conts[::-1].index(True) - 1
-        vol = 0
-        for d in range(self.nr_slices):
-            pixel_depth = (self.spacing_between_slices + self.slice_thickness)/2.0 if d in [base_idx, apex_idx] else self.spacing_between_slices
-            vol += areas[d] * pixel_depth
-        return vol / 1000.0
+        return float(self.get_volume_curve(cont_name)[int(phase)])
 
-    def get_volume_curve(self, cont_name):
-        return [self.get_volume(cont_name, p) for p in range(self.nr_phases)]
+
+class Contour_Areas:
+    """Contour_Areas holds the areas of all contours of a category's images, computed in one pass over the annotations
+
+    Args:
+        category (SAX_slice_phase_Category): category whose depthandtime2sop is used
+
+    Attributes:
+        names (dict of str:int): contour name to index of first axis of areas
+        areas (ndarray):         (contour, slice, phase) areas in pixels
+    """
+    def __init__(self, category):
+        shape = (category.nr_slices, category.nr_phases)
+        self.names, areas = dict(), []
+        for (d,p), sop in category.depthandtime2sop.items():
+            anno = category.case.load_anno(sop)
+            for cont_name in anno.available_contour_names():
+                if cont_name not in self.names:
+                    self.names[cont_name] = len(areas)
+                    areas.append(np.zeros(shape))
+                areas[self.names[cont_name]][d,p] = anno.get_contour(cont_name).area
+        self.areas = np.stack(areas) if len(areas)>0 else np.zeros((0,)+shape)
+
+    def get(self, cont_name):
+        if cont_name not in self.names: return np.zeros(self.areas.shape[1:])
+        return self.areas[self.names[cont_name]]
 
 
 class SAX_RV_ES_Category(SAX_slice_phase_Category):
@@ -134,11 +188,8 @@ class SAX_RV_ES_Category(SAX_slice_phase_Category):
         self.phase = self.get_phase()
 
     def get_phase(self):
-        rvendo_vol_curve = self.get_volume_curve('rv_endo')
-        rvpamu_vol_curve = self.get_volume_curve('rv_pamu')
-        vol_curve = np.array(rvendo_vol_curve) - np.array(rvpamu_vol_curve)
-        has_conts = [a!=0 for a in vol_curve]
-        if True not in has_conts: return np.nan
+        vol_curve = self.get_volume_curve('rv_endo') - self.get_volume_curve('rv_pamu')
+        if not (vol_curve!=0).any(): return np.nan
         valid_idx = np.where(vol_curve > 0)[0]
         return valid_idx[vol_curve[valid_idx].argmin()]
 
@@ -149,11 +200,8 @@ class SAX_RV_ED_Category(SAX_slice_phase_Category):
         self.phase = self.get_phase()
 
     def get_phase(self):
-        rvendo_vol_curve = self.get_volume_curve('rv_endo')
-        rvpamu_vol_curve = self.get_volume_curve('rv_pamu')
-        vol_curve = np.array(rvendo_vol_curve) - np.array(rvpamu_vol_curve)
-        has_conts = [a!=0 for a in vol_curve]
-        if True not in has_conts: return np.nan
+        vol_curve = self.get_volume_curve('rv_endo') - self.get_volume_curve('rv_pamu')
+        if not (vol_curve!=0).any(): return np.nan
         return np.argmax(vol_curve)
 
 class SAX_LV_ES_Category(SAX_slice_phase_Category):
@@ -163,11 +211,8 @@ class SAX_LV_ES_Category(SAX_slice_phase_Category):
         self.phase = self.get_phase()
 
     def get_phase(self):
-        lvendo_vol_curve = self.get_volume_curve('lv_endo')
-        lvpamu_vol_curve = self.get_volume_curve('lv_pamu')
-        vol_curve = np.array(lvendo_vol_curve) - np.array(lvpamu_vol_curve)
-        has_conts = [a!=0 for a in vol_curve]
-        if True not in has_conts: return np.nan
+        vol_curve = self.get_volume_curve('lv_endo') - self.get_volume_curve('lv_pamu')
+        if not (vol_curve!=0).any(): return np.nan
         valid_idx = np.where(vol_curve > 0)[0]
         return valid_idx[vol_curve[valid_idx].argmin()]
 
@@ -178,11 +223,8 @@ class SAX_LV_ED_Category(SAX_slice_phase_Category):
         self.phase = self.get_phase()
 
     def get_phase(self):
-        lvendo_vol_curve = self.get_volume_curve('lv_endo')
-        lvpamu_vol_curve = self.get_volume_curve('lv_pamu')
-        vol_curve = np.array(lvendo_vol_curve) - np.array(lvpamu_vol_curve)
-        has_conts = [a!=0 for a in vol_curve]
-        if True not in has_conts: return np.nan
+        vol_curve = self.get_volume_curve('lv_endo') - self.get_volume_curve('lv_pamu')
+        if not (vol_curve!=0).any(): return np.nan
         return np.argmax(vol_curve)
 
     
@@ -203,25 +245,22 @@ class LAX_Category:
         return True
         
     def get_sop2depthandtime(self, sop2filepath, debug=False):
-        if debug: st = time()
-        imgs = {k:pydicom.dcmread(sop2filepath[k], stop_before_pixels=True) for k in sop2filepath.keys()}
-        imgs = {k:dcm for k,dcm in imgs.items() if self.relevant_images(dcm)}
-        sop2depthandtime = {}
-        for dcm_sop, dcm in imgs.items():
-            phase = int(dcm.InstanceNumber)-1
-            sop2depthandtime[dcm_sop] = (0,phase)
-        if debug: print('calculating sop2sorting takes: ', time()-st)
-        return sop2depthandtime
+        with span(type(self).__name__ + '.get_sop2depthandtime', debug=debug):
+            imgs = {k:self.case.load_header(k) for k in sop2filepath.keys()}
+            imgs = {k:dcm for k,dcm in imgs.items() if self.relevant_images(dcm)}
+            sop2depthandtime = {}
+            for dcm_sop, dcm in imgs.items():
+                phase = int(dcm.InstanceNumber)-1
+                sop2depthandtime[dcm_sop] = (0,phase)
+            return sop2depthandtime
 
     def set_image_height_width_depth(self, debug=False):
-        if debug: st = time()
-        sop = self.depthandtime2sop[(0, 0)]
-        dcm = self.case.load_dcm(sop)
-        self.height, self.width    = dcm.pixel_array.shape
-        self.pixel_h, self.pixel_w = list(map(float, dcm.PixelSpacing))
-        try: self.slice_thickness = dcm.SliceThickness
-        except Exception as e: print('Exception in LAX_Slice_Phase_Category, ', e)
-        if debug: print('Setting stuff took: ', time()-st)
+        with span(type(self).__name__ + '.set_image_height_width_depth', debug=debug):
+            geo = image_geometry([self.case.load_header(self.depthandtime2sop[(0, 0)])])
+            self.height, self.width    = geo['height'],  geo['width']
+            self.pixel_h, self.pixel_w = geo['pixel_h'], geo['pixel_w']
+            if geo['slice_thickness'] is not None: self.slice_thickness = geo['slice_thickness']
+            else: print('Exception in LAX_Slice_Phase_Category, SliceThickness missing')
 
     def set_nr_slices_phases(self):
         dat = list(self.depthandtime2sop.keys())
@@ -266,7 +305,7 @@ class LAX_4CV_LVES_Category(LAX_Category):
         self.name  = 'LAX 4CV LVES'
         self.phase = self.get_phase()
     
-    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm[0x0b, 0x10].value
+    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm.LL_tag
     
     def get_phase(self):
         lvendo_vol_curve = self.get_area_curve('lv_lax_endo')
@@ -282,7 +321,7 @@ class LAX_4CV_LVED_Category(LAX_Category):
         self.name  = 'LAX 4CV LVED'
         self.phase = self.get_phase()
     
-    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm[0x0b, 0x10].value
+    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm.LL_tag
     
     def get_phase(self):
         lvendo_vol_curve = self.get_area_curve('lv_lax_endo')
@@ -297,7 +336,7 @@ class LAX_4CV_RVES_Category(LAX_Category):
         self.name  = 'LAX 4CV RVES'
         self.phase = self.get_phase()
     
-    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm[0x0b, 0x10].value
+    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm.LL_tag
     
     def get_phase(self):
         lvendo_vol_curve = self.get_area_curve('rv_lax_endo')
@@ -313,7 +352,7 @@ class LAX_4CV_RVED_Category(LAX_Category):
         self.name  = 'LAX 4CV RVED'
         self.phase = self.get_phase()
     
-    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm[0x0b, 0x10].value
+    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm.LL_tag
     
     def get_phase(self):
         lvendo_vol_curve = self.get_area_curve('rv_lax_endo')
@@ -328,7 +367,7 @@ class LAX_4CV_LAES_Category(LAX_Category):
         self.name  = 'LAX 4CV LAES'
         self.phase = self.get_phase()
     
-    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm[0x0b, 0x10].value
+    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm.LL_tag
     
     def get_phase(self):
         lvendo_vol_curve = self.get_area_curve('la')
@@ -344,7 +383,7 @@ class LAX_4CV_LAED_Category(LAX_Category):
         self.name  = 'LAX 4CV LAED'
         self.phase = self.get_phase()
     
-    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm[0x0b, 0x10].value
+    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm.LL_tag
     
     def get_phase(self):
         lvendo_vol_curve = self.get_area_curve('la')
@@ -359,7 +398,7 @@ class LAX_4CV_RAES_Category(LAX_Category):
         self.name  = 'LAX 4CV RAES'
         self.phase = self.get_phase()
     
-    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm[0x0b, 0x10].value
+    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm.LL_tag
     
     def get_phase(self):
         lvendo_vol_curve = self.get_area_curve('ra')
@@ -375,7 +414,7 @@ class LAX_4CV_RAED_Category(LAX_Category):
         self.name  = 'LAX 4CV RAED'
         self.phase = self.get_phase()
     
-    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm[0x0b, 0x10].value
+    def relevant_images(self, dcm): return 'LAX CINE 4CV' in dcm.LL_tag
     
     def get_phase(self):
         lvendo_vol_curve = self.get_area_curve('ra')
@@ -390,7 +429,7 @@ class LAX_2CV_LVES_Category(LAX_Category):
         self.name  = 'LAX 2CV LVES'
         self.phase = self.get_phase()
     
-    def relevant_images(self, dcm): return 'LAX CINE 2CV' in dcm[0x0b, 0x10].value
+    def relevant_images(self, dcm): return 'LAX CINE 2CV' in dcm.LL_tag
     
     def get_phase(self):
         lvendo_vol_curve = self.get_area_curve('lv_lax_endo')
@@ -406,7 +445,7 @@ class LAX_2CV_LVED_Category(LAX_Category):
         self.name  = 'LAX 2CV LVED'
         self.phase = self.get_phase()
     
-    def relevant_images(self, dcm): return 'LAX CINE 2CV' in dcm[0x0b, 0x10].value
+    def relevant_images(self, dcm): return 'LAX CINE 2CV' in dcm.LL_tag
     
     def get_phase(self):
         lvendo_vol_curve = self.get_area_curve('lv_lax_endo')
@@ -422,7 +461,7 @@ class LAX_2CV_LAES_Category(LAX_Category):
         self.name  = 'LAX 2CV LAES'
         self.phase = self.get_phase()
     
-    def relevant_images(self, dcm): return 'LAX CINE 2CV' in dcm[0x0b, 0x10].value
+    def relevant_images(self, dcm): return 'LAX CINE 2CV' in dcm.LL_tag
     
     def get_phase(self):
         lvendo_vol_curve = self.get_area_curve('la')
@@ -438,7 +477,7 @@ class LAX_2CV_LAED_Category(LAX_Category):
         self.name  = 'LAX 2CV LAED'
         self.phase = self.get_phase()
     
-    def relevant_images(self, dcm): return 'LAX CINE 2CV' in dcm[0x0b, 0x10].value
+    def relevant_images(self, dcm): return 'LAX CINE 2CV' in dcm.LL_tag
     
     def get_phase(self):
         lvendo_vol_curve = self.get_area_curve('la')
@@ -465,62 +504,38 @@ class SAX_T1_Category(SAX_slice_phase_Category):
         return self.phase
 
     def get_sop2depthandtime(self, sop2filepath, debug=False):
-        if debug: st = time()
-        # returns dict sop --> (depth, time)
-        imgs = {k:pydicom.dcmread(sop2filepath[k], stop_before_pixels=True) for k in sop2filepath.keys()}
-        sortable_slice_location = [float(v.SliceLocation) for sopinstanceuid, v in imgs.items()]
-        sl_len = len(set([elem for elem in sortable_slice_location]))
-        sorted_slice_location = np.array(sorted(sortable_slice_location))
-        sop2depthandtime = dict()
-        for sopinstanceuid in imgs.keys():
-            s_loc = imgs[sopinstanceuid].SliceLocation
-            for i in range(len(sorted_slice_location)):
-                if not s_loc==sorted_slice_location[i]: continue
-                sop2depthandtime[sopinstanceuid] = (i,0)
-        # potentially flip slice direction: base top x0<x1, y0>y1, z0>z1, apex top x0>x1, y0<y1, z0<z1
-        depthandtime2sop = {v:k for k,v in sop2depthandtime.items()}
-        try: img1, img2 = imgs[depthandtime2sop[(0,0)]], imgs[depthandtime2sop[(1,0)]]
-        except: return sop2depthandtime
-        img1x,img1y,img1z = list(map(float,img1.ImagePositionPatient))
-        img2x,img2y,img2z = list(map(float,img2.ImagePositionPatient))
-        if img1x<img2x and img1y>img2y and img1z>img2z: pass
-        else: #img1x>img2x and img1y<img2y and img1z<img2z:
-            max_depth = sl_len-1
-            for sop in sop2depthandtime.keys():
-                sop2depthandtime[sop] = (max_depth-sop2depthandtime[sop][0], 0)
-        if debug: print('calculating sop2sorting takes: ', time()-st)
-        return sop2depthandtime
+        with span(type(self).__name__ + '.get_sop2depthandtime', debug=debug):
+            # returns dict sop --> (depth, time)
+            imgs = {k:self.case.load_header(k) for k in sop2filepath.keys()}
+            sortable_slice_location = [float(v.SliceLocation) for sopinstanceuid, v in imgs.items()]
+            sl_len = len(set([elem for elem in sortable_slice_location]))
+            sorted_slice_location = np.array(sorted(sortable_slice_location))
+            sop2depthandtime = dict()
+            for sopinstanceuid in imgs.keys():
+                s_loc = imgs[sopinstanceuid].SliceLocation
+                for i in range(len(sorted_slice_location)):
+                    if not s_loc==sorted_slice_location[i]: continue
+                    sop2depthandtime[sopinstanceuid] = (i,0)
+            # potentially flip slice direction: base top x0<x1, y0>y1, z0>z1, apex top x0>x1, y0<y1, z0<z1
+            depthandtime2sop = {v:k for k,v in sop2depthandtime.items()}
+            try: img1, img2 = imgs[depthandtime2sop[(0,0)]], imgs[depthandtime2sop[(1,0)]]
+            except: return sop2depthandtime
+            img1x,img1y,img1z = list(map(float,img1.ImagePositionPatient))
+            img2x,img2y,img2z = list(map(float,img2.ImagePositionPatient))
+            if img1x<img2x and img1y>img2y and img1z>img2z: pass
+            else: #img1x>img2x and img1y<img2y and img1z<img2z:
+                max_depth = sl_len-1
+                for sop in sop2depthandtime.keys():
+                    sop2depthandtime[sop] = (max_depth-sop2depthandtime[sop][0], 0)
+            return sop2depthandtime
 
     def set_image_height_width_depth(self, debug=False):
-        if debug: st = time()
-        nr_slices = self.nr_slices
-        dcm = self.case.load_dcm(self.depthandtime2sop[(0, 0)])
-        self.height, self.width = dcm.pixel_array.shape
-        self.pixel_h, self.pixel_w = list(map(float, dcm.PixelSpacing))
-        try: self.spacing_between_slices = dcm.SpacingBetweenSlices
-        except Exception as e:
-            self.spacing_between_slices = dcm.SliceThickness
-            print('Exception in SAX_Slice_Phase_Category, ', e)
-        try: self.slice_thickness = dcm.SliceThickness
-        except Exception as e: print('Exception in SAX_Slice_Phase_Category, ', e)
-        try:
-            spacingbs = []
-            for d in range(nr_slices-1):
-                dcm1 = self.case.load_dcm(self.depthandtime2sop[(d,   0)])
-                dcm2 = self.case.load_dcm(self.depthandtime2sop[(d+1, 0)])
-                spacingbs += [round(np.abs(dcm1.SliceLocation - dcm2.SliceLocation), 2)]
-                try: self.slice_thickness = dcm1.SliceThickness
-                except Exception as e: print('Exception in SAX_T1_Category, ', e)
-            self.spacing_between_slices = min(spacingbs)
-            self.missing_slices = []
-            for d in range(nr_slices-1):
-                dcm1 = self.case.load_dcm(self.depthandtime2sop[(d,   0)])
-                dcm2 = self.case.load_dcm(self.depthandtime2sop[(d+1, 0)])
-                curr_spacing = round(np.abs(dcm1.SliceLocation - dcm2.SliceLocation), 2)
-                if round(curr_spacing / self.spacing_between_slices) != 1:
-                    for m in range(int(round(curr_spacing / self.spacing_between_slices))-1):
-                        self.missing_slices += [(d + m)]
-        except Exception as e: print('Exception in SAX_Slice_Phase_Category, ', e)
+        with span(type(self).__name__ + '.set_image_height_width_depth', debug=debug):
+            headers = [self.case.load_header(self.depthandtime2sop[(d, 0)]) for d in range(self.nr_slices)]
+            geo = image_geometry(headers)
+            self.set_geometry(geo)
+            try: self.set_missing_slices(geo)
+            except Exception as e: print('Exception in SAX_Slice_Phase_Category, ', e)
                 
     def set_nr_slices_phases(self):
         dat = list(self.depthandtime2sop.keys())
@@ -575,47 +590,41 @@ class SAX_T1_Category(SAX_slice_phase_Category):
         return vol / 1000.0
     
     def lax_points(self):
+        # annotations without an image in the case (orphans) are skipped
         self.lax_sop_fps = []
+        images = set().union(*self.case.all_imgs_sop2filepath.values())
         for sop, fp in self.case.annos_sop2filepath.items():
-            anno = Annotation(fp, sop)
+            if sop not in images: continue
+            anno = self.case.load_anno(sop)
             if anno.has_point('lv_extent'):
-                self.lax_sop_fps.append((sop, fp, anno, self.get_lax_image(sop)))
+                self.lax_sop_fps.append((sop, fp, anno, self.case.load_header(sop)))
     
-    def get_lax_image(self, sop):
-        for k in self.case.all_imgs_sop2filepath:
-            if sop in self.case.all_imgs_sop2filepath[k].keys():
-                return pydicom.dcmread(self.case.all_imgs_sop2filepath[k][sop], stop_before_pixels=False)
-            
     def get_slice_distances_to_extent_points(self):
+        """Returns minimal distances (mm) of the slices to the base, midventricular and apical centers on the lax lv extent
+        
+        Note:
+            Distances are calculated from the headers of the slices and the lax image (see LazyLuna.geometry.distance_to_image).
+        
+        Returns:
+            ndarray (slices, 3) of float | None: distances to base, midv and apex center per slice
+        """
         if hasattr(self, 'mindists_slices_lax_extpoint'): return self.mindists_slices_lax_extpoint
         if not hasattr(self, 'lax_sop_fps'): self.lax_points()
         if not hasattr(self, 'lax_sop_fps'): print('No extent points in lax images'); return None
-        try: lax_dcm      = self.lax_sop_fps[0][3]
+        try: lax_header   = self.lax_sop_fps[0][3]
         except: print(self.case.case_name, traceback.format_exc()); return None
         try:
-            lax_h, lax_w = lax_dcm.pixel_array.shape
-            lax_anno     = self.lax_sop_fps[0][2]
-            p1, p2, p3 = [[lax_anno.get_point('lv_extent')[i].y, lax_anno.get_point('lv_extent')[i].x] for i in range(3)]
-            extpoints_rcs = utils.transform_ics_to_rcs(lax_dcm, np.array([p1, p2, p3]))
+            lax_anno   = self.lax_sop_fps[0][2]
+            p1, p2, p3 = [[p.y, p.x] for p in lax_anno.get_point('lv_extent').geoms]
+            extpoints_rcs = geometry.image_to_patient(lax_header, np.array([p1, p2, p3]))
             ext_st  = (extpoints_rcs[0] + extpoints_rcs[1])/2.0
             ext_end = extpoints_rcs[2]
             base_center = ext_st + 1/6 * (ext_end - ext_st)
             midv_center = ext_st + 3/6 * (ext_end - ext_st)
             apex_center = ext_st + 5/6 * (ext_end - ext_st)
-            minimal_distances = []
-            for d in range(self.nr_slices):
-                dcm    = self.get_dcm(d,0)
-                img    = self.get_img(d,0,True,True)
-                h, w   = img.shape
-                mesh   = np.meshgrid(np.arange(w), np.arange(h))
-                idxs   = np.stack((mesh[0].flatten(), mesh[1].flatten())).T
-                points = utils.transform_ics_to_rcs(dcm, idxs)
-                dists_base = np.linalg.norm(np.subtract(points, base_center), axis=1)
-                dists_midv = np.linalg.norm(np.subtract(points, midv_center), axis=1)
-                dists_apex = np.linalg.norm(np.subtract(points, apex_center), axis=1)
-                minimal_distances.append([np.min(dists_base), np.min(dists_midv), 
-                                          np.min(dists_apex)])
-            self.mindists_slices_lax_extpoint = np.asarray(minimal_distances)
+            centers = np.array([base_center, midv_center, apex_center])
+            self.mindists_slices_lax_extpoint = np.asarray([geometry.distance_to_image(centers, self.case.load_header(self.depthandtime2sop[(d,0)]))
+                                                            for d in range(self.nr_slices)])
             return self.mindists_slices_lax_extpoint
         except: print(self.case.case_name, traceback.format_exc()); return None
     
@@ -624,41 +633,22 @@ class SAX_T1_Category(SAX_slice_phase_Category):
         if self.nr_slices == 1:
             if debug: print('AHA assuming single midv slice.')
             img, anno = self.get_img(0,0,True,False), self.get_anno(0,0)
-            m = anno.get_myo_mask_by_angles(img, nr_bins=6)
-            m_m = np.asarray([np.mean(v) for v in m.values()])
-            m_s = np.asarray([np.std(v) for v in m.values()])
+            m_m, m_s, _ = anno.get_myo_segment_stats(img, nr_bins=6)
             return ([np.full(6,np.nan), np.roll(m_m,1), np.full(4,np.nan)],
                     [np.full(6,np.nan), np.roll(m_s,1), np.full(4,np.nan)])
         
         if self.nr_slices == 3:
             # assume 3 of 5 so: 0:base, 1:midv, 2:apex
             if debug: print('AHA as three individual slices.')
-            try:
-                img, anno = self.get_img(0,0,True,False), self.get_anno(0,0)
-                b = anno.get_myo_mask_by_angles(img, nr_bins=6)
-                b_m = np.asarray([np.mean(v) for v in b.values()])
-                b_s = np.asarray([np.std(v) for v in b.values()])
-            except:
-                b_m = np.empty((6,)); b_m.fill(np.nan)
-                b_s = np.empty((6,)); b_s.fill(np.nan)
-            try:
-                img, anno = self.get_img(1,0,True,False), self.get_anno(1,0)
-                m = anno.get_myo_mask_by_angles(img, nr_bins=6)
-                m_m = np.asarray([np.mean(v) for v in m.values()])
-                m_s = np.asarray([np.std(v) for v in m.values()])
-            except:
-                m_m = np.empty((6,)); m_m.fill(np.nan)
-                m_s = np.empty((6,)); m_s.fill(np.nan)
-            try:
-                img, anno = self.get_img(2,0,True,False), self.get_anno(2,0)
-                a = anno.get_myo_mask_by_angles(img, nr_bins=4)
-                a_m = np.asarray([np.mean(v) for v in a.values()])
-                a_s = np.asarray([np.std(v) for v in a.values()])
-            except:
-                a_m = np.empty((4,)); a_m.fill(np.nan)
-                a_s = np.empty((4,)); a_s.fill(np.nan)
-            return ([np.roll(b_m,1),np.roll(m_m,1),np.roll(a_m,1)],
-                    [np.roll(b_s,1),np.roll(m_s,1),np.roll(a_s,1)])
+            means, stds = [], []
+            for d, nr_bins in enumerate([6, 6, 4]):
+                try:
+                    img, anno = self.get_img(d,0,True,False), self.get_anno(d,0)
+                    m, s, _   = anno.get_myo_segment_stats(img, nr_bins=nr_bins)
+                except:
+                    m, s = np.full(nr_bins,np.nan), np.full(nr_bins,np.nan)
+                means.append(np.roll(m,1)); stds.append(np.roll(s,1))
+            return means, stds
         
         # else nr slices > 3 OR nr slices == 2
         min_dists = self.get_slice_distances_to_extent_points()
@@ -666,33 +656,19 @@ class SAX_T1_Category(SAX_slice_phase_Category):
             if debug: print('No extent & apical points in long axis views. No AHA possible.')
             return ([np.full(6,np.nan), np.full(6,np.nan), np.full(4,np.nan)], 
                     [np.full(6,np.nan), np.full(6,np.nan), np.full(4,np.nan)])
-        idxs      = np.argmin(min_dists, axis=1)
-        weights   = [1/x if x!=0 else np.nan for x in np.bincount(idxs)]
-        means = [np.zeros(6) if 0 in idxs else np.full(6,np.nan),
-                 np.zeros(6) if 1 in idxs else np.full(6,np.nan),
-                 np.zeros(4) if 2 in idxs else np.full(4,np.nan)]
-        stds  = [np.zeros(6) if 0 in idxs else np.full(6,np.nan),
-                 np.zeros(6) if 1 in idxs else np.full(6,np.nan),
-                 np.zeros(4) if 2 in idxs else np.full(4,np.nan)]
-        # get all vals for individual slices
-        vals_by_slice = dict()
+        idxs  = np.argmin(min_dists, axis=1)
+        means = [np.full(6,np.nan), np.full(6,np.nan), np.full(4,np.nan)]
+        stds  = [np.full(6,np.nan), np.full(6,np.nan), np.full(4,np.nan)]
+        # segment labelled myocardial pixel values of all slices, pooled by AHA level (0:base, 1:midv, 2:apex)
+        vals, labels = dict(), dict()
         for d, idx in enumerate(idxs):
-            nr_bins = 4 if idx==2 else 6
+            nr_bins   = 4 if idx==2 else 6
             img, anno = self.get_img(d,0,True,False), self.get_anno(d,0)
-            vals = anno.get_myo_mask_by_angles(img, nr_bins=nr_bins)
-            vals_by_slice[d] = vals
-        # concatenate by indexes
-        vals_by_idx = dict()
-        for d, idx in enumerate(idxs):
-            if idx not in vals_by_idx.keys():
-                vals_by_idx[idx] = vals_by_slice[d]
-            else:
-                for k in vals_by_slice[d].keys():
-                    vals_by_idx[idx][k] = np.append(vals_by_idx[idx][k], vals_by_slice[d][k])
-        # vals by index to arrays
+            l = anno.get_myo_segment_labels(nr_bins=nr_bins)
+            vals  .setdefault(idx, []).append(img[l>=0])
+            labels.setdefault(idx, []).append(l[l>=0])
         for idx in set(idxs):
-            means[idx] = np.asarray([np.mean(v) for v in vals_by_idx[idx].values()])
-            stds [idx] = np.asarray([np.std(v)  for v in vals_by_idx[idx].values()])
+            means[idx], stds[idx], _ = utils.segment_stats(np.concatenate(vals[idx]), np.concatenate(labels[idx]), 4 if idx==2 else 6)
         if debug: print('AHA via extent & apical points in long axis view.')
         return ([np.roll(r,1) for r in means],[np.roll(r,1) for r in stds])
     
@@ -718,59 +694,45 @@ class SAX_LGE_Category(SAX_slice_phase_Category):
         self.phase = 0
 
     def get_sop2depthandtime(self, sop2filepath, debug=False):
-        if debug: st = time()
-        # returns dict sop --> (depth, time)
-        imgs = {k:pydicom.dcmread(sop2filepath[k], stop_before_pixels=True) for k in sop2filepath.keys()}
-        sortable_slice_location = [float(v.SliceLocation) for sopinstanceuid, v in imgs.items()]
-        sl_len = len(set([elem for elem in sortable_slice_location]))
-        sorted_slice_location = np.array(sorted(sortable_slice_location))
-        sop2depthandtime = dict()
-        for sopinstanceuid in imgs.keys():
-            s_loc = imgs[sopinstanceuid].SliceLocation
-            for i in range(len(sorted_slice_location)):
-                if not s_loc==sorted_slice_location[i]: continue
-                sop2depthandtime[sopinstanceuid] = (i,0)
-        # potentially flip slice direction: base top x0<x1, y0>y1, z0>z1, apex top x0>x1, y0<y1, z0<z1
-        depthandtime2sop = {v:k for k,v in sop2depthandtime.items()}
-        try: img1, img2 = imgs[depthandtime2sop[(0,0)]], imgs[depthandtime2sop[(1,0)]]
-        except: return sop2depthandtime
-        img1x,img1y,img1z = list(map(float,img1.ImagePositionPatient))
-        img2x,img2y,img2z = list(map(float,img2.ImagePositionPatient))
-        if img1x<img2x and img1y>img2y and img1z>img2z: pass
-        else: #img1x>img2x and img1y<img2y and img1z<img2z:
-            max_depth = sl_len-1
-            for sop in sop2depthandtime.keys():
-                sop2depthandtime[sop] = (max_depth-sop2depthandtime[sop][0], 0)
-        if debug: print('calculating sop2sorting takes: ', time()-st)
-        return sop2depthandtime
+        with span(type(self).__name__ + '.get_sop2depthandtime', debug=debug):
+            # returns dict sop --> (depth, time)
+            imgs = {k:self.case.load_header(k) for k in sop2filepath.keys()}
+            sortable_slice_location = [float(v.SliceLocation) for sopinstanceuid, v in imgs.items()]
+            sl_len = len(set([elem for elem in sortable_slice_location]))
+            sorted_slice_location = np.array(sorted(sortable_slice_location))
+            sop2depthandtime = dict()
+            for sopinstanceuid in imgs.keys():
+                s_loc = imgs[sopinstanceuid].SliceLocation
+                for i in range(len(sorted_slice_location)):
+                    if not s_loc==sorted_slice_location[i]: continue
+                    sop2depthandtime[sopinstanceuid] = (i,0)
+            # potentially flip slice direction: base top x0<x1, y0>y1, z0>z1, apex top x0>x1, y0<y1, z0<z1
+            depthandtime2sop = {v:k for k,v in sop2depthandtime.items()}
+            try: img1, img2 = imgs[depthandtime2sop[(0,0)]], imgs[depthandtime2sop[(1,0)]]
+            except: return sop2depthandtime
+            img1x,img1y,img1z = list(map(float,img1.ImagePositionPatient))
+            img2x,img2y,img2z = list(map(float,img2.ImagePositionPatient))
+            if img1x<img2x and img1y>img2y and img1z>img2z: pass
+            else: #img1x>img2x and img1y<img2y and img1z<img2z:
+                max_depth = sl_len-1
+                for sop in sop2depthandtime.keys():
+                    sop2depthandtime[sop] = (max_depth-sop2depthandtime[sop][0], 0)
+            return sop2depthandtime
     
     def get_phase(self):
         return self.phase
 
     def set_image_height_width_depth(self, debug=False):
-        if debug: st = time()
-        nr_slices = self.nr_slices
-        dcm1 = self.case.load_dcm(self.depthandtime2sop[(0, 0)])
-        dcm2 = self.case.load_dcm(self.depthandtime2sop[(1, 0)])
-        self.height, self.width = dcm1.pixel_array.shape
-        self.pixel_h, self.pixel_w = list(map(float, dcm1.PixelSpacing))
-        spacingbs = []
-        for d in range(nr_slices-1):
-            dcm1 = self.case.load_dcm(self.depthandtime2sop[(d,   0)])
-            dcm2 = self.case.load_dcm(self.depthandtime2sop[(d+1, 0)])
-            spacingbs += [round(np.abs(dcm1.SliceLocation - dcm2.SliceLocation), 2)]
-            try: self.slice_thickness = dcm1.SliceThickness
-            except Exception as e: print('Exception in SAX_LGE_Category, ', e)
-        self.spacing_between_slices = min(spacingbs)
-        if debug: print('Spacings: ', spacingbs)
-        self.missing_slices = []
-        for d in range(nr_slices-1):
-            dcm1 = self.case.load_dcm(self.depthandtime2sop[(d,   0)])
-            dcm2 = self.case.load_dcm(self.depthandtime2sop[(d+1, 0)])
-            curr_spacing = round(np.abs(dcm1.SliceLocation - dcm2.SliceLocation), 2)
-            if round(curr_spacing / self.spacing_between_slices) != 1:
-                for m in range(int(round(curr_spacing / self.spacing_between_slices))-1):
-                    self.missing_slices += [(d + m)]
+        with span(type(self).__name__ + '.set_image_height_width_depth', debug=debug):
+            headers = [self.case.load_header(self.depthandtime2sop[(d, 0)]) for d in range(self.nr_slices)]
+            geo = image_geometry(headers)
+            self.height, self.width    = geo['height'],  geo['width']
+            self.pixel_h, self.pixel_w = geo['pixel_h'], geo['pixel_w']
+            if geo['slice_thickness'] is not None: self.slice_thickness = geo['slice_thickness']
+            else: print('Exception in SAX_LGE_Category, SliceThickness missing')
+            # the spacing is derived from the slice positions, SpacingBetweenSlices is not needed
+            self.set_missing_slices(geo)
+            if debug: print('Spacings: ', geo['slice_spacings'])
                 
     def set_nr_slices_phases(self):
         dat = list(self.depthandtime2sop.keys())
@@ -822,6 +784,7 @@ class SAX_LGE_Category(SAX_slice_phase_Category):
                 new_anno = {**new_anno, **anno.anno}
             path = self.case.annos_sop2filepath[anno.sop]
             pickle.dump(new_anno, open(path, 'wb'), pickle.HIGHEST_PROTOCOL)
+        self.case.invalidate_annotations()
     
     def get_base_apex(self, cont_name, debug=False):
         annos     = self.get_annos()
@@ -853,19 +816,13 @@ class SAX_LGE_Category(SAX_slice_phase_Category):
         return vol / 1000.0
     
     def lax_points(self):
+        # annotations without an image in the case (orphans) are skipped
         self.lax_sop_fps = []
+        images = set().union(*self.case.all_imgs_sop2filepath.values())
         for sop, fp in self.case.annos_sop2filepath.items():
-            anno = Annotation(fp, sop)
+            if sop not in images: continue
+            anno = self.case.load_anno(sop)
             if anno.has_point('lv_extent'):
-                self.lax_sop_fps.append((sop, fp, anno, self.get_lax_image(sop)))
-                #fig, ax = plt.subplots(1,1,figsize=(7,7))
-                #ax.imshow(self.lax_sop_fps[-1][-1].pixel_array)
-                #anno.plot_all_points(ax)
-                #plt.show()
-    
-    def get_lax_image(self, sop):
-        for k in self.case.all_imgs_sop2filepath:
-            if sop in self.case.all_imgs_sop2filepath[k].keys():
-                return pydicom.dcmread(self.case.all_imgs_sop2filepath[k][sop], stop_before_pixels=False)
+                self.lax_sop_fps.append((sop, fp, anno, self.case.load_header(sop)))
         
 
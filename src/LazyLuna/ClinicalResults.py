@@ -3,12 +3,17 @@
 ####################
 
 import traceback
+import functools
+import inspect
 import numpy as np
 
 from LazyLuna.Categories import *
+from LazyLuna.caches import CR_MEMO_STATS
+from LazyLuna.profiling import span
 
 # decorator function for exception handling
 def CR_exception_handler(f):
+    @functools.wraps(f)
     def inner_function(*args, **kwargs):
         try:
             return f(*args, **kwargs)
@@ -18,10 +23,55 @@ def CR_exception_handler(f):
             return np.nan
     return inner_function
 
+# decorator function for memoization, applied to the get_val of all Clinical_Result subclasses
+def memoized_CR(f):
+    """Memoizes the value of a clinical result until its dependencies change (see Clinical_Result.get_dependency_key)
+    
+    Note:
+        The value is calculated once with string=False, string values are formatted from it (see Clinical_Result.format_val).
+        Failed calculations are memoized too and return np.nan. Lookups are counted in LazyLuna.caches.CR_MEMO_STATS,
+        calculations are profiled as spans (see LazyLuna.profiling).
+    """
+    calculate = getattr(f, '__wrapped__', f)
+    signature = inspect.signature(calculate)
+    @functools.wraps(f)
+    def inner_function(self, *args, **kwargs):
+        if not self.memoize: return f(self, *args, **kwargs)
+        # further arguments (e.g. contour names) are memoized separately
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        del arguments['self']
+        string = arguments.pop('string', False)
+        arg_key = tuple(arguments.items())
+        try:    hash(arg_key)
+        except TypeError: return f(self, *args, **kwargs)
+        key    = self.get_dependency_key()
+        memos  = self.__dict__.setdefault('_memo', dict())
+        memo   = memos.get(arg_key)
+        hit    = memo is not None and memo[0]==key
+        CR_MEMO_STATS.count(hit, invalidation=memo is not None)
+        if not hit:
+            with span(type(self).__name__ + '.get_val', case=self.case.case_name):
+                try:    memo = (key, calculate(self, **arguments), False)
+                except Exception as e:
+                    print(f.__name__ + ' failed to calculate the clinical result. Returning np.nan. Error traceback:')
+                    print(traceback.format_exc())
+                    memo = (key, np.nan, True)
+            memos[arg_key] = memo
+        _, val, failed = memo
+        if failed: return np.nan
+        return self.format_val(val) if string else val
+    inner_function.memoized = True
+    return inner_function
+
 
 class Clinical_Result:
     """Clinical_Result is a class for the calculation, comparison and presentation of clinical parameters
     
+        Note:
+            Values are memoized per clinical result and recalculated only when the phases of its categories or the case's annotation files change (see memoized_CR).
+    
         Arguments:
             case (LazyLuna.Containers.Case): a case for which the parameter is calculated
             
@@ -29,12 +79,54 @@ class Clinical_Result:
             case (LazyLuna.Containers.Case): a case for which the parameter is calculated
             unit (str): unit name for display
             tol_range (float): acceptable deviation of clinical result 
+            memoize (bool): if False values are calculated on every call (class attribute)
     """
+    memoize = True
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        get_val = cls.__dict__.get('get_val')
+        if get_val is not None and not getattr(get_val, 'memoized', False): cls.get_val = memoized_CR(get_val)
+    
     def __init(self, case):
         self.case = case
         self.name = ''
         self.unit = '[]'
         self.tol_range = 0
+    
+    def __getstate__(self):
+        # memoized values are session state and not stored with the case
+        state = self.__dict__.copy()
+        state.pop('_memo', None)
+        return state
+    
+    def get_dependencies(self):
+        """Returns the categories the clinical result is calculated on
+        
+        Returns:
+            list of Category: categories among the clinical result's attributes
+        """
+        return [v for v in self.__dict__.values() if hasattr(v, 'sop2depthandtime') and hasattr(v, 'phase')]
+    
+    def get_dependency_key(self):
+        """Returns the key under which the clinical result's value is memoized
+        
+        Returns:
+            tuple: the case's annotation generation and the identities and phases of the dependencies
+        """
+        key = [self.case.get_annotation_generation()]
+        for c in self.get_dependencies(): key.append((id(c), None if c.phase!=c.phase else c.phase))
+        return tuple(key)
+    
+    def invalidate(self):
+        """Drops the memoized values"""
+        self.__dict__.pop('_memo', None)
+    
+    def format_val(self, val):
+        """Formats a value for display: integers (phases, slice numbers) as is, other values with two decimal points"""
+        if isinstance(val, (int, np.integer)): return str(val)
+        return "{:.2f}".format(val)
+    
     @CR_exception_handler
     def get_val(self, string=False):
         """Calculates the clinical parameter for its case
@@ -43,7 +135,7 @@ class Clinical_Result:
             string (bool): If True provides the first two decimal points as a string
             
         Returns:
-            (float | str): the clinical parameter
+            (float | str): the clinical parameter
         """
         pass
     
@@ -2,10 +2,17 @@ import os
 import traceback
 from time import time
 import pickle
+import numpy as np
 import pydicom
 
 from LazyLuna import loading_functions
-from LazyLuna.Annotation import Annotation
+from LazyLuna.Annotation import Annotation, EMPTY_ANNOTATION
+from LazyLuna.caches import LRU_Cache, PIXEL_CACHE, freeze
+from LazyLuna.header_index import get_header_index, get_headers
+from LazyLuna.tag_manifest import get_manifest_tag
+from LazyLuna.case_catalog import get_case_catalog
+from LazyLuna import case_storage
+from LazyLuna.profiling import span
 
 
 ########
@@ -34,22 +41,44 @@ class Case:
         all_imgs_sop2filepath (dict of str: dict of str: list of str): mapping of view type names to dict of sopinstanceuids to dicom filepaths
         studyinstanceuid (str):                unique identifier for cases
         annos_sop2filepath (dict of str: str): mapping of sopinstanceuids to annotation filepaths
+        headers (dict of str: Header):         mapping of sopinstanceuids to dicom headers (see LazyLuna.header_index), stored with the case
         categories (list of Category):         list of category objects
         crs (list of ClinicalResult):          list of clinical result objects
+        anno_cache_mb (float):                 memory cap of the case's annotation cache (class attribute)
+        anno_check_interval (float):           seconds between checks of the annotation files for changes (class attribute, see get_annotation_generation)
     """
+    anno_cache_mb       = 64
+    anno_check_interval = 1.0
+    # category attributes derived from annotations, dropped when annotation files change
+    derived_category_attributes = ['contour_areas', 'lax_sop_fps', 'mindists_slices_lax_extpoint']
     
     def __init__(self, imgs_path, annos_path, case_name, reader_name, debug=False):
-        if debug: st = time()
-        self.imgs_path    = imgs_path
-        self.annos_path   = annos_path
-        self.case_name    = case_name
-        self.reader_name  = reader_name
-        self.type         = 'None'
-        self.available_types = set()
-        self.all_imgs_sop2filepath  = loading_functions.read_dcm_images_into_sop2filepaths(imgs_path, debug)
-        self.studyinstanceuid       = self._get_studyinstanceuid()
-        self.annos_sop2filepath     = loading_functions.read_annos_into_sop2filepaths(annos_path, debug)
-        if debug: print('Initializing Case took: ', time()-st)
+        with span('Case.__init__', debug=debug, case=case_name):
+            self.imgs_path    = imgs_path
+            self.annos_path   = annos_path
+            self.case_name    = case_name
+            self.reader_name  = reader_name
+            self.type         = 'None'
+            self.available_types = set()
+            with span('get_headers'): headers = get_headers(imgs_path)
+            self.all_imgs_sop2filepath  = loading_functions.read_dcm_images_into_sop2filepaths(imgs_path, debug, headers=headers)
+            self.headers                = {h.SOPInstanceUID: h for h in headers}
+            self.studyinstanceuid       = self._get_studyinstanceuid()
+            self.annos_sop2filepath     = loading_functions.read_annos_into_sop2filepaths(annos_path, debug)
+
+    def __getstate__(self):
+        # caches are session state and not stored with the case, lazily loaded cases are read completely
+        case_storage.load_all(self)
+        state = self.__dict__.copy()
+        for k in case_storage.TRANSIENT_ATTRIBUTES: state.pop(k, None)
+        return state
+
+    def __getattr__(self, name):
+        # attributes of cases loaded from a case file are read with their section on first access (see LazyLuna.case_storage)
+        if name not in self.__dict__.get('_lazy_attributes', ()): raise AttributeError(name)
+        case_storage.load_lazy_attribute(self, name)
+        try:    return self.__dict__[name]
+        except KeyError: raise AttributeError(name)
 
     def _get_studyinstanceuid(self):
         """Returns the case's studyinstanceuid
@@ -59,7 +88,8 @@ class Case:
         """
         for n in self.all_imgs_sop2filepath.keys():
             for sop in self.all_imgs_sop2filepath[n].keys():
-                return pydicom.dcmread(self.all_imgs_sop2filepath[n][sop], stop_before_pixels=False).StudyInstanceUID
+                if sop in self.headers: return self.headers[sop].StudyInstanceUID
+                return pydicom.dcmread(self.all_imgs_sop2filepath[n][sop], stop_before_pixels=True).StudyInstanceUID
 
     def attach_categories(self, categories):
         """Attaches categories to case
@@ -68,7 +98,8 @@ class Case:
             categories (list of Category): list of category classes 
         """
         self.categories = [] # iteratively adding categories is a speed-up
-        for c in categories: self.categories.append(c(self))
+        for c in categories:
+            with span(c.__name__ + '.__init__'): self.categories.append(c(self))
 
     def attach_clinical_results(self, crs):
         """Attaches clinical results to case
@@ -90,29 +121,109 @@ class Case:
         """
         return pydicom.dcmread(self.imgs_sop2filepath[sop], stop_before_pixels=False)
 
+    def load_header(self, sop):
+        """Loads the header of a dicom file without pixel data
+        
+        Note:
+            Headers are parsed once and kept in the case's header store (stored with the case).
+        
+        Args:
+            sop (str): sopInstanceUID of dicom
+            
+        Returns:
+            LazyLuna.header_index.Header: indexed dicom attributes
+        """
+        if not hasattr(self, 'headers'): self.headers = dict()
+        if sop not in self.headers:
+            path = self.imgs_sop2filepath.get(sop)
+            # images of other types, like lax images referenced by sax categories
+            for sop2filepath in self.all_imgs_sop2filepath.values():
+                if path is None: path = sop2filepath.get(sop)
+            if path is None: raise KeyError(sop)
+            h = get_header_index(self.imgs_path).get(path)
+            h['LL_tag'] = get_manifest_tag(path, sop, h['LL_tag'])
+            self.headers[sop] = h
+        return self.headers[sop]
+
     def load_anno(self, sop):
         """Loads Annotation
         
+        Note:
+            Annotations are cached per case and loaded again only when their file's modification time changes. 
+            SOPs without annotation file share the immutable LazyLuna.Annotation.EMPTY_ANNOTATION.
+        
         Args:
             sop (str): sopInstanceUID of annotation
             
         Returns:
             Annotation
         """
-        if sop not in self.annos_sop2filepath.keys(): return Annotation(None)
-        return Annotation(self.annos_sop2filepath[sop], sop)
+        if sop not in self.annos_sop2filepath.keys(): return EMPTY_ANNOTATION
+        path = self.annos_sop2filepath[sop]
+        try:    st = os.stat(path)
+        except OSError: return Annotation(path, sop)
+        cache = self.get_anno_cache()
+        entry = cache.get(sop)
+        if entry is not None and entry[0]==st.st_mtime_ns: return entry[1]
+        anno  = Annotation(path, sop)
+        cache.put(sop, (st.st_mtime_ns, anno, st.st_size))
+        return anno
+
+    def get_anno_cache(self):
+        """Returns the case's annotation cache (LazyLuna.caches.LRU_Cache of sop: (mtime, Annotation, file size))"""
+        if not hasattr(self, '_anno_cache'):
+            self._anno_cache = LRU_Cache(self.anno_cache_mb, sizeof=lambda entry: entry[2], name='Annotation cache')
+        return self._anno_cache
+
+    def get_annotation_generation(self):
+        """Returns the generation of the case's annotation files, which increases whenever an annotation file changes
+        
+        Note:
+            The modification times of the annotation files are checked at most every anno_check_interval seconds.
+            When they changed, the annotation derived attributes (derived_category_attributes) are dropped from the categories
+            and from the categories of the other views (other_categories), which customize_case swaps back in.
+        
+        Returns:
+            int: annotation generation
+        """
+        checked, mtimes, generation = self.__dict__.get('_anno_state', (None, None, 0))
+        if checked is not None and time()-checked < self.anno_check_interval: return generation
+        new_mtimes = []
+        for path in self.annos_sop2filepath.values():
+            try:    new_mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError: new_mtimes.append(-1)
+        new_mtimes = tuple(new_mtimes)
+        if mtimes is not None and new_mtimes!=mtimes:
+            generation += 1
+            categories = list(getattr(self, 'categories', []))
+            for other in self.__dict__.get('other_categories', {}).values(): categories += list(other)
+            for c in categories:
+                for attr in self.derived_category_attributes: c.__dict__.pop(attr, None)
+        self._anno_state = (time(), new_mtimes, generation)
+        return generation
+
+    def invalidate_annotations(self):
+        """Forces a check of the annotation files on the next call of get_annotation_generation, to be called after writing annotation files"""
+        if '_anno_state' in self.__dict__: self._anno_state = (None,) + self._anno_state[1:]
 
     def get_img(self, sop, value_normalize=True, window_normalize=True):
         """Loads and normalizes an image 
         
+        Note:
+            Images are kept in the process-wide pixel cache (LazyLuna.caches.PIXEL_CACHE). Value normalized images are returned as read-only float32 arrays, copy before modifying.
+            Without value normalization a writable copy is returned, in the dicom's pixel dtype if the image is not window normalized either.
+        
         Args:
             sop (str): sopInstanceUID of dicom
             value_normalize (bool): whether to normalize pixel values according to dicom attribute
             window_normalize (bool): whether to normalize pixel values according to dicom attribute
             
         Returns:
-            ndarray (2D array of float): img
+            ndarray (2D array): img
         """
+        key = (sop, value_normalize, window_normalize)
+        img = PIXEL_CACHE.get(key)
+        if img is not None: return img if value_normalize else img.copy()
         dcm = self.load_dcm(sop)
         img = dcm.pixel_array
         if value_normalize:
@@ -127,11 +238,17 @@ class Case:
                 img = ((img-(c-0.5)) / (w-1)+0.5) * (maxx-minn) + minn
                 img[search_if]   = minn
                 img[search_elif] = maxx
-        return img
+        raw = not value_normalize and not window_normalize
+        img = PIXEL_CACHE.put(key, freeze(img, dtype=None if raw else np.float32))
+        return img if value_normalize else img.copy()
 
     def store(self, storage_dir):
         """Stores case 
         
+        Note:
+            The case is stored in the sectioned case format (see LazyLuna.case_storage) and added to the case catalog of storage_dir (see LazyLuna.case_catalog).
+            A legacy pickle of the same case in storage_dir is replaced.
+        
         Args:
             storage_dir (str): path to directory into which this case is stored, NOT the storage_path. Full path is generated
             
@@ -143,11 +260,35 @@ class Case:
         print(self.reader_name)
         print(self.case_name)
         print(self.studyinstanceuid)
-        storage_path = os.path.join(storage_dir, self.reader_name+'_'+self.case_name+'_'+self.studyinstanceuid+'_LL_case.pickle')
-        f = open(storage_path, 'wb'); pickle.dump(self, f); f.close()
+        storage_name = self.reader_name+'_'+self.case_name+'_'+self.studyinstanceuid+'_LL_case'
+        storage_path = os.path.join(storage_dir, storage_name+case_storage.CASE_SUFFIX)
+        case_storage.write_case(self, storage_path)
+        legacy_path  = os.path.join(storage_dir, storage_name+case_storage.LEGACY_SUFFIX)
+        if os.path.exists(legacy_path): os.remove(legacy_path)
+        try: get_case_catalog(storage_dir).add(self, storage_path)
+        except Exception as e: print('Case catalog update failed: ', e)
         return storage_path
 
 
+def load_case(path):
+    """Loads a stored case
+    
+    Note:
+        Cases in the sectioned case format read their sections on first access (see LazyLuna.case_storage). Legacy pickles are read completely.
+    
+    Args:
+        path (str): path to case file
+        
+    Returns:
+        Case: stored case
+    """
+    if not case_storage.is_case_archive(path):
+        with open(path, 'rb') as f: return pickle.load(f)
+    case = Case.__new__(Case)
+    case_storage.read_case(case, path)
+    return case
+
+
 ###################
 # Case Comparison #
 ###################
@@ -1,5 +1,6 @@
 import os
 import traceback
+from time import time
 
 from matplotlib import gridspec, colors, cm
 from matplotlib.figure import Figure
@@ -73,30 +74,41 @@ class Failed_Annotation_Comparison_Yielder(Visualization):
         self.tight_layout()
         if debug: print('Took: ', time()-st)
         
-    def initialize_yeild_next(self, rounds=None):
+    def failed_comparisons(self, cc):
+        """Returns (slice_nr, category, contour_name) of failed annotation comparisons of a case comparison, metrics are calculated in one batch"""
         dsc, hd, mld = DiceMetric(), HausdorffMetric(), mlDiffMetric()
+        c1, c2 = cc.case1, cc.case2
+        cells, conts1, conts2, headers = [], [], [], []
+        for sl_nr in range(c1.categories[0].nr_slices):
+            for contname in self.view.contour_names:
+                cats1 = self.view.get_categories(c1, contname)
+                cats2 = self.view.get_categories(c2, contname)
+                for cat1, cat2 in zip(cats1, cats2):
+                    p1, p2 = cat1.phase, cat2.phase
+                    headers.append(c1.load_header(cat1.depthandtime2sop[(sl_nr, p1)]))
+                    conts1.append(cat1.get_anno(sl_nr, p1).get_contour(contname))
+                    conts2.append(cat2.get_anno(sl_nr, p2).get_contour(contname))
+                    cells.append((sl_nr, cat1, contname))
+        if len(cells)==0: return []
+        spacings    = [h['PixelSpacing'] if h['PixelSpacing'] is not None else [np.nan, np.nan] for h in headers]
+        thicknesses = [h['SliceThickness'] if h['SliceThickness'] is not None else np.nan for h in headers]
+        dice   = dsc.get_vals(conts1, conts2, spacings, thicknesses)
+        mldiff = np.abs(mld.get_vals(conts1, conts2, spacings, thicknesses))
+        hdm    = hd .get_vals(conts1, conts2, spacings, thicknesses)
+        failed = []
+        for j, (sl_nr, cat1, contname) in enumerate(cells):
+            if dice[j]<70 and mldiff[j]>1.2:
+                failed.append((sl_nr, cat1, contname))
+            if contname in ['la','ra'] and (hdm[j]>3.5 or dice[j]<60):
+                failed.append((sl_nr, cat1, contname))
+        return failed
+    
+    def initialize_yeild_next(self, rounds=None):
         count = 0
         while (rounds is None) or (count<rounds):
             for cc in self.ccs:
-                c1, c2    = cc.case1, cc.case2
-                nr_slices = c1.categories[0].nr_slices
-                case_name = c1.case_name
-                for sl_nr in range(nr_slices):
-                    for contname in self.view.contour_names:
-                        cats1 = self.view.get_categories(c1, contname)
-                        cats2 = self.view.get_categories(c2, contname)
-                        for cat1, cat2 in zip(cats1, cats2):
-                            p1, p2 = cat1.phase, cat2.phase
-                            dcm    = cat1.get_dcm(sl_nr, p1)
-                            cont1  = cat1.get_anno(sl_nr, p1).get_contour(contname)
-                            cont2  = cat2.get_anno(sl_nr, p2).get_contour(contname)
-                            dice   = dsc.get_val(cont1, cont2, dcm)
-                            mldiff = np.abs(mld.get_val(cont1, cont2, dcm))
-                            hdm    = hd.get_val(cont1, cont2, dcm)
-                            if dice<70 and mldiff>1.2:
-                                yield cc, sl_nr, cat1, contname
-                            if contname in ['la','ra'] and (hdm>3.5 or dice<60):
-                                yield cc, sl_nr, cat1, contname
+                for sl_nr, cat1, contname in self.failed_comparisons(cc):
+                    yield cc, sl_nr, cat1, contname
             count += 1
                 
     def store(self, storepath):
@@ -1,5 +1,6 @@
 import os
 import traceback
+from time import time
 
 from matplotlib import gridspec, colors, cm
 from matplotlib.figure import Figure
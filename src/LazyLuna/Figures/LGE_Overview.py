@@ -16,16 +16,18 @@ import pandas
 
 from LazyLuna.Tables import *
 from LazyLuna.Metrics import *
+from LazyLuna.cohort_results import Cohort_Results
 from LazyLuna import utils
 from LazyLuna.Figures.Visualization import *
 
 
 class LGE_Overview(Visualization):
-    def visualize(self, case_comparisons):
+    def visualize(self, case_comparisons, cohort_results=None):
         """Takes a list of case_comparisons and presents Blandaltmans for several Clinical Results in one figure
         
         Args:
             case_comparisons (list of LazyLuna.Containers.Case_Comparison): list of case comparisons for calculation
+            cohort_results (LazyLuna.cohort_results.Cohort_Results): evaluated clinical results of the case_comparisons, evaluated if None
         """
         rows, columns   = 3, 2
         self.set_size_inches(w=columns*11.0, h=(rows*6.0))
@@ -39,33 +41,24 @@ class LGE_Overview(Visualization):
         ticksize=16
         
         # Table
-        rows = []
         cols = ['Scar Mass', 'Scar Fraction', 'No Reflow Mass', 'No Reflow Fraction', 'LV Volume', 'LVM Mass']
         cols = [s + ' ' + t for s in cols for t in ['avg', 'diff']]
         cols = ['casename', 'studyuid'] + cols
         cr_names = ['SCARM', 'SCARF', 'NOREFLOWVOL', 'NOREFLOWF', 'LVV', 'LVM']
-        for cc in case_comparisons:
-            row = [cc.case1.case_name, cc.case1.studyinstanceuid]
-            for crname in cr_names:
-                try:
-                    cr1 = [cr for cr in cc.case1.crs if cr.name==crname][0]
-                    cr2 = [cr for cr in cc.case2.crs if cr.name==crname][0]
-                    row.extend([(cr1.get_val()+cr2.get_val())/2.0, cr1.get_val_diff(cr2)])
-                except:
-                    print('Failed in case: ',cc.case1.casename, traceback.print_exc())
-                    row.extend([(np.nan, np.nan)])
-            rows.append(row)
-        df = DataFrame(rows, columns=cols)
+        results = Cohort_Results(case_comparisons) if cohort_results is None else cohort_results
+        summary = results.summary().reindex(cr_names)
+        df = results.pivot(['avg', 'diff'], cr_names)
+        df.columns = cols[2:]
+        df.insert(0, 'studyuid', [cc.case1.studyinstanceuid for cc in case_comparisons])
+        df.insert(0, 'casename', [cc.case1.case_name for cc in case_comparisons])
         
         # Scar Mass Plot
         ax = axes[0][0]
         ax.set_title(cols[2].replace(' avg','') + ' Bland Altman [g]', fontsize=titlesize)
         sns.scatterplot(ax=ax, x=cols[2], y=cols[3], data=df, markers='o', palette=swarm_palette, s=20, legend=False)
-        avg_difference = df[cols[3]].mean()
-        std_difference = df[cols[3]].std()
-        ax.axhline(avg_difference, ls="-", c=".2")
-        ax.axhline(avg_difference+1.96*std_difference, ls=":", c=".2")
-        ax.axhline(avg_difference-1.96*std_difference, ls=":", c=".2")
+        ax.axhline(summary.loc['SCARM', 'mean_diff'], ls="-", c=".2")
+        ax.axhline(summary.loc['SCARM', 'loa_upper'], ls=":", c=".2")
+        ax.axhline(summary.loc['SCARM', 'loa_lower'], ls=":", c=".2")
         #ax.set_xlabel(cols[2]+' [g]', fontsize=labelsize)
         #ax.set_ylabel(cols[3]+' [g]', fontsize=labelsize)
         yabs_max = abs(max(ax.get_ylim(), key=abs)) + 10
@@ -75,11 +68,9 @@ class LGE_Overview(Visualization):
         ax = axes[0][1]
         ax.set_title(cols[4].replace(' avg','') + ' Bland Altman [%]', fontsize=titlesize)
         sns.scatterplot(ax=ax, x=cols[4], y=cols[5], data=df, markers='o', palette=swarm_palette, s=20, legend=False)
-        avg_difference = df[cols[5]].mean()
-        std_difference = df[cols[5]].std()
-        ax.axhline(avg_difference, ls="-", c=".2")
-        ax.axhline(avg_difference+1.96*std_difference, ls=":", c=".2")
-        ax.axhline(avg_difference-1.96*std_difference, ls=":", c=".2")
+        ax.axhline(summary.loc['SCARF', 'mean_diff'], ls="-", c=".2")
+        ax.axhline(summary.loc['SCARF', 'loa_upper'], ls=":", c=".2")
+        ax.axhline(summary.loc['SCARF', 'loa_lower'], ls=":", c=".2")
         #ax.set_xlabel(cols[4]+' [%]', fontsize=labelsize)
         #ax.set_ylabel(cols[5]+' [%]', fontsize=labelsize)
         yabs_max = abs(max(ax.get_ylim(), key=abs)) + 10
@@ -89,11 +80,9 @@ class LGE_Overview(Visualization):
         ax = axes[1][0]
         ax.set_title(cols[6].replace(' avg','') + ' Bland Altman [g]', fontsize=titlesize)
         sns.scatterplot(ax=ax, x=cols[6], y=cols[7], data=df, markers='o', palette=swarm_palette, s=20, legend=False)
-        avg_difference = df[cols[7]].mean()
-        std_difference = df[cols[7]].std()
-        ax.axhline(avg_difference, ls="-", c=".2")
-        ax.axhline(avg_difference+1.96*std_difference, ls=":", c=".2")
-        ax.axhline(avg_difference-1.96*std_difference, ls=":", c=".2")
+        ax.axhline(summary.loc['NOREFLOWVOL', 'mean_diff'], ls="-", c=".2")
+        ax.axhline(summary.loc['NOREFLOWVOL', 'loa_upper'], ls=":", c=".2")
+        ax.axhline(summary.loc['NOREFLOWVOL', 'loa_lower'], ls=":", c=".2")
         #ax.set_xlabel(cols[6]+' [g]', fontsize=labelsize)
         #ax.set_ylabel(cols[7]+' [g]', fontsize=labelsize)
         yabs_max = abs(max(ax.get_ylim(), key=abs)) + 10
@@ -104,11 +93,9 @@ class LGE_Overview(Visualization):
         ax = axes[1][1]
         ax.set_title(cols[8].replace(' avg','') + ' Bland Altman [%]', fontsize=titlesize)
         sns.scatterplot(ax=ax, x=cols[8], y=cols[9], data=df, markers='o', palette=swarm_palette, s=20, legend=False)
-        avg_difference = df[cols[9]].mean()
-        std_difference = df[cols[9]].std()
-        ax.axhline(avg_difference, ls="-", c=".2")
-        ax.axhline(avg_difference+1.96*std_difference, ls=":", c=".2")
-        ax.axhline(avg_difference-1.96*std_difference, ls=":", c=".2")
+        ax.axhline(summary.loc['NOREFLOWF', 'mean_diff'], ls="-", c=".2")
+        ax.axhline(summary.loc['NOREFLOWF', 'loa_upper'], ls=":", c=".2")
+        ax.axhline(summary.loc['NOREFLOWF', 'loa_lower'], ls=":", c=".2")
         #ax.set_xlabel(cols[8]+' [%]', fontsize=labelsize)
         #ax.set_ylabel(cols[9]+' [%]', fontsize=labelsize)
         yabs_max = abs(max(ax.get_ylim(), key=abs)) + 10
@@ -118,11 +105,9 @@ class LGE_Overview(Visualization):
         ax = axes[2][0]
         ax.set_title(cols[10].replace(' avg','') + ' Bland Altman [ml]', fontsize=titlesize)
         sns.scatterplot(ax=ax, x=cols[10], y=cols[11], data=df, markers='o', palette=swarm_palette, s=20, legend=False)
-        avg_difference = df[cols[11]].mean()
-        std_difference = df[cols[11]].std()
-        ax.axhline(avg_difference, ls="-", c=".2")
-        ax.axhline(avg_difference+1.96*std_difference, ls=":", c=".2")
-        ax.axhline(avg_difference-1.96*std_difference, ls=":", c=".2")
+        ax.axhline(summary.loc['LVV', 'mean_diff'], ls="-", c=".2")
+        ax.axhline(summary.loc['LVV', 'loa_upper'], ls=":", c=".2")
+        ax.axhline(summary.loc['LVV', 'loa_lower'], ls=":", c=".2")
         #ax.set_xlabel(cols[10]+' [ml]', fontsize=labelsize)
         #ax.set_ylabel(cols[11]+' [ml]', fontsize=labelsize)
         yabs_max = abs(max(ax.get_ylim(), key=abs)) + 10
@@ -132,11 +117,9 @@ class LGE_Overview(Visualization):
         ax = axes[2][1]
         ax.set_title(cols[12].replace(' avg','') + ' Bland Altman [g]', fontsize=titlesize)
         sns.scatterplot(ax=ax, x=cols[10], y=cols[11], data=df, markers='o', palette=swarm_palette, s=20, legend=False)
-        avg_difference = df[cols[13]].mean()
-        std_difference = df[cols[13]].std()
-        ax.axhline(avg_difference, ls="-", c=".2")
-        ax.axhline(avg_difference+1.96*std_difference, ls=":", c=".2")
-        ax.axhline(avg_difference-1.96*std_difference, ls=":", c=".2")
+        ax.axhline(summary.loc['LVM', 'mean_diff'], ls="-", c=".2")
+        ax.axhline(summary.loc['LVM', 'loa_upper'], ls=":", c=".2")
+        ax.axhline(summary.loc['LVM', 'loa_lower'], ls=":", c=".2")
         #ax.set_xlabel(cols[12]+' [g]', fontsize=labelsize)
         #ax.set_ylabel(cols[13]+' [g]', fontsize=labelsize)
         yabs_max = abs(max(ax.get_ylim(), key=abs)) + 10
@@ -13,6 +13,7 @@ from shapely.geometry import Polygon
 from scipy.stats import probplot
 import numpy as np
 import pandas
+from pandas import DataFrame
 
 from LazyLuna.Tables import *
 from LazyLuna.Metrics import *
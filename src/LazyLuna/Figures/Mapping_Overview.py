@@ -13,19 +13,23 @@ from shapely.geometry import Polygon
 from scipy.stats import probplot
 import numpy as np
 import pandas
+from pandas import DataFrame
 
 from LazyLuna.Tables import *
 from LazyLuna.Metrics import *
+from LazyLuna.cohort_results import Cohort_Results
 from LazyLuna import utils
 from LazyLuna.Figures.Visualization import *
 
 
 class Mapping_Overview(Visualization):
-    def visualize(self, case_comparisons, mapping_type='T1'):
+    def visualize(self, case_comparisons, mapping_type='T1', cohort_results=None):
         """Takes a list of case_comparisons and presents Blandaltmans for several Clinical Results in one figure
         
         Args:
             case_comparisons (list of LazyLuna.Containers.Case_Comparison): list of case comparisons for calculation
+            mapping_type (str): 'T1' or 'T2'
+            cohort_results (LazyLuna.cohort_results.Cohort_Results): evaluated clinical results of the case_comparisons, evaluated if None
         """
         rows, columns   = 4, 2
         self.set_size_inches(w=columns*11.0, h=(rows*6.0))
@@ -43,21 +47,17 @@ class Mapping_Overview(Visualization):
         
         # Bland Altman
         ax = axes[0][0]
-        cr_table = CC_ClinicalResultsTable()
-        cr_table.calculate(case_comparisons, with_dices=False)
-        cr_table.add_bland_altman_dataframe(case_comparisons)
-        table = cr_table.df
-        avg_n  = [c for c in table.columns if 'GLOBAL' in c and 'avg'  in c][0]
-        diff_n = [c for c in table.columns if 'GLOBAL' in c and 'diff' in c][0]
+        results = Cohort_Results(case_comparisons) if cohort_results is None else cohort_results
+        summary = results.summary()
+        table   = results.get_pairs(cr_name)
+        avg_n, diff_n = cr_name + ' avg', cr_name + ' difference'
         ax.set_title(avg_n.replace(' avg','') + ' Bland Altman', fontsize=titlesize)
-        sns.scatterplot(ax=ax, x=avg_n, y=diff_n, data=table, markers='o', 
-                        palette=swarm_palette, size=np.abs(table[diff_n]), 
+        sns.scatterplot(ax=ax, x='avg', y='diff', data=table, markers='o', 
+                        palette=swarm_palette, size=np.abs(table['diff']), 
                         s=10, legend=False)
-        avg_difference = table[diff_n].mean()
-        std_difference = table[diff_n].std()
-        ax.axhline(avg_difference, ls="-", c=".2")
-        ax.axhline(avg_difference+1.96*std_difference, ls=":", c=".2")
-        ax.axhline(avg_difference-1.96*std_difference, ls=":", c=".2")
+        ax.axhline(summary.loc[cr_name, 'mean_diff'], ls="-", c=".2")
+        ax.axhline(summary.loc[cr_name, 'loa_upper'], ls=":", c=".2")
+        ax.axhline(summary.loc[cr_name, 'loa_lower'], ls=":", c=".2")
         ax.set_xlabel(cr.name+' '+cr.unit, fontsize=labelsize)
         ax.set_ylabel(cr.name+' '+cr.unit, fontsize=labelsize)
         yabs_max = abs(max(ax.get_ylim(), key=abs)) + 10
@@ -69,12 +69,8 @@ class Mapping_Overview(Visualization):
         readername1 = case_comparisons[0].case1.reader_name
         readername2 = case_comparisons[0].case2.reader_name
         rows = []
-        for cc in case_comparisons:
-            cr1 = [cr.get_val() for cr in cc.case1.crs if cr.name==cr_name][0]
-            cr2 = [cr.get_val() for cr in cc.case2.crs if cr.name==cr_name][0]
-            casename, studyuid = cc.case1.case_name, cc.case1.studyinstanceuid
-            if np.isnan(cr1) or np.isnan(cr2): continue
-            else: rows.extend([[casename, studyuid, readername1, cr1], [casename, studyuid, readername2, cr2]])
+        for _, pair in table.dropna(subset=['value1', 'value2']).iterrows():
+            rows.extend([[pair['case'], pair['studyuid'], readername1, pair['value1']], [pair['case'], pair['studyuid'], readername2, pair['value2']]])
         df = DataFrame(rows, columns=['casename', 'studyuid', 'Reader', cr.name])
         # Plot
         sns.boxplot  (ax=ax, data=df, y='Reader', x=cr_name, width=0.4, palette=custom_palette, orient='h', linewidth=1)
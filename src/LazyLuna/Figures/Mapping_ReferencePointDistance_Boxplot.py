@@ -13,10 +13,12 @@ from shapely.geometry import Polygon
 from scipy.stats import probplot
 import numpy as np
 import pandas
+from pandas import DataFrame
 
 from LazyLuna.Tables import *
 from LazyLuna.Metrics import *
 from LazyLuna import utils
+from LazyLuna.utils import findCCsOverviewTab
 from LazyLuna.Figures.Visualization import *
 
 
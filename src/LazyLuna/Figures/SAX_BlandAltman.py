@@ -16,16 +16,18 @@ import pandas
 
 from LazyLuna.Tables import *
 from LazyLuna.Metrics import *
+from LazyLuna.cohort_results import Cohort_Results
 from LazyLuna import utils
 from LazyLuna.Figures.Visualization import *
 
 
 class SAX_BlandAltman(Visualization):
-    def visualize(self, case_comparisons):
+    def visualize(self, case_comparisons, cohort_results=None):
         """Takes a list of case_comparisons and presents Blandaltmans for several Clinical Results in one figure
         
         Args:
             case_comparisons (list of LazyLuna.Containers.Case_Comparison): list of case comparisons for calculation
+            cohort_results (LazyLuna.cohort_results.Cohort_Results): evaluated clinical results of the case_comparisons, evaluated if None
         """
         cases1   = [cc.case1 for cc in case_comparisons]
         cases2   = [cc.case2 for cc in case_comparisons]
@@ -35,26 +37,21 @@ class SAX_BlandAltman(Visualization):
         custom_palette  = sns.color_palette("Blues")
         custom_palette2 = sns.color_palette("Purples")
         swarm_palette   = sns.color_palette(["#061C36", "#061C36"])
-        cr_table = CC_ClinicalResultsTable()
-        cr_table.calculate(case_comparisons, with_dices=False)
-        cr_table.add_bland_altman_dataframe(case_comparisons)
-        table = cr_table.df
+        results = Cohort_Results(case_comparisons) if cohort_results is None else cohort_results
+        summary = results.summary()
         j = 0
         crvs = ['LVESV', 'LVEDV', 'LVEF', 'LVM', 'RVESV', 'RVEDV', 'RVEF']
         for i, crv in enumerate(crvs):
             if i >= (rows*columns): continue
             while i >= rows: i-=rows
-            avg_n  = crv + ' avg'
-            diff_n = crv + ' difference'
+            table = results.get_pairs(crv)
             axes[i][j].set_title(crv.replace('YOMASS','') + ' Bland Altman', fontsize=16)
-            sns.scatterplot(ax=axes[i][j], x=avg_n, y=diff_n, data=table, markers='o', 
-                            palette=swarm_palette, size=np.abs(table[diff_n]), 
+            sns.scatterplot(ax=axes[i][j], x='avg', y='diff', data=table, markers='o', 
+                            palette=swarm_palette, size=np.abs(table['diff']), 
                             s=10, legend=False)
-            avg_difference = table[diff_n].mean()
-            std_difference = table[diff_n].std()
-            axes[i][j].axhline(avg_difference, ls="-", c=".2")
-            axes[i][j].axhline(avg_difference+1.96*std_difference, ls=":", c=".2")
-            axes[i][j].axhline(avg_difference-1.96*std_difference, ls=":", c=".2")
+            axes[i][j].axhline(summary.loc[crv, 'mean_diff'], ls="-", c=".2")
+            axes[i][j].axhline(summary.loc[crv, 'loa_upper'], ls=":", c=".2")
+            axes[i][j].axhline(summary.loc[crv, 'loa_lower'], ls=":", c=".2")
             axes[i][j].set_xlabel('[%]' if 'EF' in crv else '[ml]' if 'ESV' in crv or 'EDV' in crv else '[g]', fontsize=14)
             axes[i][j].set_ylabel('[%]' if 'EF' in crv else '[ml]' if 'ESV' in crv or 'EDV' in crv else '[g]', fontsize=14)
             yabs_max = abs(max(axes[i][j].get_ylim(), key=abs))
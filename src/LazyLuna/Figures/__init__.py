@@ -1,32 +1,16 @@
-from LazyLuna.Figures.Visualization import *
+from LazyLuna.registry import Registry
 
-from LazyLuna.Figures.SAX_BlandAltman import *
-from LazyLuna.Figures.SAX_Candlelight import *
-from LazyLuna.Figures.SAXCINE_Confidence_Intervals_Tolerance_Ranges import *
-from LazyLuna.Figures.LAXCINE_Confidence_Intervals_Tolerance_Ranges import *
-from LazyLuna.Figures.Annotation_Comparison import *
-from LazyLuna.Figures.Basic_Presenter import *
-from LazyLuna.Figures.Angle_Segment_Comparison import *
-from LazyLuna.Figures.Failed_Annotation_Comparison_Yielder import *
-from LazyLuna.Figures.BlandAltman import *
-from LazyLuna.Figures.PairedBoxplot import *
-from LazyLuna.Figures.Boxplot import *
-from LazyLuna.Figures.QQPlot import *
-from LazyLuna.Figures.Qualitative_Correlationplot import *
-from LazyLuna.Figures.T1_bullseye_plot import *
-from LazyLuna.Figures.T1_diff_bullseye_plot import *
-from LazyLuna.Figures.Statistical_T1_bullseye_plot import *
-from LazyLuna.Figures.Statistical_T1_diff_bullseye_plot import *
-from LazyLuna.Figures.LAX_BlandAltman import *
-from LazyLuna.Figures.LAX_Volumes_BlandAltman import *
-from LazyLuna.Figures.Image_List_Presenter import *
-from LazyLuna.Figures.Mapping_Overview import *
-from LazyLuna.Figures.Reference_Point_Differences import *
-from LazyLuna.Figures.DCMs_list_Annos_Presenter import *
-from LazyLuna.Figures.Mapping_Slice_Average_BlandAltman import *
-from LazyLuna.Figures.Mapping_Slice_Average_PairedBoxplot import *
-from LazyLuna.Figures.Mapping_ReferencePointAngleDiff_Boxplot import *
-from LazyLuna.Figures.Mapping_ReferencePointDistance_Boxplot import *
-from LazyLuna.Figures.Mapping_DiceBySlice import *
-from LazyLuna.Figures.LGE_Overview import *
-from LazyLuna.Figures.LGE_Overview_BySlice import *
\ No newline at end of file
+# Figures are imported when they are first requested (LazyLuna.Figures.registry, see LazyLuna.registry.Registry),
+# importing LazyLuna.Figures does not import matplotlib, seaborn or PyQt5. `from LazyLuna.Figures import *` imports all figures.
+
+registry = Registry({name: 'LazyLuna.Figures.' + name for name in [
+    'Visualization',
+    'SAX_BlandAltman', 'SAX_Candlelight', 'SAXCINE_Confidence_Intervals_Tolerance_Ranges', 'LAXCINE_Confidence_Intervals_Tolerance_Ranges',
+    'Annotation_Comparison', 'Basic_Presenter', 'Angle_Segment_Comparison', 'Failed_Annotation_Comparison_Yielder',
+    'BlandAltman', 'PairedBoxplot', 'Boxplot', 'QQPlot', 'Qualitative_Correlationplot',
+    'T1_bullseye_plot', 'T1_diff_bullseye_plot', 'Statistical_T1_bullseye_plot', 'Statistical_T1_diff_bullseye_plot',
+    'LAX_BlandAltman', 'LAX_Volumes_BlandAltman', 'Image_List_Presenter', 'Mapping_Overview', 'Reference_Point_Differences',
+    'DCMs_list_Annos_Presenter', 'Mapping_Slice_Average_BlandAltman', 'Mapping_Slice_Average_PairedBoxplot',
+    'Mapping_ReferencePointAngleDiff_Boxplot', 'Mapping_ReferencePointDistance_Boxplot', 'Mapping_DiceBySlice',
+    'LGE_Overview', 'LGE_Overview_BySlice']})
+registry.install(__name__)
@@ -63,11 +63,11 @@ class CC_CRs_Images_Tab(QWidget):
         layout.setRowStretch(2, 3)
 
     def get_view(self, vname):
-        view = [c[1] for c in inspect.getmembers(Views, inspect.isclass) if issubclass(c[1], Views.View) if c[0]==vname][0]
+        view = Views.get_view_classes([vname])[0]
         return view()
     
     def get_view_names(self):
-        v_names = [c[0] for c in inspect.getmembers(Views, inspect.isclass) if issubclass(c[1], Views.View) if c[0]!='View']
+        v_names = [v.__name__ for v in Views.get_view_classes()]
         return v_names
     
     def select_view(self):
@@ -18,6 +18,7 @@ import traceback
 import copy
 
 import pandas as pd
+from pandas import DataFrame
 
 from LazyLuna.Containers import Case_Comparison
 from LazyLuna.loading_functions import *
@@ -219,11 +219,11 @@ class CCs_Overview_Tab(QWidget):
     
     def get_view(self, vname):
         vname = vname.split(' (')[0]
-        view = [c[1] for c in inspect.getmembers(Views, inspect.isclass) if issubclass(c[1], Views.View) if c[0]!='View' and c[1]().name==vname][0]
+        view = [v for v in Views.get_view_classes() if v().name==vname][0]
         return view()
     
     def get_view_names(self):
-        v_names = [c[1]().name for c in inspect.getmembers(Views, inspect.isclass) if issubclass(c[1], Views.View) if c[0]!='View']
+        v_names = [v().name for v in Views.get_view_classes()]
         nr_ccs_per_view = {v:0 for v in v_names}
         for cc in self.all_case_comparisons:
             for v in v_names:
@@ -16,7 +16,7 @@ import numpy as np
 
 from LazyLuna.loading_functions import *
 from LazyLuna.Tables import *
-from LazyLuna.Containers import Case_Comparison
+from LazyLuna.Containers import Case_Comparison, load_case
 from LazyLuna.Guis.Addable_Tabs.CCs_Overview_Tab import CCs_Overview_Tab
 
 
@@ -114,8 +114,8 @@ class MyTabWidget(QWidget):
         # get selected paths
         paths1, paths2 = self.get_paths_from_table()
         if paths1==[]: return
-        cases1 = [pickle.load(open(p,'rb')) for p in paths1]
-        cases2 = [pickle.load(open(p,'rb')) for p in paths2]
+        cases1 = [load_case(p) for p in paths1]
+        cases2 = [load_case(p) for p in paths2]
         case_names = set([c.case_name for c in cases1]).intersection(set([c.case_name for c in cases2]))
         cases1 = [c for c in cases1 if c.case_name in case_names]
         cases2 = [c for c in cases2 if c.case_name in case_names]
@@ -168,9 +168,7 @@ class MyTabWidget(QWidget):
         try:
             case_folder_path = self.case_folder_path.text()
             if not os.path.exists(case_folder_path): return
-            paths   = [str(p) for p in Path(case_folder_path).glob('**/*.pickle')]
-            cases   = [pickle.load(open(p,'rb')) for p in paths]
-            self.cases_df = get_cases_table(cases, paths, True, False)
+            self.cases_df = get_cases_table_from_catalog(case_folder_path, True, False)
             readers = sorted(self.cases_df['Reader'].unique())
             self.combobox_select_segmenter .clear()
             self.combobox_select_segmenter2.clear()
@@ -231,14 +231,11 @@ class LL_Database_TabWidget(QWidget):
         rows = self.db_connection.cursor().execute(q).fetchall()
         columns = ['Case Name','Reader','Age (Y)','Gender (M/F)','Weight (kg)','Height (m)','Creation Date','StudyUID','Path']
         t  = Table(); t.df = pandas.DataFrame(rows, columns=columns)
-        self.tabname_to_tableview[tabname].setModel(t.to_pyqt5_table_model())
         self.tabname_to_table[tabname] = t
-        self.tabname_to_tableview[tabname].resizeColumnsToContents()
-        proxy_model = QSortFilterProxyModel() 
-        proxy_model.setFilterKeyColumn(-1) # Search all columns.
-        proxy_model.setSourceModel(t.to_pyqt5_table_model())
+        proxy_model = t.to_pyqt5_proxy_model() # Searches all columns.
         self.tabname_to_proxy[tabname] = proxy_model
         self.tabname_to_tableview[tabname].setModel(self.tabname_to_proxy[tabname])
+        self.tabname_to_tableview[tabname].resizeColumnsToContents()
         self.searchbar.textChanged.connect(self.tabname_to_proxy[tabname].setFilterFixedString)
     
     def execute_query(self, query):
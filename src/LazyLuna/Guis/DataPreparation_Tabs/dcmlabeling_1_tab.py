@@ -199,7 +199,7 @@ class DcmLabeling_1_TabWidget(QWidget):
         if retval==65536: return # Return value for NO button
         try:
             self.key2LLtag = self.set_key2LLtag()
-            add_and_store_LL_tags(self.imgs_df, self.key2LLtag, self.overriding_dict)
+            add_and_store_LL_tags(self.imgs_df, self.key2LLtag, self.overriding_dict, imgs_path=self.dicom_folder_path)
             self.information_df['LL_tag'] = self.information_df['Change LL_tag']
             t  = Table(); t.df = self.information_df
             self.tableView.setModel(t.to_pyqt5_table_model())
@@ -12,7 +12,8 @@ import inspect
 from LazyLuna.Tables import Table
 from LazyLuna import Views
 from LazyLuna.loading_functions import *
-from LazyLuna.Containers import Case
+from LazyLuna.Containers import Case, load_case
+from LazyLuna.case_storage import case_paths
 
 
 class LL_CaseConverter_TabWidget(QWidget):
@@ -162,7 +163,7 @@ class LL_CaseConverter_TabWidget(QWidget):
         if retval==65536: return # Return value for NO button
         
         try: 
-            views = [v[1]() for v in inspect.getmembers(Views, inspect.isclass) if issubclass(v[1], Views.View) if v[0]!='View']
+            views = [v() for v in Views.get_view_classes()]
             self.reader_paths = list(set([self.fileSystemModel.filePath(index) for index in self.tree.selectedIndexes()]))
             imganno_paths = []
             for reader_path in self.reader_paths:
@@ -211,8 +212,8 @@ class LL_CaseConverter_TabWidget(QWidget):
             if dialog.exec_() == QDialog.Accepted:
                 import_cases_path = dialog.selectedFiles()[0]
             if import_cases_path is None: return
-            paths = [str(p) for p in Path(import_cases_path).glob('**/*.pickle')]
-            for p in paths: c = pickle.load(open(p,'rb')); self.insert_case(c, p)
+            paths = case_paths(import_cases_path)
+            for p in paths: c = load_case(p); self.insert_case(c, p)
             self.parent.tab.update_tableview_tabs()
         except Exception as e: print(traceback.format_exc()); pass
         
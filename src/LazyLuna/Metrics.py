@@ -1,6 +1,7 @@
 import traceback
 from functools import wraps
 import numpy as np
+import shapely
 
 from LazyLuna import utils
 
@@ -22,6 +23,11 @@ def Metrics_exception_handler(f):
             return np.nan
     return inner_function
 
+def format_vals(m, string=False):
+    """Returns batch metric values, as strings with 2 decimal places if string (np.nan is kept)"""
+    if not string: return m
+    return np.array([np.nan if np.isnan(v) else "{:.2f}".format(v) for v in m], dtype=object)
+
 
 class Metric:
     """Metric is an abstract class for metric value calculations
@@ -50,6 +56,21 @@ class Metric:
         """
         pass
 
+    def get_vals(self, geos1, geos2, spacings=None, thicknesses=None, string=False):
+        """Returns metric values for arrays of geometry pairs (batch version of get_val)
+
+        Args:
+            geos1 (array of shapely.geometry): first objects for comparison
+            geos2 (array of shapely.geometry): second objects for comparison
+            spacings (ndarray (n,2) of float): pixel spacing per pair
+            thicknesses (ndarray of float):    slice thickness per pair
+            string (bool):                     return strings of floats with 2 decimal places
+            
+        Returns:
+            ndarray: Metric values
+        """
+        pass
+
 
 class DiceMetric(Metric):
     """DiceMetric for metric value calculation in percent (in [0, 100])
@@ -81,6 +102,10 @@ class DiceMetric(Metric):
         m = utils.dice(geo1, geo2)
         return "{:.2f}".format(m) if string else m
 
+    def get_vals(self, geos1, geos2, spacings=None, thicknesses=None, string=False):
+        """Gets Dice percentages in [0,100] for arrays of geometry pairs (see LazyLuna.utils.dice_batch)"""
+        return format_vals(utils.dice_batch(geos1, geos2), string)
+
 
 class mmDistMetric(Metric):
     """mm distance calculation
@@ -145,6 +170,12 @@ class AreaDiffMetric(Metric):
         m = (geo1.area - geo2.area) * (pw*ph) / 100.0
         return "{:.2f}".format(m) if string else m
 
+    def get_vals(self, geos1, geos2, spacings=None, thicknesses=None, string=False):
+        """Returns area differences in cm² for arrays of geometry pairs"""
+        spacings = np.asarray(spacings, dtype=float)
+        m = (shapely.area(utils.geometry_array(geos1)) - shapely.area(utils.geometry_array(geos2))) * (spacings[:,0]*spacings[:,1]) / 100.0
+        return format_vals(m, string)
+
 
 class HausdorffMetric(Metric):
     """Hausdorff Distance calculation
@@ -177,6 +208,85 @@ class HausdorffMetric(Metric):
         m = ph * utils.hausdorff(geo1, geo2)
         return "{:.2f}".format(m) if string else m
 
+    def get_vals(self, geos1, geos2, spacings=None, thicknesses=None, string=False):
+        """Returns Hausdorff distances in mm for arrays of geometry pairs (see LazyLuna.utils.hausdorff_batch)"""
+        spacings = np.asarray(spacings, dtype=float)
+        m = spacings[:,1] * utils.hausdorff_batch(geos1, geos2)
+        # as get_val: distances of a contour to a missing contour are formatted too
+        return np.array(["{:.2f}".format(v) for v in m], dtype=object) if string else m
+
+
+class HD95Metric(Metric):
+    """95th percentile Hausdorff Distance calculation (of the contours' surface distances)
+
+    Attributes:
+        name (str): metric name for display
+        unit (str): unit name for display
+    """
+    def __init__(self):
+        super().__init__()
+
+    def set_information(self):
+        self.name = 'HD95'
+        self.unit = '[mm]'
+
+    @Metrics_exception_handler
+    def get_val(self, geo1, geo2, dcm=None, string=False):
+        """Returns 95th percentile Hausdorff distance of geometries in mm
+
+        Args:
+            geo1 (shapely.geometry): first object for comparison
+            geo2 (shapely.geometry): second object for comparison
+            dcm (dicom dataset):     dicom dataset with pixel spacing
+            string (bool):           return string of float with 2 decimal places
+            
+        Returns:
+            float | str: HD95 in mm
+        """
+        return self.get_vals([geo1], [geo2], [dcm.PixelSpacing], string=string)[0]
+
+    def get_vals(self, geos1, geos2, spacings=None, thicknesses=None, string=False):
+        """Returns 95th percentile Hausdorff distances in mm for arrays of geometry pairs (see LazyLuna.utils.surface_distances_batch)"""
+        spacings = np.asarray(spacings, dtype=float)
+        m = spacings[:,1] * utils.surface_distances_batch(geos1, geos2, percentile=95)[1]
+        return format_vals(m, string)
+
+
+class ASDMetric(Metric):
+    """Average Symmetric Surface Distance calculation (mean distance of the contours' boundaries)
+
+    Attributes:
+        name (str): metric name for display
+        unit (str): unit name for display
+    """
+    def __init__(self):
+        super().__init__()
+
+    def set_information(self):
+        self.name = 'ASD'
+        self.unit = '[mm]'
+
+    @Metrics_exception_handler
+    def get_val(self, geo1, geo2, dcm=None, string=False):
+        """Returns average symmetric surface distance of geometries in mm
+
+        Args:
+            geo1 (shapely.geometry): first object for comparison
+            geo2 (shapely.geometry): second object for comparison
+            dcm (dicom dataset):     dicom dataset with pixel spacing
+            string (bool):           return string of float with 2 decimal places
+            
+        Returns:
+            float | str: ASD in mm
+        """
+        return self.get_vals([geo1], [geo2], [dcm.PixelSpacing], string=string)[0]
+
+    def get_vals(self, geos1, geos2, spacings=None, thicknesses=None, string=False):
+        """Returns average symmetric surface distances in mm for arrays of geometry pairs (see LazyLuna.utils.surface_distances_batch)"""
+        spacings = np.asarray(spacings, dtype=float)
+        m = spacings[:,1] * utils.surface_distances_batch(geos1, geos2)[2]
+        return format_vals(m, string)
+
 
 class mlDiffMetric(Metric):
     """Millilitre difference calculation
@@ -208,6 +318,12 @@ class mlDiffMetric(Metric):
         pw, ph = dcm.PixelSpacing; vd = dcm.SliceThickness
         m      = (pw*ph*vd/1000.0) * (geo1.area - geo2.area)
         return "{:.2f}".format(m) if string else m
+
+    def get_vals(self, geos1, geos2, spacings=None, thicknesses=None, string=False):
+        """Returns millilitre differences in ml for arrays of geometry pairs"""
+        spacings, thicknesses = np.asarray(spacings, dtype=float), np.asarray(thicknesses, dtype=float)
+        m = (spacings[:,0]*spacings[:,1]*thicknesses/1000.0) * (shapely.area(utils.geometry_array(geos1)) - shapely.area(utils.geometry_array(geos2)))
+        return format_vals(m, string)
     
     
 class absMlDiffMetric(Metric):
@@ -241,6 +357,10 @@ class absMlDiffMetric(Metric):
         m      = np.abs((pw*ph*vd/1000.0) * (geo1.area - geo2.area))
         return "{:.2f}".format(m) if string else m
 
+    def get_vals(self, geos1, geos2, spacings=None, thicknesses=None, string=False):
+        """Returns absolute millilitre differences in ml for arrays of geometry pairs"""
+        return format_vals(np.abs(mlDiffMetric().get_vals(geos1, geos2, spacings, thicknesses)), string)
+
 
 ############################
 # Mapping Specific Metrics #
@@ -276,7 +396,7 @@ class T1AvgDiffMetric(Metric):
         """
         # imgs = get_img (d,0,True,False)
         h,     w     = img1.shape
-        mask1, mask2 = utils.to_mask(geo1,h,w).astype(bool), utils.to_mask(geo2,h,w).astype(bool)
+        mask1, mask2 = utils.to_mask_cached(geo1,h,w).astype(bool), utils.to_mask_cached(geo2,h,w).astype(bool)
         myo1_vals, myo2_vals = img1[mask1], img2[mask2]
         global_t1_1 = np.mean(myo1_vals)
         global_t1_2 = np.mean(myo2_vals)
@@ -312,7 +432,7 @@ class T1AvgReaderMetric(Metric):
         """
         # imgs = get_img (d,0,True,False)
         h, w = img.shape
-        mask = utils.to_mask(geo, h,w).astype(bool)
+        mask = utils.to_mask_cached(geo, h,w).astype(bool)
         myo_vals  = img[mask]
         global_t1 = np.mean(myo_vals)
         m         = global_t1
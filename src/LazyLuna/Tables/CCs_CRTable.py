@@ -5,30 +5,21 @@ import traceback
 from LazyLuna.Tables.Table import *
 from LazyLuna.loading_functions import *
 from LazyLuna.Metrics import *
+from LazyLuna.cohort_results import Cohort_Results
 
 
 class CC_ClinicalResultsTable(Table):
-    def calculate(self, case_comparisons, with_dices=True, contour_names=['lv_endo','lv_myo','rv_endo']):
+    def calculate(self, case_comparisons, with_dices=True, contour_names=['lv_endo','lv_myo','rv_endo'], cohort_results=None):
         """Presents table of Clinical Results for a Case_Comparison
         
         Args:
             case_comparison (LazyLuna.Containers.Case_Comparison): two cases
             with_dices (bool): 
             contour_names (list of str): 
+            cohort_results (LazyLuna.cohort_results.Cohort_Results): evaluated clinical results of the case_comparisons, evaluated if None
         """
-        rows = []
-        case1, case2 = case_comparisons[0].case1, case_comparisons[0].case2
-        columns=['case', 'reader1', 'reader2']
-        for cr in case1.crs: columns += [cr.name+' '+case1.reader_name, cr.name+' '+case2.reader_name, cr.name+' difference']
-        for cc in case_comparisons:
-            c1, c2 = cc.case1, cc.case2
-            try: # due to cases that couldn't be fitted
-                row = [c1.case_name, c1.reader_name, c2.reader_name]
-                for cr1, cr2 in zip(c1.crs, c2.crs):
-                    row += [cr1.get_val(), cr2.get_val(), cr1.get_val_diff(cr2)]
-                rows.append(row)
-            except: rows.append([np.nan for _ in range(len(case1.crs)*3+3)])
-        df = DataFrame(rows, columns=columns)
+        if cohort_results is None: cohort_results = Cohort_Results(case_comparisons)
+        df = cohort_results.wide()
         if with_dices: df = pandas.concat([df, self.dices_dataframe(case_comparisons, contour_names)], axis=1, join="outer")
         self.df = df
     
@@ -0,0 +1,85 @@
+# PyQt5 models of LazyLuna.Tables.Table DataFrames (see Table.to_pyqt5_table_model)
+
+import numpy as np
+from PyQt5 import QtCore
+import traceback
+
+
+########################################################################
+## For conversion from Pandas DataFrame to PyQt5 Abstract Table Model ##
+########################################################################
+class DataFrameModel(QtCore.QAbstractTableModel):
+    """Interface class to PyQt5 
+
+    Note:
+        Cells are formatted when the view asks for them, the model only keeps the DataFrame's column arrays (no Qt items per cell).
+        Sort ranks (SortRole) and row texts for filtering are computed on first use (see DataFrameProxyModel).
+
+    Attributes:
+        _data (pandas.DataFrame): tabular data
+        _columns (list of ndarray): values per column
+    """
+    SortRole = QtCore.Qt.UserRole + 1
+    
+    def __init__(self, data, parent=None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self._data      = data
+        self._columns   = [data.iloc[:,i].values for i in range(len(data.columns))]
+        self._ranks     = dict()
+        self._row_texts = None
+    
+    def rowCount(self, parent=QtCore.QModelIndex()): 
+        return 0 if parent.isValid() else len(self._data.index)
+    
+    def columnCount(self, parent=QtCore.QModelIndex()): 
+        return 0 if parent.isValid() else self._data.columns.size
+    
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        # views ask for many roles per cell, only display and sort role are answered
+        if role==QtCore.Qt.DisplayRole   and index.isValid(): return "{}".format(self._columns[index.column()][index.row()])
+        if role==DataFrameModel.SortRole and index.isValid(): return int(self.sort_ranks(index.column())[index.row()])
+        return None
+    
+    def headerData(self, x, orientation, role):
+        try:
+            if orientation==QtCore.Qt.Horizontal and role==QtCore.Qt.DisplayRole: return self._data.columns[x]
+            if orientation==QtCore.Qt.Vertical   and role==QtCore.Qt.DisplayRole: return self._data.index[x]
+        except Exception as e: print('WARNING in DataFrameModel!!!: ', traceback.format_exc())
+        return None
+    
+    def sort_ranks(self, column):
+        """Returns the position of every row when sorting by column (numerically if possible, else by text, nan last)"""
+        if column not in self._ranks:
+            vals = self._columns[column]
+            try:    order = np.argsort(vals.astype(np.float64), kind='stable')
+            except: order = np.argsort(np.array(["{}".format(v) for v in vals]), kind='stable')
+            ranks = np.empty(len(vals), dtype=np.int64)
+            ranks[order] = np.arange(len(vals))
+            self._ranks[column] = ranks
+        return self._ranks[column]
+    
+    def row_text(self, row):
+        """Returns the texts of a row's cells, joined by line breaks"""
+        if self._row_texts is None:
+            self._row_texts = ['\n'.join("{}".format(v) for v in r) for r in zip(*self._columns)] if len(self._columns)>0 else ['']*self.rowCount()
+        return self._row_texts[row]
+
+
+class DataFrameProxyModel(QtCore.QSortFilterProxyModel):
+    """Sorts and filters a DataFrameModel for PyQt5 views without copying its data
+
+    Note:
+        Sorting compares the rows' ranks per column (DataFrameModel.SortRole). Filtering over all columns (filterKeyColumn -1, the default here)
+        matches the filter against each row's text (DataFrameModel.row_text) instead of every single cell.
+    """
+    def __init__(self, source_model=None, parent=None):
+        QtCore.QSortFilterProxyModel.__init__(self, parent)
+        self.setSortRole(DataFrameModel.SortRole)
+        self.setFilterKeyColumn(-1)
+        if source_model is not None: self.setSourceModel(source_model)
+    
+    def filterAcceptsRow(self, row, parent):
+        model = self.sourceModel()
+        if self.filterKeyColumn()!=-1 or not isinstance(model, DataFrameModel): return QtCore.QSortFilterProxyModel.filterAcceptsRow(self, row, parent)
+        regexp = self.filterRegExp()
+        return regexp.isEmpty() or regexp.indexIn(model.row_text(row))!=-1
@@ -54,27 +54,40 @@ class SAX_CINE_CCs_Metrics_Table(Table):
         rows, cols = [], []
         for cc in ccs:
             case1, case2 = cc.case1, cc.case2
+            # collect all (slice, contour, category) cells of the case comparison, metrics are calculated in one batch
+            cells, conts1, conts2, headers = [], [], [], []
             for d in range(case1.categories[0].nr_slices):
-                row = [case1.case_name, d]
                 for contname in view.contour_names:
                     cats1, cats2 = view.get_categories(case1, contname), view.get_categories(case2, contname)
-                    row_extension = []
-                    for cat1, cat2 in zip(cats1, cats2):
+                    for i, (cat1, cat2) in enumerate(zip(cats1, cats2)):
                         try:
                             p1, p2 = (cat1.phase, cat2.phase) if not fixed_phase_first_reader else (cat1.phase, cat1.phase)
-                            dcm = cat1.get_dcm(d, p1)
+                            h = cat1.case.load_header(cat1.depthandtime2sop[(d, p1)])
                             anno1, anno2 = cat1.get_anno(d, p1), cat2.get_anno(d, p2)
                             cont1, cont2 = anno1.get_contour(contname), anno2.get_contour(contname)
-                            ml_diff   = mlDiff_m.get_val(cont1, cont2, dcm, string=pretty)
-                            absmldiff = absmldiff_m.get_val(cont1, cont2, dcm, string=pretty)
-                            area_diff = areadiff_m.get_val(cont1, cont2, dcm, string=pretty)
-                            dsc       = dsc_m.get_val(cont1, cont2, dcm, string=pretty)
-                            hd        = hd_m.get_val(cont1, cont2, dcm, string=pretty)
                             pos1 = self._is_apic_midv_basal_outside(case1, d, p1, contname)
                             pos2 = self._is_apic_midv_basal_outside(case2, d, p2, contname)
                             has_cont1, has_cont2 = anno1.has_contour(contname), anno2.has_contour(contname)
-                            row_extension.extend([ml_diff, absmldiff, area_diff, dsc, hd, pos1, pos2, has_cont1, has_cont2])
-                        except Exception as e: row_extension.extend([np.nan for _ in range(9)]); print(traceback.format_exc())
+                        except Exception as e: print(traceback.format_exc()); continue
+                        cells.append([(d, contname, i), pos1, pos2, has_cont1, has_cont2])
+                        conts1.append(cont1); conts2.append(cont2); headers.append(h)
+            cell2vals = dict()
+            if len(cells)>0:
+                spacings    = [h['PixelSpacing'] if h['PixelSpacing'] is not None else [np.nan, np.nan] for h in headers]
+                thicknesses = [h['SliceThickness'] if h['SliceThickness'] is not None else np.nan for h in headers]
+                ml_diff   = mlDiff_m   .get_vals(conts1, conts2, spacings, thicknesses, string=pretty)
+                absmldiff = absmldiff_m.get_vals(conts1, conts2, spacings, thicknesses, string=pretty)
+                area_diff = areadiff_m .get_vals(conts1, conts2, spacings, thicknesses, string=pretty)
+                dsc       = dsc_m      .get_vals(conts1, conts2, spacings, thicknesses, string=pretty)
+                hd        = hd_m       .get_vals(conts1, conts2, spacings, thicknesses, string=pretty)
+                for j, (cell, pos1, pos2, has_cont1, has_cont2) in enumerate(cells):
+                    cell2vals[cell] = [ml_diff[j], absmldiff[j], area_diff[j], dsc[j], hd[j], pos1, pos2, has_cont1, has_cont2]
+            for d in range(case1.categories[0].nr_slices):
+                row = [case1.case_name, d]
+                for contname in view.contour_names:
+                    cats1 = view.get_categories(case1, contname)
+                    row_extension = []
+                    for i in range(len(cats1)): row_extension.extend(cell2vals.get((d, contname, i), [np.nan for _ in range(9)]))
                     row.extend(self.resort(row_extension, cats1))
                 rows.append(row)
         cols = self.get_column_names(view, case1)
@@ -1,9 +1,8 @@
 # General information for Analyzer Tool loading & statistics
-# saving (to excel spreadsheet), displaying (to pyqt5 - class below)
+# saving (to excel spreadsheet), displaying (to pyqt5 - LazyLuna.Tables.DataFrameModel, imported on demand)
 
 import pandas
 from pandas import DataFrame
-from PyQt5 import Qt, QtWidgets, QtGui, QtCore, uic
 import traceback
 
 from LazyLuna.loading_functions import *
@@ -38,38 +37,11 @@ class Table:
         
     def to_pyqt5_table_model(self):
         """Provides interface for PyQt5"""
+        from LazyLuna.Tables.DataFrameModel import DataFrameModel
         return DataFrameModel(self.df)
     
-
-
-
-########################################################################
-## For conversion from Pandas DataFrame to PyQt5 Abstract Table Model ##
-########################################################################
-class DataFrameModel(QtGui.QStandardItemModel):
-    """Interface class to PyQt5 
-
-    Attributes:
-        _data (pandas.DataFrame): tabular data
-    """
-    def __init__(self, data, parent=None):
-        QtGui.QStandardItemModel.__init__(self, parent)
-        self._data = data
-        for i in range(len(data.columns)):
-            data_col = [QtGui.QStandardItem("{}".format(x)) for x in data.iloc[:,i].values]
-            self.appendColumn(data_col)
-        return
-    
-    def rowCount(self, parent=None): 
-        return len(self._data.values)
-    
-    def columnCount(self, parent=None): 
-        return self._data.columns.size
+    def to_pyqt5_proxy_model(self):
+        """Provides interface for PyQt5 with sorting and filtering (see LazyLuna.Tables.DataFrameModel.DataFrameProxyModel)"""
+        from LazyLuna.Tables.DataFrameModel import DataFrameModel, DataFrameProxyModel
+        return DataFrameProxyModel(DataFrameModel(self.df))
     
-    def headerData(self, x, orientation, role):
-        try:
-            if orientation==QtCore.Qt.Horizontal and role==QtCore.Qt.DisplayRole: return self._data.columns[x]
-            if orientation==QtCore.Qt.Vertical   and role==QtCore.Qt.DisplayRole: return self._data.index[x]
-        except Exception as e: print('WARNING in DataFrameModel!!!: ', traceback.format_exc())
-        return None
-    
\ No newline at end of file
@@ -1,18 +1,26 @@
-from LazyLuna.Tables.Table import *
+from LazyLuna.registry import Registry
 
-from LazyLuna.Tables.SAX_CINE_CC_Metrics_Table import *
-from LazyLuna.Tables.SAX_CINE_CCs_Metrics_Table import *
-from LazyLuna.Tables.LAX_CC_Metrics_Table import *
-from LazyLuna.Tables.LAX_CCs_MetricsTable import *
-from LazyLuna.Tables.T1_CC_Metrics_Table import *
-from LazyLuna.Tables.T1_CCs_MetricsTable import *
-from LazyLuna.Tables.T2_CC_Metrics_Table import *
-from LazyLuna.Tables.T2_CCs_Metrics_Table import *
+# Tables are imported when they are first requested (LazyLuna.Tables.registry, see LazyLuna.registry.Registry).
+# `from LazyLuna.Tables import *` imports all tables.
 
-from LazyLuna.Tables.CCs_CRTable import *
-from LazyLuna.Tables.SAX_Cine_CCs_pretty_averageCRs_averageMetrics_Table import *
-from LazyLuna.Tables.CC_OverviewTable import *
-from LazyLuna.Tables.CC_SAX_DiceTable import *
-from LazyLuna.Tables.CC_ClinicalResultsAveragesTable import *
-from LazyLuna.Tables.CC_AngleAvgT1ValuesTable import *
-from LazyLuna.Tables.CC_StatsOverviewTable import *
\ No newline at end of file
+registry = Registry({
+    'Table':                                               'LazyLuna.Tables.Table',
+
+    'SAX_CINE_CC_Metrics_Table':                           'LazyLuna.Tables.SAX_CINE_CC_Metrics_Table',
+    'SAX_CINE_CCs_Metrics_Table':                          'LazyLuna.Tables.SAX_CINE_CCs_Metrics_Table',
+    'LAX_CC_Metrics_Table':                                'LazyLuna.Tables.LAX_CC_Metrics_Table',
+    'LAX_CCs_MetricsTable':                                'LazyLuna.Tables.LAX_CCs_MetricsTable',
+    'T1_CC_Metrics_Table':                                 'LazyLuna.Tables.T1_CC_Metrics_Table',
+    'T1_CCs_MetricsTable':                                 'LazyLuna.Tables.T1_CCs_MetricsTable',
+    'T2_CC_Metrics_Table':                                 'LazyLuna.Tables.T2_CC_Metrics_Table',
+    'T2_CCs_Metrics_Table':                                'LazyLuna.Tables.T2_CCs_Metrics_Table',
+
+    'CC_ClinicalResultsTable':                             'LazyLuna.Tables.CCs_CRTable:CC_ClinicalResultsTable',
+    'CCs_ClinicalResultsTable':                            'LazyLuna.Tables.CC_CRTable:CCs_ClinicalResultsTable',
+    'SAX_Cine_CCs_pretty_averageCRs_averageMetrics_Table': 'LazyLuna.Tables.SAX_Cine_CCs_pretty_averageCRs_averageMetrics_Table',
+    'CC_OverviewTable':                                    'LazyLuna.Tables.CC_OverviewTable',
+    'CC_SAX_DiceTable':                                    'LazyLuna.Tables.CC_SAX_DiceTable',
+    'CC_ClinicalResultsAveragesTable':                     'LazyLuna.Tables.CC_ClinicalResultsAveragesTable',
+    'CC_AngleAvgT1ValuesTable':                            'LazyLuna.Tables.CC_AngleAvgT1ValuesTable',
+    'CC_StatsOverviewTable':                               'LazyLuna.Tables.CC_StatsOverviewTable'})
+registry.install(__name__)
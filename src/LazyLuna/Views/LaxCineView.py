@@ -2,10 +2,14 @@ from LazyLuna.Categories import *
 from LazyLuna.ClinicalResults import *
 from LazyLuna.Views.View import *
 
-from LazyLuna.Tables  import *
-from LazyLuna.Figures import *
+from LazyLuna.Tables import CC_ClinicalResultsAveragesTable, CCs_ClinicalResultsTable, LAX_CCs_MetricsTable
+from LazyLuna.registry import Registry
+from LazyLuna.utils import findCCsOverviewTab
+from LazyLuna.task_graph import Task_Graph, Export_Context, Ref, cohort_results_task, store_table, store_figure
+from LazyLuna.profiling import span
 
 import traceback
+from time import time
 
 import csv
 import PIL
@@ -34,12 +38,10 @@ class LAX_CINE_View(View):
         self.case_tabs  = {'Metrics and Figure': CC_Metrics_Tab}
         self.stats_tabs = {'Clinical Results'  : CCs_ClinicalResults_Tab}
         """
-        import LazyLuna.Guis.Addable_Tabs.CC_Metrics_Tab          as tab1
-        import LazyLuna.Guis.Addable_Tabs.CCs_ClinicalResults_tab as tab2
-        import LazyLuna.Guis.Addable_Tabs.CC_Overview_Tab         as tab4
-        
-        self.case_tabs  = {'Metrics and Figure': tab1.CC_Metrics_Tab, 'Clinical Results and Images': tab4.CC_CRs_Images_Tab}
-        self.stats_tabs = {'Clinical Results'  : tab2.CCs_ClinicalResults_Tab}
+        # register tabs here (imported when they are opened, see LazyLuna.registry.Registry):
+        self.case_tabs  = Registry({'Metrics and Figure':          'LazyLuna.Guis.Addable_Tabs.CC_Metrics_Tab:CC_Metrics_Tab',
+                                    'Clinical Results and Images': 'LazyLuna.Guis.Addable_Tabs.CC_Overview_Tab:CC_CRs_Images_Tab'})
+        self.stats_tabs = Registry({'Clinical Results': 'LazyLuna.Guis.Addable_Tabs.CCs_ClinicalResults_tab:CCs_ClinicalResults_Tab'})
         
     def load_categories(self):
         """
@@ -62,42 +64,13 @@ class LAX_CINE_View(View):
         return cats
 
     def initialize_case(self, case, debug=False):
-        if debug: st=time()
-        # switch images
-        case.imgs_sop2filepath = {**case.all_imgs_sop2filepath['LAX CINE 2CV'],
-                                  **case.all_imgs_sop2filepath['LAX CINE 4CV']}
-        # if categories have not been attached, attach the first and init other_categories
-        # otherwise it has categories and a type, so store the old categories for later use
-        if not hasattr(case, 'other_categories'): case.other_categories = dict()
-        """
-        case.attach_categories([LAX_4CV_LVES_Category, LAX_4CV_LVED_Category,
-                                LAX_4CV_RVES_Category, LAX_4CV_RVED_Category,
-                                LAX_4CV_LAES_Category, LAX_4CV_LAED_Category,
-                                LAX_4CV_RAES_Category, LAX_4CV_RAED_Category,
-                                LAX_2CV_LVES_Category, LAX_2CV_LVED_Category,
-                                LAX_2CV_LAES_Category, LAX_2CV_LAED_Category])
-        """
-        case.attach_categories([LAX_4CV_LAES_Category, LAX_4CV_LAED_Category,
-                                LAX_4CV_RAES_Category, LAX_4CV_RAED_Category,
-                                LAX_2CV_LAES_Category, LAX_2CV_LAED_Category])
-        case.other_categories['LAX CINE'] = case.categories
-        case.categories = []
-        if debug: print('Case categories are: ', case.categories)
-        # set new type
-        case.type = 'LAX CINE'
-        case.available_types.add('LAX CINE')
-        if debug: print('Customization in LAX CINE view took: ', time()-st)
-        return case
-    
-    def customize_case(self, case, debug=False):
-        if debug: st=time()
-        # switch images
-        case.imgs_sop2filepath = {**case.all_imgs_sop2filepath['LAX CINE 2CV'], 
-                                  **case.all_imgs_sop2filepath['LAX CINE 4CV']}
-        # if categories have not been attached, attach the first and init other_categories
-        # otherwise it has categories and a type, so store the old categories for later use
-        if not hasattr(case, 'categories'):
-            case.other_categories = dict()
+        with span(type(self).__name__ + '.initialize_case', debug=debug, view=self.name, case=case.case_name):
+            # switch images
+            case.imgs_sop2filepath = {**case.all_imgs_sop2filepath['LAX CINE 2CV'],
+                                      **case.all_imgs_sop2filepath['LAX CINE 4CV']}
+            # if categories have not been attached, attach the first and init other_categories
+            # otherwise it has categories and a type, so store the old categories for later use
+            if not hasattr(case, 'other_categories'): case.other_categories = dict()
             """
             case.attach_categories([LAX_4CV_LVES_Category, LAX_4CV_LVED_Category,
                                     LAX_4CV_RVES_Category, LAX_4CV_RVED_Category,
@@ -110,112 +83,140 @@ class LAX_CINE_View(View):
                                     LAX_4CV_RAES_Category, LAX_4CV_RAED_Category,
                                     LAX_2CV_LAES_Category, LAX_2CV_LAED_Category])
             case.other_categories['LAX CINE'] = case.categories
-        else:
-            if 'LAX CINE' in case.other_categories.keys(): case.categories = case.other_categories['LAX CINE']
-            else: 
+            case.categories = []
+            if debug: print('Case categories are: ', case.categories)
+            # set new type
+            case.type = 'LAX CINE'
+            case.available_types.add('LAX CINE')
+            return case
+    
+    def customize_case(self, case, debug=False):
+        with span(type(self).__name__ + '.customize_case', debug=debug, view=self.name, case=case.case_name):
+            # switch images
+            case.imgs_sop2filepath = {**case.all_imgs_sop2filepath['LAX CINE 2CV'], 
+                                      **case.all_imgs_sop2filepath['LAX CINE 4CV']}
+            # if categories have not been attached, attach the first and init other_categories
+            # otherwise it has categories and a type, so store the old categories for later use
+            if not hasattr(case, 'categories'):
+                case.other_categories = dict()
                 """
-                case.attach_categories(
-                [LAX_4CV_LVES_Category, LAX_4CV_LVED_Category,
-                 LAX_4CV_RVES_Category, LAX_4CV_RVED_Category,
-                 LAX_4CV_LAES_Category, LAX_4CV_LAED_Category,
-                 LAX_4CV_RAES_Category, LAX_4CV_RAED_Category,
-                 LAX_2CV_LVES_Category, LAX_2CV_LVED_Category,
-                 LAX_2CV_LAES_Category, LAX_2CV_LAED_Category])
-                 """
-                case.attach_categories(
-                [LAX_4CV_LAES_Category, LAX_4CV_LAED_Category,
-                 LAX_4CV_RAES_Category, LAX_4CV_RAED_Category,
-                 LAX_2CV_LAES_Category, LAX_2CV_LAED_Category])
-        if debug: print('Case categories are: ', case.categories)
-        # attach CRs
-        """
-        case.attach_clinical_results([LAX_4CV_LVESV,      LAX_4CV_LVEDV,
-                                      LAX_4CV_LVSV,       LAX_4CV_LVEF,
-                                      LAX_2CV_LVESV,      LAX_2CV_LVEDV,
-                                      LAX_2CV_LVSV,       LAX_2CV_LVEF,
-                                      LAX_2CV_LVM,        LAX_4CV_LVM,
-                                      LAX_BIPLANE_LVESV,  LAX_BIPLANE_LVEDV,
-                                      LAX_BIPLANE_LVSV,   LAX_BIPLANE_LVEF,
-                                      LAX_4CV_RAESAREA,   LAX_4CV_RAEDAREA,
-                                      LAX_4CV_RAESV,      LAX_4CV_RAEDV,
-                                      LAX_4CV_LAESAREA,   LAX_4CV_LAEDAREA,
-                                      LAX_4CV_LAESV,      LAX_4CV_LAEDV,
-                                      LAX_2CV_LAESAREA,   LAX_2CV_LAEDAREA,
-                                      LAX_2CV_LAESV,      LAX_2CV_LAEDV,
-                                      LAX_BIPLANAR_LAESV, LAX_BIPLANAR_LAEDV,
-                                 LAX_2CV_ESAtrialFatArea, LAX_2CV_EDAtrialFatArea, 
-                                 LAX_4CV_ESAtrialFatArea, LAX_4CV_EDAtrialFatArea,
-                       LAX_2CV_ESEpicardialFatArea,  LAX_2CV_EDEpicardialFatArea,
-                       LAX_4CV_ESEpicardialFatArea,  LAX_4CV_EDEpicardialFatArea,
-                       LAX_2CV_ESPericardialFatArea, LAX_2CV_EDPericardialFatArea,
-                       LAX_4CV_ESPericardialFatArea, LAX_4CV_EDPericardialFatArea])
-        """
-        case.attach_clinical_results([LAX_4CV_RAESAREA,   LAX_4CV_RAEDAREA,
-                                      #LAX_4CV_RAESV,      LAX_4CV_RAEDV,
-                                      LAX_4CV_LAESAREA,   LAX_4CV_LAEDAREA,
-                                      #LAX_4CV_LAESV,      LAX_4CV_LAEDV,
-                                      LAX_2CV_LAESAREA,   LAX_2CV_LAEDAREA,
-                                      #LAX_2CV_LAESV,      LAX_2CV_LAEDV,
-                                      #LAX_BIPLANAR_LAESV, LAX_BIPLANAR_LAEDV,
-                                      LAX_4CV_LAESPHASE,  LAX_4CV_LAEDPHASE,
-                                      LAX_2CV_LAESPHASE,  LAX_2CV_LAEDPHASE,
-                                      LAX_4CV_RAESPHASE,  LAX_4CV_RAEDPHASE])
-        # set new type
-        case.type = 'LAX CINE'
-        if debug: print('Customization in LAX CINE view took: ', time()-st)
-        return case
+                case.attach_categories([LAX_4CV_LVES_Category, LAX_4CV_LVED_Category,
+                                        LAX_4CV_RVES_Category, LAX_4CV_RVED_Category,
+                                        LAX_4CV_LAES_Category, LAX_4CV_LAED_Category,
+                                        LAX_4CV_RAES_Category, LAX_4CV_RAED_Category,
+                                        LAX_2CV_LVES_Category, LAX_2CV_LVED_Category,
+                                        LAX_2CV_LAES_Category, LAX_2CV_LAED_Category])
+                """
+                case.attach_categories([LAX_4CV_LAES_Category, LAX_4CV_LAED_Category,
+                                        LAX_4CV_RAES_Category, LAX_4CV_RAED_Category,
+                                        LAX_2CV_LAES_Category, LAX_2CV_LAED_Category])
+                case.other_categories['LAX CINE'] = case.categories
+            else:
+                if 'LAX CINE' in case.other_categories.keys(): case.categories = case.other_categories['LAX CINE']
+                else: 
+                    """
+                    case.attach_categories(
+                    [LAX_4CV_LVES_Category, LAX_4CV_LVED_Category,
+                     LAX_4CV_RVES_Category, LAX_4CV_RVED_Category,
+                     LAX_4CV_LAES_Category, LAX_4CV_LAED_Category,
+                     LAX_4CV_RAES_Category, LAX_4CV_RAED_Category,
+                     LAX_2CV_LVES_Category, LAX_2CV_LVED_Category,
+                     LAX_2CV_LAES_Category, LAX_2CV_LAED_Category])
+                     """
+                    case.attach_categories(
+                    [LAX_4CV_LAES_Category, LAX_4CV_LAED_Category,
+                     LAX_4CV_RAES_Category, LAX_4CV_RAED_Category,
+                     LAX_2CV_LAES_Category, LAX_2CV_LAED_Category])
+            if debug: print('Case categories are: ', case.categories)
+            # attach CRs
+            """
+            case.attach_clinical_results([LAX_4CV_LVESV,      LAX_4CV_LVEDV,
+                                          LAX_4CV_LVSV,       LAX_4CV_LVEF,
+                                          LAX_2CV_LVESV,      LAX_2CV_LVEDV,
+                                          LAX_2CV_LVSV,       LAX_2CV_LVEF,
+                                          LAX_2CV_LVM,        LAX_4CV_LVM,
+                                          LAX_BIPLANE_LVESV,  LAX_BIPLANE_LVEDV,
+                                          LAX_BIPLANE_LVSV,   LAX_BIPLANE_LVEF,
+                                          LAX_4CV_RAESAREA,   LAX_4CV_RAEDAREA,
+                                          LAX_4CV_RAESV,      LAX_4CV_RAEDV,
+                                          LAX_4CV_LAESAREA,   LAX_4CV_LAEDAREA,
+                                          LAX_4CV_LAESV,      LAX_4CV_LAEDV,
+                                          LAX_2CV_LAESAREA,   LAX_2CV_LAEDAREA,
+                                          LAX_2CV_LAESV,      LAX_2CV_LAEDV,
+                                          LAX_BIPLANAR_LAESV, LAX_BIPLANAR_LAEDV,
+                                     LAX_2CV_ESAtrialFatArea, LAX_2CV_EDAtrialFatArea, 
+                                     LAX_4CV_ESAtrialFatArea, LAX_4CV_EDAtrialFatArea,
+                           LAX_2CV_ESEpicardialFatArea,  LAX_2CV_EDEpicardialFatArea,
+                           LAX_4CV_ESEpicardialFatArea,  LAX_4CV_EDEpicardialFatArea,
+                           LAX_2CV_ESPericardialFatArea, LAX_2CV_EDPericardialFatArea,
+                           LAX_4CV_ESPericardialFatArea, LAX_4CV_EDPericardialFatArea])
+            """
+            case.attach_clinical_results([LAX_4CV_RAESAREA,   LAX_4CV_RAEDAREA,
+                                          #LAX_4CV_RAESV,      LAX_4CV_RAEDV,
+                                          LAX_4CV_LAESAREA,   LAX_4CV_LAEDAREA,
+                                          #LAX_4CV_LAESV,      LAX_4CV_LAEDV,
+                                          LAX_2CV_LAESAREA,   LAX_2CV_LAEDAREA,
+                                          #LAX_2CV_LAESV,      LAX_2CV_LAEDV,
+                                          #LAX_BIPLANAR_LAESV, LAX_BIPLANAR_LAEDV,
+                                          LAX_4CV_LAESPHASE,  LAX_4CV_LAEDPHASE,
+                                          LAX_2CV_LAESPHASE,  LAX_2CV_LAEDPHASE,
+                                          LAX_4CV_RAESPHASE,  LAX_4CV_RAEDPHASE])
+            # set new type
+            case.type = 'LAX CINE'
+            return case
     
-    def store_information(self, ccs, path, icon_path, storage_version=0):
-        if storage_version >= 0:
-            try:
-                cr_table = CC_ClinicalResultsAveragesTable()
-                cr_table.calculate(ccs)
-                crtol_p = cr_table.store(os.path.join(path, 'clinical_results_overview.csv'))
-            except Exception as e:
-                print(traceback.print_exc())
-            try:
-                cr_table = CCs_ClinicalResultsTable()
-                cr_table.calculate(ccs)
-                cr_table.store(os.path.join(path, 'clinical_results.csv'))
-            except Exception as e:
-                print(traceback.print_exc())
-            try:
-                cr_overview_figure = LAX_BlandAltman()
-                cr_overview_figure.visualize(self, ccs)
-                cr_p = cr_overview_figure.store(path)
-            except Exception as e:
-                print(traceback.print_exc())
-            try:
-                metrics_table = LAX_CCs_MetricsTable()
-                metrics_table.calculate(self, ccs)
-                metrics_table.store(os.path.join(path, 'metrics_phase_slice_table.csv'))
-            except Exception as e:
-                print(traceback.print_exc())
+    def store_information(self, ccs, path, icon_path, storage_version=0, workers=None):
+        """Takes a list of LazyLuna.Containers.Case_Comparison objects and stores tables, figures and a pdf report
+        
+        Note:
+            The export is run as task graph (see export_graph), independent tables and figures are calculated in parallel worker processes.
+            
+        Args:
+            ccs (list of LazyLuna.Containers.Case_Comparison): The case_comparisons to be analyzed
+            path (str): Path to storage folder
+            icon_path (str): Path to the icons of the report
+            storage_version (int): 0 for the basic export, 1 adds the volume Bland-Altman figure
+            workers (int): number of worker processes, defaults to the number of cores, 1 exports in this process
+        """
+        st = time()
+        if storage_version>=0:
             try:
                 failed_segmentation_folder_path = os.path.join(path, 'Failed_Segmentations')
                 if not os.path.exists(failed_segmentation_folder_path): os.mkdir(failed_segmentation_folder_path)
-                """
-                failed_annotation_comparison = Failed_Annotation_Comparison_Yielder()
-                failed_annotation_comparison.set_values(self, ccs)
-                failed_annotation_comparison.store(failed_segmentation_folder_path)
-                """
-            except Exception as e:
-                print(traceback.print_exc())
-            try:
-                conf_visualization = LAXCINE_Confidence_Intervals_Tolerance_Ranges()
-                conf_visualization.visualize(ccs)
-                tol_p = conf_visualization.store(path)
-            except Exception as e:
-                print(traceback.print_exc())
+            except Exception as e: print(traceback.print_exc())
+        graph = self.export_graph(icon_path, storage_version)
+        graph.run(Export_Context(self, ccs, path), workers=workers)
+        print(graph.report())
+        print('Storing took: ', time()-st)
+    
+    def export_graph(self, icon_path, storage_version=0):
+        """Declares the export of store_information as task graph
         
-        if storage_version >= 1:
-            try:
-                cr_overview_figure = LAX_Volumes_BlandAltman()
-                cr_overview_figure.visualize(self, ccs)
-                crvol_p = cr_overview_figure.store(path)
-            except Exception as e:
-                print(traceback.print_exc())
+        Args:
+            icon_path (str): Path to the icons of the report
+            storage_version (int): see store_information
             
+        Returns:
+            LazyLuna.task_graph.Task_Graph: tables and figures return the paths of their files, the report depends on all of them
+        """
+        from LazyLuna.Figures import LAX_BlandAltman, LAX_Volumes_BlandAltman, LAXCINE_Confidence_Intervals_Tolerance_Ranges
+        g, view, ccs = Task_Graph(), Ref('view'), Ref('ccs')
+        if storage_version>=0:
+            g.add('cohort_results',    cohort_results_task, local=True)
+            g.add('cr_overview_table', store_table,  CC_ClinicalResultsAveragesTable, 'clinical_results_overview.csv', ccs, deps=['cohort_results'])
+            g.add('cr_table',          store_table,  CCs_ClinicalResultsTable,        'clinical_results.csv',          ccs, deps=['cohort_results'])
+            g.add('cr_figure',         store_figure, LAX_BlandAltman, view, ccs)
+            g.add('metrics_table',     store_table,  LAX_CCs_MetricsTable, 'metrics_phase_slice_table.csv', view, ccs)
+            g.add('tol_figure',        store_figure, LAXCINE_Confidence_Intervals_Tolerance_Ranges, ccs)
+        if storage_version>=1:
+            g.add('crvol_figure',      store_figure, LAX_Volumes_BlandAltman, view, ccs)
+        g.add('report', self.store_report, icon_path, storage_version, deps=list(g.tasks.keys()), local=True)
+        return g
+    
+    def store_report(self, context, icon_path, storage_version=0, **paths):
+        """Stores the pdf report from the files of the export's tables and figures (paths by task name, see export_graph)"""
+        path = context.path
+        cr_p, tol_p, crvol_p = paths.get('cr_figure'), paths.get('tol_figure'), paths.get('crvol_figure')
         
         pdf = PDF(orientation='P', unit='mm', format='A4')
         
@@ -291,4 +292,5 @@ class LAX_CINE_View(View):
         
         pdf.set_author('Luna Lovegood')
         pdf.output(os.path.join(path, view_name+'_report.pdf'))
+        return os.path.join(path, view_name+'_report.pdf')
         
\ No newline at end of file
@@ -2,8 +2,11 @@ from LazyLuna.Categories import *
 from LazyLuna.ClinicalResults import *
 from LazyLuna.Views.View import *
 
-from LazyLuna.Tables  import *
-from LazyLuna.Figures import *
+from LazyLuna.Tables import CC_ClinicalResultsAveragesTable, CCs_ClinicalResultsTable, SAX_CINE_CCs_Metrics_Table, SAX_Cine_CCs_pretty_averageCRs_averageMetrics_Table
+from LazyLuna.registry import Registry
+from LazyLuna.utils import findCCsOverviewTab
+from LazyLuna.task_graph import Task_Graph, Export_Context, Ref, cohort_results_task, store_table, store_figure
+from LazyLuna.profiling import span
 
 import traceback
 
@@ -13,6 +16,17 @@ import PIL
 import time
 
 
+def store_position_tables(context):
+    # metrics by contour position and clinical results with metric averages (storage_version 1)
+    table = SAX_Cine_CCs_pretty_averageCRs_averageMetrics_Table()
+    table.calculate(context.ccs, context.view)
+    table.present_metrics()
+    table.store(os.path.join(context.path, 'metrics_table_by_contour_position.csv'))
+    table.present_crs()
+    table.store(os.path.join(context.path, 'crvs_and_metrics.csv'))
+    return os.path.join(context.path, 'crvs_and_metrics.csv')
+
+
 class SAX_CINE_View(View):
     def __init__(self):
         self.name = 'SAX CINE'
@@ -24,15 +38,11 @@ class SAX_CINE_View(View):
                               'rv_endo', 'rv_epi', 'rv_pamu', 'rv_myo']
         self.cmap = 'gray'
         
-        import LazyLuna.Guis.Addable_Tabs.CC_Metrics_Tab                      as tab1
-        import LazyLuna.Guis.Addable_Tabs.CCs_ClinicalResults_tab             as tab2
-        import LazyLuna.Guis.Addable_Tabs.CCs_Qualitative_Correlationplot_Tab as tab3
-        import LazyLuna.Guis.Addable_Tabs.CC_Overview_Tab                     as tab4
-        
-        self.case_tabs  = {'Metrics and Figure':          tab1.CC_Metrics_Tab, 
-                           'Clinical Results and Images': tab4.CC_CRs_Images_Tab}
-        self.stats_tabs = {'Clinical Results':            tab2.CCs_ClinicalResults_Tab, 
-                           'Qualitative Metrics Correlation Plot': tab3.CCs_Qualitative_Correlationplot_Tab}
+        # register tabs here (imported when they are opened, see LazyLuna.registry.Registry):
+        self.case_tabs  = Registry({'Metrics and Figure':          'LazyLuna.Guis.Addable_Tabs.CC_Metrics_Tab:CC_Metrics_Tab',
+                                    'Clinical Results and Images': 'LazyLuna.Guis.Addable_Tabs.CC_Overview_Tab:CC_CRs_Images_Tab'})
+        self.stats_tabs = Registry({'Clinical Results':                     'LazyLuna.Guis.Addable_Tabs.CCs_ClinicalResults_tab:CCs_ClinicalResults_Tab',
+                                    'Qualitative Metrics Correlation Plot': 'LazyLuna.Guis.Addable_Tabs.CCs_Qualitative_Correlationplot_Tab:CCs_Qualitative_Correlationplot_Tab'})
         
     def load_categories(self):
         self.lvcats, self.rvcats  = [SAX_LV_ES_Category, SAX_LV_ED_Category], [SAX_RV_ES_Category, SAX_RV_ED_Category]
@@ -45,97 +55,98 @@ class SAX_CINE_View(View):
         return cats
 
     def initialize_case(self, case, debug=False):
-        if debug: st=time()
-        # switch images
-        case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX CINE']
-        # if categories have not been attached, attach the first and init other_categories
-        # otherwise it has categories and a type, so store the old categories for later use
-        if not hasattr(case, 'other_categories'): case.other_categories = dict()
-        case.attach_categories([SAX_LV_ES_Category, SAX_LV_ED_Category, SAX_RV_ES_Category, SAX_RV_ED_Category])
-        case.other_categories['SAX CINE'] = case.categories
-        case.categories = []
-        if debug: print('Case categories are: ', case.categories)
-        # set new type
-        case.type = 'SAX CINE'
-        case.available_types.add('SAX CINE')
-        if debug: print('Customization in SAX CINE view took: ', time()-st)
-        return case
-    
-    def customize_case(self, case, debug=False):
-        if debug: st=time()
-        # switch images
-        case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX CINE']
-        # if categories have not been attached, attach the first and init other_categories
-        # otherwise it has categories and a type, so store the old categories for later use
-        if not hasattr(case, 'categories'):
-            case.other_categories = dict()
+        with span(type(self).__name__ + '.initialize_case', debug=debug, view=self.name, case=case.case_name):
+            # switch images
+            case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX CINE']
+            # if categories have not been attached, attach the first and init other_categories
+            # otherwise it has categories and a type, so store the old categories for later use
+            if not hasattr(case, 'other_categories'): case.other_categories = dict()
             case.attach_categories([SAX_LV_ES_Category, SAX_LV_ED_Category, SAX_RV_ES_Category, SAX_RV_ED_Category])
             case.other_categories['SAX CINE'] = case.categories
-        else:
-            if 'SAX CINE' in case.other_categories.keys(): case.categories = case.other_categories['SAX CINE']
-            else: case.attach_categories([SAX_LV_ES_Category, SAX_LV_ED_Category, SAX_RV_ES_Category, SAX_RV_ED_Category])
-        if debug: print('Case categories are: ', case.categories)
-        # attach CRs
-        case.attach_clinical_results([LVSAX_ESV, LVSAX_EDV, RVSAX_ESV, RVSAX_EDV,
-                                      LVSAX_SV, LVSAX_EF, RVSAX_SV, RVSAX_EF,
-                                      LVSAX_MYO, RVSAX_MYO, LVSAX_ESPAPMUM, LVSAX_EDPAPMUM,
-                                      LVSAX_ESPHASE, RVSAX_ESPHASE, LVSAX_EDPHASE, RVSAX_EDPHASE,
-                                      NR_SLICES])
-        # set new type
-        case.type = 'SAX CINE'
-        if debug: print('Customization in SAX CINE view took: ', time()-st)
-        return case
+            case.categories = []
+            if debug: print('Case categories are: ', case.categories)
+            # set new type
+            case.type = 'SAX CINE'
+            case.available_types.add('SAX CINE')
+            return case
     
-    def store_information(self, ccs, path, icon_path, storage_version=0):
+    def customize_case(self, case, debug=False):
+        with span(type(self).__name__ + '.customize_case', debug=debug, view=self.name, case=case.case_name):
+            # switch images
+            case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX CINE']
+            # if categories have not been attached, attach the first and init other_categories
+            # otherwise it has categories and a type, so store the old categories for later use
+            if not hasattr(case, 'categories'):
+                case.other_categories = dict()
+                case.attach_categories([SAX_LV_ES_Category, SAX_LV_ED_Category, SAX_RV_ES_Category, SAX_RV_ED_Category])
+                case.other_categories['SAX CINE'] = case.categories
+            else:
+                if 'SAX CINE' in case.other_categories.keys(): case.categories = case.other_categories['SAX CINE']
+                else: case.attach_categories([SAX_LV_ES_Category, SAX_LV_ED_Category, SAX_RV_ES_Category, SAX_RV_ED_Category])
+            if debug: print('Case categories are: ', case.categories)
+            # attach CRs
+            case.attach_clinical_results([LVSAX_ESV, LVSAX_EDV, RVSAX_ESV, RVSAX_EDV,
+                                          LVSAX_SV, LVSAX_EF, RVSAX_SV, RVSAX_EF,
+                                          LVSAX_MYO, RVSAX_MYO, LVSAX_ESPAPMUM, LVSAX_EDPAPMUM,
+                                          LVSAX_ESPHASE, RVSAX_ESPHASE, LVSAX_EDPHASE, RVSAX_EDPHASE,
+                                          NR_SLICES])
+            # set new type
+            case.type = 'SAX CINE'
+            return case
+    
+    def store_information(self, ccs, path, icon_path, storage_version=0, workers=None):
+        """Takes a list of LazyLuna.Containers.Case_Comparison objects and stores tables, figures and a pdf report
+        
+        Note:
+            The export is run as task graph (see export_graph), independent tables and figures are calculated in parallel worker processes.
+            
+        Args:
+            ccs (list of LazyLuna.Containers.Case_Comparison): The case_comparisons to be analyzed
+            path (str): Path to storage folder
+            icon_path (str): Path to the icons of the report
+            storage_version (int): 0 for the basic export, 1 adds tables by contour position
+            workers (int): number of worker processes, defaults to the number of cores, 1 exports in this process
+        """
         st = time.time()
-        if storage_version >= 0:
-            try:
-                cr_table = CC_ClinicalResultsAveragesTable()
-                cr_table.calculate(ccs)
-                crtol_p = cr_table.store(os.path.join(path, 'clinical_results_overview.csv'))
-            except Exception as e: print(traceback.print_exc())
-            try:
-                cr_table = CCs_ClinicalResultsTable()
-                cr_table.calculate(ccs)
-                cr_table.store(os.path.join(path, 'clinical_results.csv'))
-            except Exception as e: print(traceback.print_exc())
-            try:
-                cr_overview_figure = SAX_BlandAltman()
-                cr_overview_figure.visualize(ccs)
-                cr_p = cr_overview_figure.store(path)
-            except Exception as e: print(traceback.print_exc())
-            try:
-                ci_figure = SAXCINE_Confidence_Intervals_Tolerance_Ranges()
-                ci_figure.visualize(ccs, True)
-                ci_p = ci_figure.store(path)
-            except Exception as e: print(traceback.print_exc())
-            try:
-                metrics_table = SAX_CINE_CCs_Metrics_Table()
-                metrics_table.calculate(self, ccs)
-                metrics_table.store(os.path.join(path, 'metrics_phase_slice_table.csv'))
-            except Exception as e: print(traceback.print_exc())
+        if storage_version>=0:
             try:
                 failed_segmentation_folder_path = os.path.join(path, 'Failed_Segmentations')
                 if not os.path.exists(failed_segmentation_folder_path): os.mkdir(failed_segmentation_folder_path)
-                """
-                failed_annotation_comparison = Failed_Annotation_Comparison_Yielder()
-                failed_annotation_comparison.set_values(self, ccs)
-                failed_annotation_comparison.store(failed_segmentation_folder_path)
-                """
-            except Exception as e: print(traceback.print_exc())
-        if storage_version >= 1:
-            try:
-                table = SAX_Cine_CCs_pretty_averageCRs_averageMetrics_Table()
-                table.calculate(ccs, self)
-                table.present_metrics()
-                table.store(os.path.join(path, 'metrics_table_by_contour_position.csv'))
-                table.present_crs()
-                table.store(os.path.join(path, 'crvs_and_metrics.csv'))
             except Exception as e: print(traceback.print_exc())
-            
+        graph = self.export_graph(icon_path, storage_version)
+        graph.run(Export_Context(self, ccs, path), workers=workers)
+        print(graph.report())
         print('Storing took: ', time.time()-st)
-        st = time.time()
+    
+    def export_graph(self, icon_path, storage_version=0):
+        """Declares the export of store_information as task graph
+        
+        Args:
+            icon_path (str): Path to the icons of the report
+            storage_version (int): see store_information
             
+        Returns:
+            LazyLuna.task_graph.Task_Graph: tables and figures return the paths of their files, the report depends on all of them
+        """
+        from LazyLuna.Figures import SAX_BlandAltman, SAXCINE_Confidence_Intervals_Tolerance_Ranges
+        g, view, ccs = Task_Graph(), Ref('view'), Ref('ccs')
+        if storage_version>=0:
+            g.add('cohort_results',    cohort_results_task, local=True)
+            g.add('cr_overview_table', store_table,  CC_ClinicalResultsAveragesTable, 'clinical_results_overview.csv', ccs, deps=['cohort_results'])
+            g.add('cr_table',          store_table,  CCs_ClinicalResultsTable,        'clinical_results.csv',          ccs, deps=['cohort_results'])
+            g.add('cr_figure',         store_figure, SAX_BlandAltman, ccs, deps=['cohort_results'])
+            g.add('ci_figure',         store_figure, SAXCINE_Confidence_Intervals_Tolerance_Ranges, ccs, True)
+            g.add('metrics_table',     store_table,  SAX_CINE_CCs_Metrics_Table, 'metrics_phase_slice_table.csv', view, ccs)
+        if storage_version>=1:
+            g.add('position_tables',   store_position_tables)
+        g.add('report', self.store_report, icon_path, storage_version, deps=list(g.tasks.keys()), local=True)
+        return g
+    
+    def store_report(self, context, icon_path, storage_version=0, **paths):
+        """Stores the pdf report from the files of the export's tables and figures (paths by task name, see export_graph)"""
+        path = context.path
+        cr_p, ci_p = paths.get('cr_figure'), paths.get('ci_figure')
+        
         pdf = PDF(orientation='P', unit='mm', format='A4')
         
         if storage_version>=0:
@@ -213,9 +224,6 @@ class SAX_CINE_View(View):
                 pdf.set_text('Table. 2 Clinical Parameters and Metrics Table: The columns are Name (either clinical parameter or metric), Mean and Standard deviation (for difference if clinical parameter, or mean value for metric). Legend: LV: Left ventricle, RV: Right ventricle, EF: Ejection fraction, EDV: end-diastolic volume, ESV: end-systolic volume, Dice: Dice similarity coefficient, HD: Hausdorff distance', 10, 223)
             except: print(traceback.print_exc())
         
-        print('Time for stats in pdf took: ', time.time()-st)
-        
-        st = time.time()
         # ADD the QUALITATIVE FIGURES
         try:
             overviewtab = findCCsOverviewTab()
@@ -238,9 +246,8 @@ class SAX_CINE_View(View):
                     pdf.set_text(addable[2], 10, 40 + 695/4*scale)
         except Exception as e: print(traceback.print_exc())
         
-        print('PDF TOOK: ', time.time()-st)
-        
         pdf.set_author('Luna Lovegood')
         pdf.output(os.path.join(path, view_name+'_report.pdf'))
+        return os.path.join(path, view_name+'_report.pdf')
         
             
@@ -2,8 +2,7 @@ from LazyLuna.Categories import *
 from LazyLuna.ClinicalResults import *
 from LazyLuna.Views.SaxCineView import SAX_CINE_View
 
-from LazyLuna.Tables  import *
-from LazyLuna.Figures import *
+from LazyLuna.profiling import span
 
 import traceback
 
@@ -15,38 +14,36 @@ class SAX_CS_View(SAX_CINE_View):
         self.cmap = 'gray'
 
     def initialize_case(self, case, debug=False):
-        if debug: st=time()
-        # switch images
-        case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX CS']
-        # if categories have not been attached, attach the first and init other_categories
-        # otherwise it has categories and a type, so store the old categories for later use
-        if not hasattr(case, 'other_categories'): case.other_categories = dict()
-        case.attach_categories([SAX_LV_ES_Category, SAX_LV_ED_Category, SAX_RV_ES_Category, SAX_RV_ED_Category])
-        case.other_categories['SAX CS'] = case.categories
-        case.categories = []
-        if debug: print('Case categories are: ', case.categories)
-        # set new type
-        case.type = 'SAX CS'
-        case.available_types.add('SAX CS')
-        if debug: print('Customization in SAX CS view took: ', time()-st)
-        return case
+        with span(type(self).__name__ + '.initialize_case', debug=debug, view=self.name, case=case.case_name):
+            # switch images
+            case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX CS']
+            # if categories have not been attached, attach the first and init other_categories
+            # otherwise it has categories and a type, so store the old categories for later use
+            if not hasattr(case, 'other_categories'): case.other_categories = dict()
+            case.attach_categories([SAX_LV_ES_Category, SAX_LV_ED_Category, SAX_RV_ES_Category, SAX_RV_ED_Category])
+            case.other_categories['SAX CS'] = case.categories
+            case.categories = []
+            if debug: print('Case categories are: ', case.categories)
+            # set new type
+            case.type = 'SAX CS'
+            case.available_types.add('SAX CS')
+            return case
         
     def customize_case(self, case, debug=False):
-        if debug: st=time()
-        # switch images
-        case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX CS']
-        # if categories have not been attached, attach the first and init other_categories
-        # otherwise it has categories and a type, so store the old categories for later use
-        if 'SAX CS' in case.other_categories.keys(): case.categories = case.other_categories['SAX CS']
-        else: case.attach_categories([SAX_LV_ES_Category, SAX_LV_ED_Category, SAX_RV_ES_Category, SAX_RV_ED_Category])
-        if debug: print('Case categories are: ', case.categories)
-        # attach CRs
-        case.attach_clinical_results([LVSAX_ESV, LVSAX_EDV, RVSAX_ESV, RVSAX_EDV,
-                                      LVSAX_SV, LVSAX_EF, RVSAX_SV, RVSAX_EF,
-                                      LVSAX_MYO, RVSAX_MYO,
-                                      LVSAX_ESPHASE, RVSAX_ESPHASE, LVSAX_EDPHASE, RVSAX_EDPHASE,
-                                      NR_SLICES])
-        # set new type
-        case.type = 'SAX CS'
-        if debug: print('Customization in SAX CS view took: ', time()-st)
-        return case
\ No newline at end of file
+        with span(type(self).__name__ + '.customize_case', debug=debug, view=self.name, case=case.case_name):
+            # switch images
+            case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX CS']
+            # if categories have not been attached, attach the first and init other_categories
+            # otherwise it has categories and a type, so store the old categories for later use
+            if 'SAX CS' in case.other_categories.keys(): case.categories = case.other_categories['SAX CS']
+            else: case.attach_categories([SAX_LV_ES_Category, SAX_LV_ED_Category, SAX_RV_ES_Category, SAX_RV_ED_Category])
+            if debug: print('Case categories are: ', case.categories)
+            # attach CRs
+            case.attach_clinical_results([LVSAX_ESV, LVSAX_EDV, RVSAX_ESV, RVSAX_EDV,
+                                          LVSAX_SV, LVSAX_EF, RVSAX_SV, RVSAX_EF,
+                                          LVSAX_MYO, RVSAX_MYO,
+                                          LVSAX_ESPHASE, RVSAX_ESPHASE, LVSAX_EDPHASE, RVSAX_EDPHASE,
+                                          NR_SLICES])
+            # set new type
+            case.type = 'SAX CS'
+            return case
\ No newline at end of file
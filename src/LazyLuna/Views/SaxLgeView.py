@@ -2,10 +2,14 @@ from LazyLuna.Categories import *
 from LazyLuna.ClinicalResults import *
 from LazyLuna.Views.View import *
 
-from LazyLuna.Tables  import *
-from LazyLuna.Figures import *
+from LazyLuna.Tables import CC_ClinicalResultsAveragesTable, CCs_ClinicalResultsTable, T1_CCs_MetricsTable
+from LazyLuna.registry import Registry
+from LazyLuna.utils import findCCsOverviewTab
+from LazyLuna.task_graph import Task_Graph, Export_Context, Ref, cohort_results_task, store_table, store_figure
+from LazyLuna.profiling import span
 
 import traceback
+from time import time
 
 import csv
 import PIL
@@ -23,13 +27,10 @@ class SAX_LGE_View(View):
         self.contour2categorytype = {cname:self.all for cname in self.contour_names}
         self.cmap = 'gray'
         
-        # register tabs here:
-        import LazyLuna.Guis.Addable_Tabs.CC_Metrics_Tab          as tab1
-        import LazyLuna.Guis.Addable_Tabs.CCs_ClinicalResults_tab as tab2
-        import LazyLuna.Guis.Addable_Tabs.CC_Overview_Tab         as tab4
-        
-        self.case_tabs  = {'Metrics and Figure': tab1.CC_Metrics_Tab, 'Clinical Results and Images': tab4.CC_CRs_Images_Tab}
-        self.stats_tabs = {'Clinical Results'  : tab2.CCs_ClinicalResults_Tab}
+        # register tabs here (imported when they are opened, see LazyLuna.registry.Registry):
+        self.case_tabs  = Registry({'Metrics and Figure':          'LazyLuna.Guis.Addable_Tabs.CC_Metrics_Tab:CC_Metrics_Tab',
+                                    'Clinical Results and Images': 'LazyLuna.Guis.Addable_Tabs.CC_Overview_Tab:CC_CRs_Images_Tab'})
+        self.stats_tabs = Registry({'Clinical Results': 'LazyLuna.Guis.Addable_Tabs.CCs_ClinicalResults_tab:CCs_ClinicalResults_Tab'})
         
     def load_categories(self):
         self.all = [SAX_LGE_Category]
@@ -40,88 +41,97 @@ class SAX_LGE_View(View):
         return cats
 
     def initialize_case(self, case, cvi_preprocess=False, debug=False):
-        if debug: st=time()
-        # switch images
-        case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX LGE']
-        # if categories have not been attached, attach the first and init other_categories
-        # otherwise it has categories and a type, so store the old categories for later use
-        if not hasattr(case, 'other_categories'): case.other_categories = dict()
-        case.attach_categories([SAX_LGE_Category])
-        # A SCAR calculating preprocessing step is necessary for LGE
-        if debug: st_preprocess = time()
-        cat = case.categories[0]
-        if cvi_preprocess:
-            cat.preprocess_scars()
-        if debug: print('Calculating scars took: ', time()-st_preprocess)
-        if debug: print('Set of anno keys are: ', list(set([akey for a in cat.get_annos() for akey in a.anno.keys()])))
-        case.other_categories['SAX LGE'] = case.categories
-        case.categories = []
-        if debug: print('Case categories are: ', case.categories)
+        with span(type(self).__name__ + '.initialize_case', debug=debug, view=self.name, case=case.case_name):
+            # switch images
+            case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX LGE']
+            # if categories have not been attached, attach the first and init other_categories
+            # otherwise it has categories and a type, so store the old categories for later use
+            if not hasattr(case, 'other_categories'): case.other_categories = dict()
+            case.attach_categories([SAX_LGE_Category])
+            # A SCAR calculating preprocessing step is necessary for LGE
+            cat = case.categories[0]
+            if cvi_preprocess:
+                with span('SAX_LGE_Category.preprocess_scars', debug=debug): cat.preprocess_scars()
+            if debug: print('Set of anno keys are: ', list(set([akey for a in cat.get_annos() for akey in a.anno.keys()])))
+            case.other_categories['SAX LGE'] = case.categories
+            case.categories = []
+            if debug: print('Case categories are: ', case.categories)
         
-        # set new type
-        case.type = 'SAX LGE'
-        case.available_types.add('SAX LGE')
-        if debug: print('Customization in SAX LGE view took: ', time()-st)
-        return case
+            # set new type
+            case.type = 'SAX LGE'
+            case.available_types.add('SAX LGE')
+            return case
     
     def customize_case(self, case, debug=False):
-        if debug: st=time()
-        # switch images
-        case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX LGE']
-        # if categories have not been attached, attach the first and init other_categories
-        # otherwise it has categories and a type, so store the old categories for later use
-        if not hasattr(case, 'categories'):
-            case.other_categories = dict()
-            case.attach_categories([SAX_LGE_Category])
-            case.other_categories['SAX LGE'] = case.categories
-        else:
-            if 'SAX LGE' in case.other_categories.keys(): case.categories = case.other_categories['SAX LGE']
-            else: case.attach_categories([SAX_LGE_Category])
-        if debug: print('Case categories are: ', case.categories)
-        # attach CRs
-        case.attach_clinical_results([SAXLGE_LVV,         SAXLGE_LVMYOV, 
-                                      SAXLGE_LVMYOMASS,   SAXLGE_SCARVOL,
-                                      SAXLGE_SCARMASS,    SAXLGE_SCARF,
-                                      SAXLGE_EXCLVOL,     SAXLGE_EXCLMASS,
-                                      SAXLGE_NOREFLOWVOL, SAXLGE_NOREFLOWF])
-        # set new type
-        case.type = 'SAX LGE'
-        if debug: print('Customization in SAX LGE view took: ', time()-st)
-        return case
+        with span(type(self).__name__ + '.customize_case', debug=debug, view=self.name, case=case.case_name):
+            # switch images
+            case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX LGE']
+            # if categories have not been attached, attach the first and init other_categories
+            # otherwise it has categories and a type, so store the old categories for later use
+            if not hasattr(case, 'categories'):
+                case.other_categories = dict()
+                case.attach_categories([SAX_LGE_Category])
+                case.other_categories['SAX LGE'] = case.categories
+            else:
+                if 'SAX LGE' in case.other_categories.keys(): case.categories = case.other_categories['SAX LGE']
+                else: case.attach_categories([SAX_LGE_Category])
+            if debug: print('Case categories are: ', case.categories)
+            # attach CRs
+            case.attach_clinical_results([SAXLGE_LVV,         SAXLGE_LVMYOV, 
+                                          SAXLGE_LVMYOMASS,   SAXLGE_SCARVOL,
+                                          SAXLGE_SCARMASS,    SAXLGE_SCARF,
+                                          SAXLGE_EXCLVOL,     SAXLGE_EXCLMASS,
+                                          SAXLGE_NOREFLOWVOL, SAXLGE_NOREFLOWF])
+            # set new type
+            case.type = 'SAX LGE'
+            return case
 
 
-    def store_information(self, ccs, path, icon_path, storage_version=0):
-        try:
-            overview_fig = LGE_Overview()
-            overview_fig.visualize(ccs)
-            ov_p = overview_fig.store(os.path.join(path))
-        except Exception as e:
-            print('Mapping Overview store exeption: ', traceback.print_exc())
-        try:
-            overview_fig = LGE_Overview_BySlice()
-            overview_fig.visualize(ccs)
-            ovbs_p = overview_fig.store(os.path.join(path))
-        except Exception as e:
-            print('Mapping Overview By Slice store exeption: ', traceback.print_exc())
-        try:
-            cr_table = CC_ClinicalResultsAveragesTable()
-            cr_table.calculate(ccs)
-            crtol_p = cr_table.store(os.path.join(path, 'clinical_results_overview.csv'))
-        except Exception as e: print(traceback.print_exc())
-        try:
-            cr_table = CCs_ClinicalResultsTable()
-            cr_table.calculate(ccs)
-            cr_table.store(os.path.join(path, 'clinical_results.csv'))
-        except Exception as e:
-            print('CR Table store exeption: ', traceback.print_exc())
-        try:
-            metrics_table = T1_CCs_MetricsTable()
-            metrics_table.calculate(self, ccs)
-            metrics_table.store(os.path.join(path, 'metrics_phase_slice_table.csv'))
-        except Exception as e:
-            print('Metrics Table store exeption: ', traceback.print_exc())
+    def store_information(self, ccs, path, icon_path, storage_version=0, workers=None):
+        """Takes a list of LazyLuna.Containers.Case_Comparison objects and stores tables, figures and a pdf report
         
+        Note:
+            The export is run as task graph (see export_graph), independent tables and figures are calculated in parallel worker processes.
             
+        Args:
+            ccs (list of LazyLuna.Containers.Case_Comparison): The case_comparisons to be analyzed
+            path (str): Path to storage folder
+            icon_path (str): Path to the icons of the report
+            storage_version (int): 0 for the export
+            workers (int): number of worker processes, defaults to the number of cores, 1 exports in this process
+        """
+        st = time()
+        graph = self.export_graph(icon_path, storage_version)
+        graph.run(Export_Context(self, ccs, path), workers=workers)
+        print(graph.report())
+        print('Storing took: ', time()-st)
+    
+    def export_graph(self, icon_path, storage_version=0):
+        """Declares the export of store_information as task graph
+        
+        Args:
+            icon_path (str): Path to the icons of the report
+            storage_version (int): see store_information
+            
+        Returns:
+            LazyLuna.task_graph.Task_Graph: tables and figures return the paths of their files, the report depends on all of them
+        """
+        from LazyLuna.Figures import LGE_Overview, LGE_Overview_BySlice
+        g, view, ccs = Task_Graph(), Ref('view'), Ref('ccs')
+        g.add('cohort_results',    cohort_results_task, local=True)
+        g.add('overview_figure',   store_figure, LGE_Overview, ccs, deps=['cohort_results'])
+        g.add('overview_byslice_figure', store_figure, LGE_Overview_BySlice, ccs)
+        g.add('cr_overview_table', store_table,  CC_ClinicalResultsAveragesTable, 'clinical_results_overview.csv', ccs, deps=['cohort_results'])
+        g.add('cr_table',          store_table,  CCs_ClinicalResultsTable,        'clinical_results.csv',          ccs, deps=['cohort_results'])
+        g.add('metrics_table',     store_table,  T1_CCs_MetricsTable, 'metrics_phase_slice_table.csv', view, ccs)
+        g.add('report', self.store_report, icon_path, storage_version, deps=list(g.tasks.keys()), local=True)
+        return g
+    
+    def store_report(self, context, icon_path, storage_version=0, **paths):
+        """Stores the pdf report from the files of the export's tables and figures (paths by task name, see export_graph)"""
+        path = context.path
+        ov_p, ovbs_p = paths.get('overview_figure'), paths.get('overview_byslice_figure')
+        
         pdf = PDF(orientation='P', unit='mm', format='A4')
         
         if storage_version>=0:
@@ -181,4 +191,5 @@ class SAX_LGE_View(View):
         
         pdf.set_author('Luna Lovegood')
         pdf.output(os.path.join(path, view_name+'_report.pdf'))
+        return os.path.join(path, view_name+'_report.pdf')
         
\ No newline at end of file
@@ -2,13 +2,17 @@ from LazyLuna.Categories import *
 from LazyLuna.ClinicalResults import *
 from LazyLuna.Views.View import *
 
-from LazyLuna.Tables  import *
-from LazyLuna.Figures import *
+from LazyLuna.Tables import CC_ClinicalResultsAveragesTable, CCs_ClinicalResultsTable, T1_CCs_MetricsTable
+from LazyLuna.registry import Registry
+from LazyLuna.utils import findCCsOverviewTab
+from LazyLuna.task_graph import Task_Graph, Export_Context, Ref, cohort_results_task, store_table, store_figure
+from LazyLuna.profiling import span
 
 import csv
 import PIL
 
 import traceback
+from time import time
 
 
 class SAX_T2_View(View):
@@ -21,27 +25,16 @@ class SAX_T2_View(View):
         self.contour2categorytype = {cname:self.all for cname in self.contour_names}
         self.cmap, self.cmap_vlims = self.make_cmap()
         
-        # register tabs here:
-        import LazyLuna.Guis.Addable_Tabs.CC_Metrics_Tab               as tab1
-        import LazyLuna.Guis.Addable_Tabs.CCs_ClinicalResults_tab      as tab2
-        import LazyLuna.Guis.Addable_Tabs.CC_Angle_Segments_Tab        as tab3
-        import LazyLuna.Guis.Addable_Tabs.CC_Overview_Tab              as tab4
-        import LazyLuna.Guis.Addable_Tabs.CC_AHA_Tab                   as tab5
-        import LazyLuna.Guis.Addable_Tabs.CC_AHA_Diff_Tab              as tab6
-        import LazyLuna.Guis.Addable_Tabs.CCs_AHA_Tab                  as tab7
-        import LazyLuna.Guis.Addable_Tabs.CCs_AHA_Diff_Tab             as tab8
-        import LazyLuna.Guis.Addable_Tabs.CCs_Mapping_Slice_Analysis   as tab9
-        
-        self.case_tabs  = {'Metrics and Figure': tab1.CC_Metrics_Tab, 
-                           'Clinical Results and Images': tab4.CC_CRs_Images_Tab, 
-                           'T2 Angle Comparison': tab3.CC_Angle_Segments_Tab, 
-                           'AHA Model' : tab5.CC_AHA_Tab, 
-                           'AHA Diff Model' : tab6.CC_AHA_Diff_Tab
-                          }
-        self.stats_tabs = {'Clinical Results' : tab2.CCs_ClinicalResults_Tab,
-                           'Averaged AHA Tab' : tab7.CCs_AHA_Tab,
-                           'Averaged AHA Diff Tab' : tab8.CCs_AHA_Diff_Tab, 
-                           'Mapping Slice Analysis' : tab9.CCs_MappingSliceAnalysis_Tab}
+        # register tabs here (imported when they are opened, see LazyLuna.registry.Registry):
+        self.case_tabs  = Registry({'Metrics and Figure':          'LazyLuna.Guis.Addable_Tabs.CC_Metrics_Tab:CC_Metrics_Tab',
+                                    'Clinical Results and Images': 'LazyLuna.Guis.Addable_Tabs.CC_Overview_Tab:CC_CRs_Images_Tab',
+                                    'T1 Angle Comparison':         'LazyLuna.Guis.Addable_Tabs.CC_Angle_Segments_Tab:CC_Angle_Segments_Tab',
+                                    'AHA Model':                   'LazyLuna.Guis.Addable_Tabs.CC_AHA_Tab:CC_AHA_Tab',
+                                    'AHA Diff Model':              'LazyLuna.Guis.Addable_Tabs.CC_AHA_Diff_Tab:CC_AHA_Diff_Tab'})
+        self.stats_tabs = Registry({'Clinical Results':       'LazyLuna.Guis.Addable_Tabs.CCs_ClinicalResults_tab:CCs_ClinicalResults_Tab',
+                                    'Averaged AHA Tab':       'LazyLuna.Guis.Addable_Tabs.CCs_AHA_Tab:CCs_AHA_Tab',
+                                    'Averaged AHA Diff Tab':  'LazyLuna.Guis.Addable_Tabs.CCs_AHA_Diff_Tab:CCs_AHA_Diff_Tab',
+                                    'Mapping Slice Analysis': 'LazyLuna.Guis.Addable_Tabs.CCs_Mapping_Slice_Analysis:CCs_MappingSliceAnalysis_Tab'})
                 
     
     def make_cmap(self):
@@ -71,111 +64,98 @@ class SAX_T2_View(View):
         return cats
 
     def initialize_case(self, case, debug=False):
-        if debug: st=time()
-        # switch images
-        case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX T2']
-        # if categories have not been attached, attach the first and init other_categories
-        # otherwise it has categories and a type, so store the old categories for later use
-        if not hasattr(case, 'other_categories'): case.other_categories = dict()
-        case.attach_categories([SAX_T2_Category])
-        cat = case.categories[0]
-        case.other_categories['SAX T2'] = case.categories
-        case.categories = []
-        if debug: print('Case categories are: ', case.categories)
-        # set new type
-        case.type = 'SAX T2'
-        case.available_types.add('SAX T2')
-        if debug: print('Customization in SAX T2 view took: ', time()-st)
-        return case
-    
-    def customize_case(self, case, debug=False):
-        if debug: st=time()
-        # switch images
-        case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX T2']
-        # if categories have not been attached, attach the first and init other_categories
-        # otherwise it has categories and a type, so store the old categories for later use
-        if not hasattr(case, 'categories'):
-            case.other_categories = dict()
+        with span(type(self).__name__ + '.initialize_case', debug=debug, view=self.name, case=case.case_name):
+            # switch images
+            case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX T2']
+            # if categories have not been attached, attach the first and init other_categories
+            # otherwise it has categories and a type, so store the old categories for later use
+            if not hasattr(case, 'other_categories'): case.other_categories = dict()
             case.attach_categories([SAX_T2_Category])
+            cat = case.categories[0]
             case.other_categories['SAX T2'] = case.categories
-        else:
-            if 'SAX T2' in case.other_categories.keys(): case.categories = case.other_categories['SAX T2']
-            else: case.attach_categories([SAX_T2_Category])
-        if debug: print('Case categories are: ', case.categories)
-        # attach CRs
-        case.attach_clinical_results([SAXMap_GLOBALT2, NR_SLICES])
-        # set new type
-        case.type = 'SAX T2'
-        if debug: print('Customization in SAX T2 view took: ', time()-st)
-        return case
+            case.categories = []
+            if debug: print('Case categories are: ', case.categories)
+            # set new type
+            case.type = 'SAX T2'
+            case.available_types.add('SAX T2')
+            return case
+    
+    def customize_case(self, case, debug=False):
+        with span(type(self).__name__ + '.customize_case', debug=debug, view=self.name, case=case.case_name):
+            # switch images
+            case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX T2']
+            # if categories have not been attached, attach the first and init other_categories
+            # otherwise it has categories and a type, so store the old categories for later use
+            if not hasattr(case, 'categories'):
+                case.other_categories = dict()
+                case.attach_categories([SAX_T2_Category])
+                case.other_categories['SAX T2'] = case.categories
+            else:
+                if 'SAX T2' in case.other_categories.keys(): case.categories = case.other_categories['SAX T2']
+                else: case.attach_categories([SAX_T2_Category])
+            if debug: print('Case categories are: ', case.categories)
+            # attach CRs
+            case.attach_clinical_results([SAXMap_GLOBALT2, NR_SLICES])
+            # set new type
+            case.type = 'SAX T2'
+            return case
 
     
-    def store_information(self, ccs, path, icon_path, storage_version=0):
+    def store_information(self, ccs, path, icon_path, storage_version=0, workers=None):
+        """Takes a list of LazyLuna.Containers.Case_Comparison objects and stores tables, figures and a pdf report
+        
+        Note:
+            The export is run as task graph (see export_graph), independent tables and figures are calculated in parallel worker processes.
+            
+        Args:
+            ccs (list of LazyLuna.Containers.Case_Comparison): The case_comparisons to be analyzed
+            path (str): Path to storage folder
+            icon_path (str): Path to the icons of the report
+            storage_version (int): 0 for the basic export, 1 adds the AHA models per reader
+            workers (int): number of worker processes, defaults to the number of cores, 1 exports in this process
+        """
+        st = time()
         if storage_version>=0:
-            try:
-                cr_table = CC_ClinicalResultsAveragesTable()
-                cr_table.calculate(ccs)
-                crtol_p = cr_table.store(os.path.join(path, 'clinical_results_overview.csv'))
-            except Exception as e:
-                print(traceback.print_exc())
-            try:
-                overview_fig = Mapping_Overview()
-                overview_fig.visualize(ccs, 'T2')
-                ov_p = overview_fig.store(os.path.join(path))
-            except Exception as e:
-                print('Mapping Overview store exeption: ', traceback.print_exc())
-            try:
-                ref_fig = Reference_Point_Differences()
-                ref_fig.visualize(ccs)
-                ref_p = ref_fig.store(os.path.join(path))
-            except Exception as e:
-                print('Reference Differences store exeption: ', traceback.print_exc())
-            try:
-                t1aha_diff_fig = Statistical_T1_diff_bullseye_plot()
-                t1aha_diff_fig.set_values(self, ccs, t1aha_diff_fig.canvas)
-                t1aha_diff_fig.visualize()
-                diffaha_p = t1aha_diff_fig.store(os.path.join(path))
-            except Exception as e:
-                print('T2 AHA DIFF store exeption: ', traceback.print_exc())
-            try:
-                cr_table = CCs_ClinicalResultsTable()
-                cr_table.calculate(ccs)
-                cr_table.store(os.path.join(path, 'clinical_results.csv'))
-            except Exception as e:
-                print('CR Table store exeption: ', traceback.print_exc())
-            try:
-                metrics_table = T1_CCs_MetricsTable()
-                metrics_table.calculate(self, ccs)
-                metrics_table.store(os.path.join(path, 'metrics_phase_slice_table.csv'))
-            except Exception as e:
-                print('Metrics Table store exeption: ', traceback.print_exc())
             try:
                 failed_segmentation_folder_path = os.path.join(path, 'Failed_Segmentations')
                 if not os.path.exists(failed_segmentation_folder_path): os.mkdir(failed_segmentation_folder_path)
-                """
-                failed_annotation_comparison = Failed_Annotation_Comparison_Yielder()
-                failed_annotation_comparison.set_values(self, ccs)
-                failed_annotation_comparison.store(failed_segmentation_folder_path)
-                """
-            except Exception as e:
-                print(traceback.print_exc())
-                
-        if storage_version>=1:
-            try:
-                t1aha_r1_fig = Statistical_T1_bullseye_plot()
-                t1aha_r1_fig.set_values(self, [cc.case1 for cc in ccs], t1aha_r1_fig.canvas)
-                t1aha_r1_fig.visualize()
-                r1aha_p = t1aha_r1_fig.store(os.path.join(path))
-            except Exception as e:
-                print('T2 AHA R1 store exeption: ', traceback.print_exc())
-            try:
-                t1aha_r2_fig = Statistical_T1_bullseye_plot()
-                t1aha_r2_fig.set_values(self, [cc.case2 for cc in ccs], t1aha_r2_fig.canvas)
-                t1aha_r2_fig.visualize()
-                r2aha_p = t1aha_r2_fig.store(os.path.join(path))
-            except Exception as e:
-                print('T2 AHA R2 store exeption: ', traceback.print_exc())
+            except Exception as e: print(traceback.print_exc())
+        graph = self.export_graph(icon_path, storage_version)
+        graph.run(Export_Context(self, ccs, path), workers=workers)
+        print(graph.report())
+        print('Storing took: ', time()-st)
+    
+    def export_graph(self, icon_path, storage_version=0):
+        """Declares the export of store_information as task graph
         
+        Args:
+            icon_path (str): Path to the icons of the report
+            storage_version (int): see store_information
+            
+        Returns:
+            LazyLuna.task_graph.Task_Graph: tables and figures return the paths of their files, the report depends on all of them
+        """
+        from LazyLuna.Figures import Mapping_Overview, Reference_Point_Differences, Statistical_T1_bullseye_plot, Statistical_T1_diff_bullseye_plot
+        g, view, ccs = Task_Graph(), Ref('view'), Ref('ccs')
+        if storage_version>=0:
+            g.add('cohort_results',    cohort_results_task, local=True)
+            g.add('cr_overview_table', store_table,  CC_ClinicalResultsAveragesTable, 'clinical_results_overview.csv', ccs, deps=['cohort_results'])
+            g.add('cr_table',          store_table,  CCs_ClinicalResultsTable,        'clinical_results.csv',          ccs, deps=['cohort_results'])
+            g.add('overview_figure',   store_figure, Mapping_Overview, ccs, 'T2', deps=['cohort_results'])
+            g.add('ref_figure',        store_figure, Reference_Point_Differences, ccs)
+            g.add('diff_aha_figure',   store_figure, Statistical_T1_diff_bullseye_plot, set_values=[view, ccs, Ref('canvas')])
+            g.add('metrics_table',     store_table,  T1_CCs_MetricsTable, 'metrics_phase_slice_table.csv', view, ccs)
+        if storage_version>=1:
+            g.add('r1_aha_figure',     store_figure, Statistical_T1_bullseye_plot, set_values=[view, Ref('cases1'), Ref('canvas')])
+            g.add('r2_aha_figure',     store_figure, Statistical_T1_bullseye_plot, set_values=[view, Ref('cases2'), Ref('canvas')])
+        g.add('report', self.store_report, icon_path, storage_version, deps=list(g.tasks.keys()), local=True)
+        return g
+    
+    def store_report(self, context, icon_path, storage_version=0, **paths):
+        """Stores the pdf report from the files of the export's tables and figures (paths by task name, see export_graph)"""
+        path = context.path
+        ov_p, ref_p, diffaha_p = paths.get('overview_figure'), paths.get('ref_figure'), paths.get('diff_aha_figure')
+        r1aha_p, r2aha_p       = paths.get('r1_aha_figure'), paths.get('r2_aha_figure')
         
         pdf = PDF(orientation='P', unit='mm', format='A4')
         
@@ -270,4 +250,5 @@ class SAX_T2_View(View):
         
         pdf.set_author('Luna Lovegood')
         pdf.output(os.path.join(path, view_name+'_report.pdf'))
+        return os.path.join(path, view_name+'_report.pdf')
         
\ No newline at end of file
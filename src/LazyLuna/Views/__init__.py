@@ -1,7 +1,30 @@
-from LazyLuna.Views.SaxCineView   import *
-from LazyLuna.Views.SaxCsView     import *
-from LazyLuna.Views.LaxCineView   import *
-from LazyLuna.Views.SaxT1PreView  import *
-from LazyLuna.Views.SaxT1PostView import *
-from LazyLuna.Views.SaxT2View     import *
-from LazyLuna.Views.SaxLgeView    import *
\ No newline at end of file
+from LazyLuna.registry import Registry
+
+# Views are imported when they are first requested (LazyLuna.Views.registry, see LazyLuna.registry.Registry).
+# View and PDF are the base classes, get_view_classes returns the registered views.
+
+registry = Registry({
+    'View':             'LazyLuna.Views.View',
+    'PDF':              'LazyLuna.Views.View',
+    'LAX_CINE_View':    'LazyLuna.Views.LaxCineView',
+    'SAX_CINE_View':    'LazyLuna.Views.SaxCineView',
+    'SAX_CS_View':      'LazyLuna.Views.SaxCsView',
+    'SAX_LGE_View':     'LazyLuna.Views.SaxLgeView',
+    'SAX_T1_POST_View': 'LazyLuna.Views.SaxT1PostView',
+    'SAX_T1_PRE_View':  'LazyLuna.Views.SaxT1PreView',
+    'SAX_T2_View':      'LazyLuna.Views.SaxT2View'})
+registry.install(__name__)
+
+
+def get_view_classes(view_names=None):
+    """Returns the registered View classes (or those named in view_names), importing only these
+
+    Args:
+        view_names (list of str): (optional) class names of views, like 'SAX_CINE_View'
+
+    Returns:
+        list of type: View subclasses
+    """
+    names = [n for n in registry.names() if n not in ['View', 'PDF']]
+    if view_names is not None: names = [n for n in names if n in view_names]
+    return [registry[n] for n in names]
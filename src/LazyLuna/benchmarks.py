@@ -0,0 +1,429 @@
+import os
+import sys
+import json
+import argparse
+import platform
+import tempfile
+import subprocess
+import statistics
+from time import perf_counter
+
+
+####################
+# Import Benchmark #
+####################
+
+# The analysis core has to import quickly and without display: GUI adapters (PyQt5) and plotting (matplotlib, seaborn)
+# are imported on demand by the functions, figures and tabs that need them.
+CORE_MODULES     = ['LazyLuna.Annotation', 'LazyLuna.Categories', 'LazyLuna.ClinicalResults', 'LazyLuna.Containers', 'LazyLuna.Metrics']
+HEADLESS_MODULES = CORE_MODULES + ['LazyLuna.Tables', 'LazyLuna.Views', 'LazyLuna.Figures', 'LazyLuna.bulk_converter']
+GUI_MODULES      = ['PyQt5', 'matplotlib', 'seaborn', 'mpl_interactions']
+IMPORT_BUDGET    = 1.0 # seconds for CORE_MODULES
+
+
+def _python_env():
+    # subprocesses import this LazyLuna, also when it is not installed
+    env  = dict(os.environ)
+    path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = path + (os.pathsep + env['PYTHONPATH'] if env.get('PYTHONPATH') else '')
+    return env
+
+def measure_import(modules, forbidden=GUI_MODULES, repeats=5):
+    """Imports modules in fresh interpreters and measures the time
+
+    Args:
+        modules (list of str):   module names, imported together
+        forbidden (list of str): module names that should not be imported along
+        repeats (int):           number of interpreters
+
+    Returns:
+        dict: modules, seconds (list of float, per interpreter), median (float), loaded (list of str: forbidden modules that were imported)
+    """
+    code = ('import sys, json, time\nst = time.perf_counter()\nimport ' + ', '.join(modules) + '\nt = time.perf_counter()-st\n'
+            'print(json.dumps([t, [m for m in ' + repr(list(forbidden)) + ' if m in sys.modules]]))')
+    seconds, loaded = [], set()
+    for i in range(repeats):
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=_python_env())
+        if out.returncode!=0: raise RuntimeError('Importing ' + ', '.join(modules) + ' failed:\n' + out.stderr)
+        t, l = json.loads(out.stdout.strip().split('\n')[-1])
+        seconds.append(t); loaded.update(l)
+    return {'modules': list(modules), 'seconds': seconds, 'median': statistics.median(seconds), 'loaded': sorted(loaded)}
+
+def slowest_imports(modules, n=15):
+    """Returns the n modules with the largest cumulative import time (python -X importtime) as list of (name, seconds)"""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + ', '.join(modules)], capture_output=True, text=True, env=_python_env())
+    times = []
+    for l in out.stderr.split('\n'):
+        if not l.startswith('import time:') or 'cumulative' in l: continue
+        self_us, cumulative_us, name = l[len('import time:'):].split('|')
+        times.append((name.strip(), int(cumulative_us)/1e6))
+    return sorted(times, key=lambda t: -t[1])[:n]
+
+def check_imports(budget=IMPORT_BUDGET, repeats=5, debug=False):
+    """Checks that CORE_MODULES import within budget and that no headless module imports GUI_MODULES
+
+    Returns:
+        list of str: failures (empty if all checks pass)
+    """
+    failures = []
+    core = measure_import(CORE_MODULES, repeats=repeats)
+    if debug: print('Core import: {:.3f} s (median of {})'.format(core['median'], repeats))
+    if core['median'] > budget:
+        failures.append('Core import took {:.3f} s, budget {:.3f} s. Slowest: '.format(core['median'], budget) +
+                        ', '.join('{} {:.3f} s'.format(*t) for t in slowest_imports(CORE_MODULES, 5)))
+    for m in HEADLESS_MODULES:
+        r = measure_import([m], repeats=1)
+        if debug: print('{:<28} {:.3f} s {}'.format(m, r['median'], ' '.join(r['loaded'])))
+        if len(r['loaded'])>0: failures.append(m + ' imports ' + ', '.join(r['loaded']))
+    return failures
+
+
+#####################
+# Cohort Benchmarks #
+#####################
+
+# The analysis stages run on synthetic cohorts (see LazyLuna.synthetic) of several sizes. Every measurement runs in a fresh
+# interpreter: caches are cold and the peak resident memory (ru_maxrss) is that of the stage and its untimed setup (loading the
+# cases), the setup's peak is reported separately. Header indexes are built with the cohort.
+STAGES          = ['case', 'initialize_case', 'cr_table', 'metrics_table', 'store_information']
+COHORT_SIZES    = [2, 4, 8]
+BENCHMARK_VIEWS = ['SAX_CINE_View', 'LAX_CINE_View', 'SAX_T1_PRE_View', 'SAX_T2_View', 'SAX_LGE_View']
+# metrics table per view, as in the views' store_information
+METRICS_TABLES  = {'SAX_CINE_View':    'SAX_CINE_CCs_Metrics_Table', 'SAX_CS_View':   'SAX_CINE_CCs_Metrics_Table',
+                   'LAX_CINE_View':    'LAX_CCs_MetricsTable',       'SAX_LGE_View':  'T1_CCs_MetricsTable',
+                   'SAX_T1_PRE_View':  'T1_CCs_MetricsTable',        'SAX_T2_View':   'T1_CCs_MetricsTable',
+                   'SAX_T1_POST_View': 'T1_CCs_MetricsTable'}
+COHORT_INFO     = 'cohort.json'
+RESULT_PREFIX   = 'LL_BENCHMARK '
+
+
+def prepare_cohort(path, nr_cases, disagreement=0.05, seed=0):
+    """Writes a synthetic cohort to path and builds its header indexes, an existing cohort with the same parameters is reused
+
+    Returns:
+        dict: cohort information (see LazyLuna.synthetic.write_cohort) with nr_cases, disagreement, seed and seconds (writing time)
+    """
+    from LazyLuna.synthetic import write_cohort
+    from LazyLuna.header_index import get_headers
+    info_path  = os.path.join(path, COHORT_INFO)
+    parameters = {'nr_cases': nr_cases, 'disagreement': disagreement, 'seed': seed}
+    if os.path.exists(info_path):
+        with open(info_path) as f: info = json.load(f)
+        if all(info.get(k)==v for k, v in parameters.items()): return info
+    st   = perf_counter()
+    info = dict(write_cohort(path, nr_cases, disagreement=disagreement, seed=seed), **parameters)
+    for c in sorted(os.listdir(info['imgs_path'])): get_headers(os.path.join(info['imgs_path'], c))
+    info['seconds'] = perf_counter() - st
+    with open(info_path, 'w') as f: json.dump(info, f)
+    return info
+
+def _cohort_cases(cohort_path, view=None):
+    # cases per reader, ordered by case name, initialized and customized for view
+    from LazyLuna.Containers import Case
+    from LazyLuna.loading_functions import get_imgs_and_annotation_paths
+    with open(os.path.join(cohort_path, COHORT_INFO)) as f: info = json.load(f)
+    cases = []
+    for reader_path in info['reader_paths']:
+        reader_cases = []
+        for imgs_path, annos_path in sorted(get_imgs_and_annotation_paths(info['imgs_path'], reader_path)):
+            case = Case(imgs_path, annos_path, os.path.basename(imgs_path), os.path.basename(reader_path))
+            if view is not None: case = view.customize_case(view.initialize_case(case))
+            reader_cases.append(case)
+        cases.append(reader_cases)
+    return cases
+
+def _peak_rss_mb():
+    try: import resource
+    except ImportError: return None
+    # includes worker processes (e.g. of store_information), ru_maxrss is in kilobytes (bytes on macOS)
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return rss / 1024**2 if sys.platform=='darwin' else rss / 1024
+
+def run_stage(stage, cohort_path, view_name=None, workers=1):
+    """Runs a benchmark stage on a prepared cohort in this process
+
+    Note:
+        Only the stage is timed, the cases it needs are set up before (cases are constructed for initialize_case,
+        constructed, initialized and customized for the tables and store_information).
+        The peak memory includes this setup, setup_rss_mb is the peak before the timed part.
+
+    Args:
+        stage (str):      one of STAGES
+        cohort_path (str): path to a cohort (see prepare_cohort)
+        view_name (str):  view class name (not used by the stage 'case')
+        workers (int):    worker processes of store_information
+
+    Returns:
+        dict: seconds (float), items (int, cases or case comparisons), peak_rss_mb (float), setup_rss_mb (float)
+    """
+    from LazyLuna import Views, Tables
+    from LazyLuna.Containers import Case_Comparison
+    view = Views.get_view_classes([view_name])[0]() if stage!='case' else None
+    if stage=='case':
+        setup = _peak_rss_mb()
+        st    = perf_counter()
+        cases = _cohort_cases(cohort_path)
+        seconds, items = perf_counter()-st, sum(len(c) for c in cases)
+    elif stage=='initialize_case':
+        cases = [c for reader_cases in _cohort_cases(cohort_path) for c in reader_cases]
+        setup = _peak_rss_mb()
+        st    = perf_counter()
+        for c in cases: view.initialize_case(c)
+        seconds, items = perf_counter()-st, len(cases)
+    else:
+        cases1, cases2 = _cohort_cases(cohort_path, view)[:2]
+        ccs   = [Case_Comparison(c1, c2) for c1, c2 in zip(cases1, cases2)]
+        setup = _peak_rss_mb()
+        st    = perf_counter()
+        if   stage=='cr_table':      Tables.CCs_ClinicalResultsTable().calculate(ccs)
+        elif stage=='metrics_table': Tables.registry[METRICS_TABLES[view_name]]().calculate(view, ccs)
+        elif stage=='store_information':
+            with tempfile.TemporaryDirectory() as path: view.store_information(ccs, path, None, workers=workers)
+        else: raise ValueError('Unknown stage: ' + stage)
+        seconds, items = perf_counter()-st, len(ccs)
+    return {'seconds': seconds, 'items': items, 'peak_rss_mb': _peak_rss_mb(), 'setup_rss_mb': setup}
+
+def measure_stage(stage, cohort_path, view_name=None, repeats=3, workers=1):
+    """Runs a stage in fresh interpreters (see run_stage) and aggregates the repeats
+
+    Returns:
+        dict: stage, view, seconds (list of float), median (float), iqr (float, interquartile range of seconds), items (int),
+              throughput (items/s of the median), peak_rss_mb (max), setup_rss_mb (max)
+    """
+    env = _python_env()
+    env.setdefault('MPLBACKEND', 'Agg'); env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    command = [sys.executable, '-m', 'LazyLuna.benchmarks', 'stage', stage, cohort_path, '--workers', str(workers)]
+    if view_name is not None: command += ['--view', view_name]
+    runs = []
+    for i in range(repeats):
+        out = subprocess.run(command, capture_output=True, text=True, env=env)
+        lines = [l for l in out.stdout.split('\n') if l.startswith(RESULT_PREFIX)]
+        if out.returncode!=0 or len(lines)==0: raise RuntimeError('Stage ' + stage + ' failed:\n' + out.stderr[-3000:])
+        runs.append(json.loads(lines[-1][len(RESULT_PREFIX):]))
+    seconds = [r['seconds'] for r in runs]
+    median  = statistics.median(seconds)
+    rss     = [r['peak_rss_mb'] for r in runs if r['peak_rss_mb'] is not None]
+    setup   = [r['setup_rss_mb'] for r in runs if r.get('setup_rss_mb') is not None]
+    return {'stage': stage, 'view': view_name, 'seconds': seconds, 'median': median, 'iqr': _iqr(seconds), 'items': runs[0]['items'],
+            'throughput': runs[0]['items']/median if median>0 else None, 'peak_rss_mb': max(rss) if len(rss)>0 else None,
+            'setup_rss_mb': max(setup) if len(setup)>0 else None}
+
+def benchmark_cohorts(sizes=COHORT_SIZES, stages=STAGES, views=BENCHMARK_VIEWS, repeats=3, path=None, workers=1,
+                      disagreement=0.05, seed=0, debug=False):
+    """Benchmarks the stages for all views on synthetic cohorts of several sizes
+
+    Args:
+        sizes (list of int):   numbers of cases per cohort
+        stages (list of str):  stages to run (see STAGES)
+        views (list of str):   view class names
+        repeats (int):         fresh interpreters per measurement
+        path (str):            (optional) folder for the cohorts, kept and reused. Defaults to a temporary folder
+        workers (int):         worker processes of store_information
+        disagreement (float):  reader disagreement of the cohorts (see LazyLuna.synthetic.write_case)
+        seed (int):            random seed of the cohorts
+        debug (bool):          prints every measurement
+
+    Returns:
+        list of dict: measurements (see measure_stage) with cases (cohort size)
+    """
+    temporary = tempfile.TemporaryDirectory() if path is None else None
+    root, results = path if path is not None else temporary.name, []
+    try:
+        for n in sizes:
+            info = prepare_cohort(os.path.join(root, 'cohort_{}'.format(n)), n, disagreement, seed)
+            if debug and 'seconds' in info: print('Cohort of {} cases ({} images each) in {:.1f} s'.format(
+                                                  n, info['cases'][0]['nr_images'], info['seconds']))
+            cohort_path = os.path.join(root, 'cohort_{}'.format(n))
+            for stage in stages:
+                for view_name in ([None] if stage=='case' else views):
+                    r = dict(measure_stage(stage, cohort_path, view_name, repeats, workers), cases=n)
+                    results.append(r)
+                    if debug: print(format_result(r))
+    finally:
+        if temporary is not None: temporary.cleanup()
+    return results
+
+def format_result(r):
+    """Returns a measurement as table row: stage, view, cases, median seconds, throughput, peak memory"""
+    return '{:<18} {:<17} {:>4} {:>9.3f} s {:>9.2f} /s {:>8} MB'.format(r['stage'], r['view'] or '', r['cases'], r['median'],
+            r['throughput'] or float('nan'), '{:.0f}'.format(r['peak_rss_mb']) if r['peak_rss_mb'] is not None else '-')
+
+
+###################
+# Regression Gate #
+###################
+
+# Measurements of benchmark_cohorts are stored as baseline (json with the measurements and the machine fingerprint) and later
+# runs are compared to it: a measurement regresses if its median exceeds the baseline's by more than the threshold plus the
+# noise (the larger interquartile range of both) or its peak memory exceeds the baseline's by more than memory_threshold.
+# Timings are only comparable on the same machine, a differing fingerprint is reported with the comparison.
+THRESHOLD        = 0.25 # relative increase of the median
+MEMORY_THRESHOLD = 0.25 # relative increase of the peak memory
+MIN_SECONDS      = 0.05 # smaller increases of the median are noise
+# fingerprint entries that identify the machine but do not affect timings (not compared)
+FINGERPRINT_INFO = ['node']
+
+
+def _iqr(values):
+    if len(values)<2: return 0.0
+    q1, _, q3 = statistics.quantiles(values, n=4)
+    return q3 - q1
+
+def machine_fingerprint():
+    """Returns the machine and software the benchmarks ran on (timings are only comparable for equal fingerprints)
+
+    Returns:
+        dict: node (host name, information only), system, machine, processor, cpus, python and versions of LazyLuna's main dependencies
+    """
+    fingerprint = {'node': platform.node(), 'system': platform.system() + ' ' + platform.release(),
+                   'machine': platform.machine(), 'processor': platform.processor(), 'cpus': os.cpu_count(),
+                   'python': platform.python_version()}
+    for m in ['numpy', 'pandas', 'pydicom', 'shapely', 'rasterio']:
+        try: fingerprint[m] = __import__(m).__version__
+        except Exception: fingerprint[m] = None
+    return fingerprint
+
+def benchmark_key(r):
+    """Returns the key that identifies a measurement across runs: stage/view/cases"""
+    return '{}/{}/{}'.format(r['stage'], r['view'] or '-', r['cases'])
+
+def store_baseline(results, path):
+    """Stores measurements (see benchmark_cohorts) with the machine fingerprint as json file at path"""
+    benchmarks = {benchmark_key(r): dict(r, iqr=r.get('iqr', _iqr(r['seconds']))) for r in results}
+    with open(path, 'w') as f: json.dump({'fingerprint': machine_fingerprint(), 'benchmarks': benchmarks}, f, indent=1)
+    return path
+
+def load_baseline(path):
+    """Loads a baseline (see store_baseline) or the measurements stored by cohorts --json
+
+    Returns:
+        dict: fingerprint (dict or None), benchmarks (dict of benchmark_key: measurement)
+    """
+    with open(path) as f: baseline = json.load(f)
+    if 'benchmarks' not in baseline: baseline['benchmarks'] = {benchmark_key(r): r for r in baseline.get('results', [])}
+    for r in baseline['benchmarks'].values(): r.setdefault('iqr', _iqr(r['seconds']))
+    return {'fingerprint': baseline.get('fingerprint'), 'benchmarks': baseline['benchmarks']}
+
+def compare_to_baseline(results, baseline, threshold=THRESHOLD, memory_threshold=MEMORY_THRESHOLD, min_seconds=MIN_SECONDS):
+    """Compares measurements to a baseline
+
+    Args:
+        results (list of dict):  measurements (see benchmark_cohorts)
+        baseline (dict):         baseline (see load_baseline)
+        threshold (float):       allowed relative increase of the median seconds (beyond the interquartile ranges)
+        memory_threshold (float): allowed relative increase of the peak memory
+        min_seconds (float):     increases of the median below are not flagged
+
+    Returns:
+        list of dict: benchmark, baseline (median s), median (s), change (%), memory change (%), status
+                      ('ok', 'regression', 'memory regression', 'improvement', 'new'), sorted by change
+    """
+    rows = []
+    for r in results:
+        key, base = benchmark_key(r), baseline['benchmarks'].get(benchmark_key(r))
+        if base is None:
+            rows.append({'benchmark': key, 'baseline': None, 'median': r['median'], 'change': None, 'memory change': None, 'status': 'new'})
+            continue
+        noise  = max(base['iqr'], r.get('iqr', _iqr(r['seconds'])))
+        change = 100 * (r['median']/base['median'] - 1) if base['median']>0 else None
+        memory = (100 * (r['peak_rss_mb']/base['peak_rss_mb'] - 1)
+                  if r.get('peak_rss_mb') is not None and base.get('peak_rss_mb') else None)
+        if   r['median'] > base['median']*(1+threshold) + noise and r['median']-base['median'] > min_seconds: status = 'regression'
+        elif memory is not None and memory > 100*memory_threshold: status = 'memory regression'
+        elif r['median'] < base['median']*(1-threshold) - noise: status = 'improvement'
+        else: status = 'ok'
+        rows.append({'benchmark': key, 'baseline': base['median'], 'median': r['median'], 'change': change,
+                     'memory change': memory, 'status': status})
+    return sorted(rows, key=lambda row: -(row['change'] if row['change'] is not None else float('inf')))
+
+def fingerprint_differences(fingerprint, other):
+    """Returns the entries of two machine fingerprints that differ as list of str (informational entries, see FINGERPRINT_INFO, are ignored)"""
+    if fingerprint is None or other is None: return ['fingerprint missing']
+    return ['{}: {} != {}'.format(k, fingerprint.get(k), other.get(k)) for k in sorted(set(fingerprint) | set(other))
+            if k not in FINGERPRINT_INFO and fingerprint.get(k)!=other.get(k)]
+
+def format_comparison(row):
+    """Returns a comparison (see compare_to_baseline) as table row"""
+    f = lambda v, fmt: fmt.format(v) if v is not None else '-'
+    return '{:<44} {:>9} s {:>9} s {:>8} % {:>8} % {}'.format(row['benchmark'], f(row['baseline'], '{:.3f}'), f(row['median'], '{:.3f}'),
+            f(row['change'], '{:+.1f}'), f(row['memory change'], '{:+.1f}'), row['status'])
+
+def check_baseline(results, baseline_path, threshold=THRESHOLD, memory_threshold=MEMORY_THRESHOLD, fingerprint=None):
+    """Compares measurements to the baseline at baseline_path and prints the comparison
+
+    Args:
+        fingerprint (dict): machine fingerprint of the measurements, defaults to this machine's
+
+    Returns:
+        list of str: regressions (empty if the gate passes)
+    """
+    baseline    = load_baseline(baseline_path)
+    differences = fingerprint_differences(fingerprint or machine_fingerprint(), baseline['fingerprint'])
+    if len(differences)>0: print('WARNING: baseline was measured on another machine or software, timings may not be comparable: ' + '; '.join(differences))
+    rows = compare_to_baseline(results, baseline, threshold, memory_threshold)
+    print('{:<44} {:>11} {:>11} {:>10} {:>10} {}'.format('benchmark', 'baseline', 'median', 'change', 'memory', 'status'))
+    for row in rows: print(format_comparison(row))
+    missing = sorted(set(baseline['benchmarks']) - set(benchmark_key(r) for r in results))
+    if len(missing)>0: print('Not measured: ' + ', '.join(missing))
+    return [format_comparison(row) for row in rows if 'regression' in row['status']]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='LazyLuna benchmarks.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    imports = commands.add_parser('imports', help='checks import time and that the analysis core imports without PyQt5 and plotting')
+    imports.add_argument('--budget',  type=float, default=IMPORT_BUDGET, help='seconds allowed for importing the core (default: %(default)s)')
+    imports.add_argument('--repeats', type=int,   default=5, help='number of fresh interpreters (default: %(default)s)')
+    cohorts = commands.add_parser('cohorts', help='benchmarks the analysis stages on synthetic cohorts')
+    cohorts.add_argument('--sizes',   type=int, nargs='+', default=COHORT_SIZES, help='numbers of cases (default: %(default)s)')
+    cohorts.add_argument('--stages',  nargs='+', default=STAGES, choices=STAGES, help='stages (default: all)')
+    cohorts.add_argument('--views',   nargs='+', default=BENCHMARK_VIEWS, help='view class names (default: %(default)s)')
+    cohorts.add_argument('--repeats', type=int, default=3, help='fresh interpreters per measurement (default: %(default)s)')
+    cohorts.add_argument('--workers', type=int, default=1, help='worker processes of store_information (default: %(default)s)')
+    cohorts.add_argument('--path',    default=None, help='folder for the cohorts, kept and reused (default: temporary)')
+    cohorts.add_argument('--disagreement', type=float, default=0.05, help='reader disagreement (default: %(default)s)')
+    cohorts.add_argument('--json',    default=None, help='stores the measurements as json file')
+    cohorts.add_argument('--baseline', default=None, help='compares the measurements to this baseline, fails on regressions')
+    cohorts.add_argument('--update-baseline', action='store_true', help='stores the measurements as baseline instead of comparing')
+    cohorts.add_argument('--threshold', type=float, default=THRESHOLD, help='allowed relative increase of the median (default: %(default)s)')
+    cohorts.add_argument('--memory-threshold', type=float, default=MEMORY_THRESHOLD, help='allowed relative increase of the peak memory (default: %(default)s)')
+    compare = commands.add_parser('compare', help='compares stored measurements (cohorts --json) to a baseline, fails on regressions')
+    compare.add_argument('results')
+    compare.add_argument('baseline')
+    compare.add_argument('--threshold', type=float, default=THRESHOLD, help='allowed relative increase of the median (default: %(default)s)')
+    compare.add_argument('--memory-threshold', type=float, default=MEMORY_THRESHOLD, help='allowed relative increase of the peak memory (default: %(default)s)')
+    stage = commands.add_parser('stage', help='runs a single stage on a prepared cohort in this process (used by cohorts)')
+    stage.add_argument('stage', choices=STAGES)
+    stage.add_argument('cohort')
+    stage.add_argument('--view',    default=None)
+    stage.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args(argv)
+    if args.command=='imports':
+        failures = check_imports(args.budget, args.repeats, debug=True)
+        for f in failures: print('FAILED: ' + f)
+        return 1 if len(failures)>0 else 0
+    if args.command=='cohorts':
+        results = benchmark_cohorts(args.sizes, args.stages, args.views, args.repeats, args.path, args.workers,
+                                    args.disagreement, debug=True)
+        if args.json is not None:
+            with open(args.json, 'w') as f: json.dump({'fingerprint': machine_fingerprint(), 'results': results}, f, indent=1)
+        if args.baseline is None: return 0
+        if args.update_baseline or not os.path.exists(args.baseline):
+            print('Stored baseline: ' + store_baseline(results, args.baseline))
+            return 0
+        regressions = check_baseline(results, args.baseline, args.threshold, args.memory_threshold)
+        for r in regressions: print('REGRESSION: ' + r)
+        return 1 if len(regressions)>0 else 0
+    if args.command=='compare':
+        measured    = load_baseline(args.results)
+        regressions = check_baseline(list(measured['benchmarks'].values()), args.baseline, args.threshold,
+                                     args.memory_threshold, measured['fingerprint'])
+        for r in regressions: print('REGRESSION: ' + r)
+        return 1 if len(regressions)>0 else 0
+    if args.command=='stage':
+        print(RESULT_PREFIX + json.dumps(run_stage(args.stage, args.cohort, args.view, args.workers)))
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import argparse
+import traceback
+from time import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from LazyLuna.loading_functions import get_imgs_and_annotation_paths
+from LazyLuna.header_index import get_headers, close_header_indexes
+from LazyLuna import profiling
+
+
+###########################
+# Headless Case Converter #
+###########################
+
+# the ledger is a json lines file in the cases folder, one record per finished conversion
+LEDGER_NAME = '.LL_conversion_ledger.jsonl'
+
+
+def get_views(view_names=None):
+    """Returns instances of all LazyLuna Views (or those named in view_names)
+
+    Args:
+        view_names (list of str): (optional) class names of views, like 'SAX_CINE_View'
+
+    Returns:
+        list of View: view instances
+    """
+    from LazyLuna import Views
+    return [v() for v in Views.get_view_classes(view_names)]
+
+def get_conversion_jobs(dicoms_path, reader_paths):
+    """Returns conversion jobs for all cases of all readers
+
+    Args:
+        dicoms_path (str):        path to folder containing case folders of dicom datasets
+        reader_paths (list of str): paths to reader folders containing annotation folders
+
+    Returns:
+        list of dict: jobs with keys: key, case_name, reader_name, imgs_path, annos_path
+    """
+    jobs = []
+    for reader_path in reader_paths:
+        reader_name = os.path.basename(os.path.normpath(reader_path))
+        try: ia_paths = get_imgs_and_annotation_paths(dicoms_path, reader_path)
+        except Exception as e: print('Failed listing cases for reader: ', reader_path, e); continue
+        for imgs_path, annos_path in ia_paths:
+            case_name = os.path.basename(imgs_path)
+            jobs.append({'key': reader_name+'/'+case_name, 'case_name': case_name, 'reader_name': reader_name,
+                         'imgs_path': imgs_path, 'annos_path': annos_path})
+    return jobs
+
+def convert_case(job, cases_path, view_names=None, profile=False):
+    """Converts a case: initializes all views and stores it in cases_path
+
+    Args:
+        job (dict):              conversion job (see get_conversion_jobs)
+        cases_path (str):        path to folder for the converted cases
+        view_names (list of str): (optional) class names of views to initialize
+        profile (bool):          records spans of the conversion (see LazyLuna.profiling) and returns them with the record
+
+    Returns:
+        dict: ledger record with keys: key, status ('converted' or 'failed'), case_path, seconds, views (view name: seconds, ok, error), error
+              (and spans if profile)
+    """
+    from LazyLuna.Containers import Case
+    # profiling is only switched on for the conversion, the profiler's state is restored afterwards
+    was_enabled = profiling.PROFILER.enabled
+    if profile: profiling.enable()
+    try:
+        st = time()
+        record = {'key': job['key'], 'status': 'failed', 'case_path': None, 'seconds': None, 'views': dict(), 'error': None}
+        with profiling.span('convert_case', case=job['case_name'], reader=job['reader_name']):
+            try:
+                if not os.path.exists(job['annos_path']): raise FileNotFoundError('No annotations available: ' + job['annos_path'])
+                # jobs run in pool workers: the header index is updated serially, Case then reads it from the index
+                get_headers(job['imgs_path'], executor='serial')
+                case = Case(job['imgs_path'], job['annos_path'], job['case_name'], job['reader_name'])
+                with profiling.span('get_views'): views = get_views(view_names)
+                for v in views:
+                    vst, name = time(), v.__class__.__name__
+                    try:
+                        case = v.initialize_case(case)
+                        record['views'][name] = {'seconds': time()-vst, 'ok': True,  'error': None}
+                    except Exception as e:
+                        record['views'][name] = {'seconds': time()-vst, 'ok': False, 'error': repr(e)}
+                with profiling.span('Case.store'): record['case_path'] = case.store(cases_path)
+                record['status']    = 'converted'
+            except Exception as e: record['error'] = traceback.format_exc()
+        record['seconds'] = time()-st
+        if profile: record['spans'] = profiling.PROFILER.take()
+    finally:
+        if profile and not was_enabled: profiling.disable()
+    return record
+
+def read_ledger(ledger_path):
+    """Returns the latest ledger record per job key (incomplete lines of an interrupted run are ignored)"""
+    records = dict()
+    if not os.path.exists(ledger_path): return records
+    with open(ledger_path, 'r') as f:
+        for line in f:
+            try: r = json.loads(line)
+            except ValueError: continue
+            records[r['key']] = r
+    return records
+
+def convert_cases(dicoms_path, reader_paths, cases_path, workers=None, view_names=None, retry_failed=False, ledger_path=None,
+                  trace_path=None):
+    """Converts all cases of all readers in a process pool, appending each result to the conversion ledger
+
+    Note:
+        Jobs already in the ledger are skipped (failed jobs are converted again if retry_failed), so an interrupted run resumes where it stopped.
+
+    Args:
+        dicoms_path (str):         path to folder containing case folders of dicom datasets
+        reader_paths (list of str): paths to reader folders containing annotation folders
+        cases_path (str):          path to folder for the converted cases
+        workers (int):             number of processes, defaults to os.cpu_count(), 1 converts in this process
+        view_names (list of str):  (optional) class names of views to initialize
+        retry_failed (bool):       whether to convert failed jobs again
+        ledger_path (str):         (optional) path to ledger, defaults to a hidden file in cases_path
+        trace_path (str):          (optional) profiles the conversions, stores their spans as Chrome trace json file at trace_path
+                                   and prints the slowest steps (see LazyLuna.profiling)
+
+    Returns:
+        list of dict: ledger records of this run
+    """
+    os.makedirs(cases_path, exist_ok=True)
+    if ledger_path is None: ledger_path = os.path.join(cases_path, LEDGER_NAME)
+    done = read_ledger(ledger_path)
+    jobs = [j for j in get_conversion_jobs(dicoms_path, reader_paths) if j['key'] not in done or
+            (retry_failed and done[j['key']]['status']!='converted')]
+    print('Converting', len(jobs), 'cases,', len(done), 'in ledger.')
+    records, st, profile = [], time(), trace_path is not None
+    with open(ledger_path, 'a') as ledger:
+        def finish(r):
+            profiling.PROFILER.add(r.pop('spans', []))
+            records.append(r)
+            ledger.write(json.dumps(r)+'\n'); ledger.flush()
+            failed = [n for n, v in r['views'].items() if not v['ok']]
+            print('[{}/{}] {}: {} in {:.1f}s{}'.format(len(records), len(jobs), r['key'], r['status'], r['seconds'],
+                  ', failed views: '+', '.join(failed) if len(failed)>0 else ''))
+            if r['error'] is not None: print(r['error'])
+        if workers==1 or len(jobs)<=1:
+            for j in jobs: finish(convert_case(j, cases_path, view_names, profile))
+        else:
+            # header indexes opened in this process are closed before the workers fork
+            close_header_indexes()
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                futures = {ex.submit(convert_case, j, cases_path, view_names, profile): j for j in jobs}
+                for fut in as_completed(futures):
+                    try: r = fut.result()
+                    except Exception as e:
+                        r = {'key': futures[fut]['key'], 'status': 'failed', 'case_path': None, 'seconds': 0.0,
+                             'views': dict(), 'error': repr(e)}
+                    finish(r)
+    print_report(records, time()-st)
+    if profile:
+        profiling.print_summary(by=('name',))
+        print('Stored trace: ', profiling.store_chrome_trace(trace_path))
+    return records
+
+def print_report(records, seconds):
+    """Prints conversion counts and mean seconds and failures per view"""
+    converted = sum(r['status']=='converted' for r in records)
+    print('Converted {} of {} cases in {:.1f}s.'.format(converted, len(records), seconds))
+    views = sorted(set(n for r in records for n in r['views']))
+    for n in views:
+        vs = [r['views'][n] for r in records if n in r['views']]
+        print('{:<20} mean {:.2f}s, failed {} of {}'.format(n, sum(v['seconds'] for v in vs)/len(vs),
+                                                           sum(not v['ok'] for v in vs), len(vs)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Converts dicom cases and reader annotations into LazyLuna cases without GUI.')
+    parser.add_argument('dicoms',  help='folder containing case folders of dicom datasets')
+    parser.add_argument('cases',   help='folder for the converted cases')
+    parser.add_argument('readers', nargs='+', help='reader folders containing annotation folders')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of processes (default: cpu count)')
+    parser.add_argument('--views', nargs='+', default=None, help='view class names to initialize (default: all)')
+    parser.add_argument('--retry-failed', action='store_true', help='convert jobs that failed in a previous run again')
+    parser.add_argument('--ledger', default=None, help='path to conversion ledger (default: hidden file in cases folder)')
+    parser.add_argument('--trace',  default=None, help='profile the conversions and store a Chrome trace json file at this path')
+    args = parser.parse_args(argv)
+    records = convert_cases(args.dicoms, args.readers, args.cases, workers=args.workers, view_names=args.views,
+                            retry_failed=args.retry_failed, ledger_path=args.ledger, trace_path=args.trace)
+    return 0 if all(r['status']=='converted' for r in records) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+##########
+# Caches #
+##########
+
+def nbytes(value):
+    """Approximate memory size of a cached value in bytes"""
+    if isinstance(value, np.ndarray): return value.nbytes
+    return sys.getsizeof(value)
+
+
+class LRU_Cache:
+    """LRU_Cache is a thread-safe least recently used cache with a memory budget
+
+    Args:
+        max_mb (float):      memory budget in megabytes, the least recently used entries are evicted beyond it
+        sizeof (function):   returns the size of a value in bytes
+        name (str):          name for display
+
+    Attributes:
+        hits, misses, evictions (int): counters since the last reset
+    """
+    def __init__(self, max_mb, sizeof=nbytes, name='cache'):
+        self.name      = name
+        self.max_bytes = int(max_mb * 1024**2)
+        self.sizeof    = sizeof
+        self._entries  = OrderedDict() # key: (value, size)
+        self._bytes    = 0
+        self._lock     = threading.Lock()
+        self.reset_stats()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try: value, _ = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries: self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes: return value
+            self._entries[key] = (value, size)
+            self._bytes += size
+            self._evict()
+        return value
+
+    def pop(self, key):
+        with self._lock:
+            if key not in self._entries: return None
+            value, size = self._entries.pop(key)
+            self._bytes -= size
+            return value
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries)>0:
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes    -= size
+            self.evictions += 1
+
+    def set_max_mb(self, max_mb):
+        """Sets the memory budget in megabytes and evicts entries beyond it"""
+        with self._lock:
+            self.max_bytes = int(max_mb * 1024**2)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def reset_stats(self):
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def stats(self):
+        """Returns dict of hits, misses, evictions, entries, size_mb and max_mb"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self._entries),
+                    'size_mb': self._bytes / 1024**2, 'max_mb': self.max_bytes / 1024**2}
+
+    def __len__(self): return len(self._entries)
+
+    def __str__(self):
+        s = self.stats()
+        return '{}: {} entries, {:.1f} of {:.1f} MB, hits: {}, misses: {}, evictions: {}'.format(
+            self.name, s['entries'], s['size_mb'], s['max_mb'], s['hits'], s['misses'], s['evictions'])
+
+
+###############
+# Pixel Cache #
+###############
+
+# process-wide cache of normalized images, keyed by (sopinstanceuid, value_normalize, window_normalize)
+PIXEL_CACHE = LRU_Cache(max_mb=512, name='Pixel cache')
+
+def set_pixel_cache_budget(max_mb):
+    """Sets the memory budget of the process-wide pixel cache in megabytes (0 disables caching)"""
+    PIXEL_CACHE.set_max_mb(max_mb)
+
+def freeze(img, dtype=np.float32):
+    """Returns img as read-only array (float32 unless dtype is given, None keeps its dtype), suitable for sharing through a cache"""
+    img = np.asarray(img, dtype=dtype)
+    img.flags.writeable = False
+    return img
+
+
+##############
+# Mask Cache #
+##############
+
+# process-wide cache of rasterized contours as packed bits, keyed by (sopinstanceuid, contour name, height, width, contour wkb)
+MASK_CACHE = LRU_Cache(max_mb=64, name='Mask cache')
+
+def set_mask_cache_budget(max_mb):
+    """Sets the memory budget of the process-wide mask cache in megabytes (0 disables caching)"""
+    MASK_CACHE.set_max_mb(max_mb)
+
+def pack_mask(mask):
+    """Returns a 2D mask as read-only packed bits (see unpack_mask)"""
+    bits = np.packbits(np.asarray(mask)!=0)
+    bits.flags.writeable = False
+    return bits
+
+def unpack_mask(bits, height, width):
+    """Returns packed bits as 2D mask (ndarray of np.uint8)"""
+    return np.unpackbits(bits, count=height*width).reshape(height, width)
+
+
+###################
+# Memo Statistics #
+###################
+
+class Memo_Stats:
+    """Memo_Stats counts the lookups of values memoized on their owners (e.g. clinical results)
+
+    Args:
+        name (str): name for display
+
+    Attributes:
+        hits, misses, invalidations (int): counters since the last reset, invalidations are misses of outdated values
+    """
+    def __init__(self, name='memo'):
+        self.name  = name
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def count(self, hit, invalidation=False):
+        with self._lock:
+            if hit: self.hits += 1
+            else:   self.misses += 1; self.invalidations += int(invalidation)
+
+    def reset_stats(self):
+        self.hits, self.misses, self.invalidations = 0, 0, 0
+
+    def stats(self):
+        """Returns dict of hits, misses and invalidations"""
+        return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations}
+
+    def __str__(self):
+        return '{}: hits: {}, misses: {}, invalidations: {}'.format(self.name, self.hits, self.misses, self.invalidations)
+
+# process-wide statistics of the clinical result memoization (see LazyLuna.ClinicalResults.memoized_CR)
+CR_MEMO_STATS = Memo_Stats(name='Clinical result memo')
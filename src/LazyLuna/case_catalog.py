@@ -0,0 +1,198 @@
+import os
+import json
+import sqlite3
+import threading
+
+import numpy as np
+import pydicom
+
+from LazyLuna.case_storage import case_paths
+
+
+#################
+# Case Catalogs #
+#################
+
+# catalog columns, (name, sqlite column type), keyed by the case file path relative to the catalog folder
+CATALOG_FIELDS  = [('case_name',     'TEXT'),
+                   ('reader',        'TEXT'),
+                   ('studyuid',      'TEXT'),
+                   ('types',         'TEXT'),
+                   ('age',           'REAL'),
+                   ('gender',        'TEXT'),
+                   ('weight',        'REAL'),
+                   ('height',        'REAL'),
+                   ('creation_date', 'TEXT')]
+CATALOG_VERSION = 1
+CATALOG_NAME    = '.LL_case_catalog.sqlite'
+# dicom attributes for demographics, read from the case's header store
+DEMOGRAPHIC_TAGS = ['PatientAge', 'PatientSex', 'PatientWeight', 'PatientSize', 'InstanceCreationDate']
+
+
+def get_demographics(case):
+    """Returns demographics of a case from the header of its first dicom
+
+    Note:
+        Headers come from the case's header store, cases stored without demographics read one dicom header.
+
+    Args:
+        case (LazyLuna.Containers.Case): case
+
+    Returns:
+        dict: age (years), gender ('M'/'F'), weight (kg), height (m), creation_date (str), np.nan if unavailable
+    """
+    h = dict()
+    for k in case.all_imgs_sop2filepath.keys():
+        try: sop = next(iter(case.all_imgs_sop2filepath[k]))
+        except StopIteration: continue
+        h = getattr(case, 'headers', dict()).get(sop, dict())
+        if not all(t in h for t in DEMOGRAPHIC_TAGS):
+            try:
+                dcm = pydicom.dcmread(case.all_imgs_sop2filepath[k][sop], stop_before_pixels=True, specific_tags=DEMOGRAPHIC_TAGS)
+                h   = {t:getattr(dcm, t, None) for t in DEMOGRAPHIC_TAGS}
+            except: h = dict()
+        break
+    def value(k, f):
+        try:    return f(h.get(k))
+        except: return np.nan
+    return {'age':           value('PatientAge',    lambda a: float(a[:-1]) if a!='' else np.nan),
+            'gender':        value('PatientSex',    lambda g: g if g in ['M','F'] else np.nan),
+            'weight':        value('PatientWeight', lambda w: float(w) if w is not None else np.nan),
+            'height':        value('PatientSize',   lambda s: np.nan if s is None else float(s)/100 if float(s)>3 else float(s)),
+            'creation_date': value('InstanceCreationDate', lambda d: str(d) if d is not None else np.nan)}
+
+def catalog_entry(case, path):
+    """Returns the catalog entry of a stored case
+
+    Args:
+        case (LazyLuna.Containers.Case): case
+        path (str):                      path to case file
+
+    Returns:
+        dict: catalog fields and path
+    """
+    entry = {'case_name': case.case_name, 'reader': case.reader_name, 'studyuid': case.studyinstanceuid,
+             'types': sorted(case.available_types), 'path': str(path)}
+    entry.update(get_demographics(case))
+    return entry
+
+
+class Case_Catalog:
+    """Case_Catalog is a persistent table of the cases stored in a folder
+
+    The catalog is an sqlite file in the folder. Case.store adds entries, cases stored otherwise are loaded once when the catalog is read.
+
+    Args:
+        folder (str): path to folder containing case files (searched recursively)
+
+    Attributes:
+        folder (str):       path to folder containing case files
+        catalog_path (str): path to the sqlite file (':memory:' if folder is not writable)
+    """
+    def __init__(self, folder):
+        self.folder       = os.path.normpath(os.path.abspath(str(folder)))
+        self.catalog_path = os.path.join(self.folder, CATALOG_NAME)
+        self._lock        = threading.RLock()
+        try:
+            self._conn = sqlite3.connect(self.catalog_path, timeout=60, check_same_thread=False)
+            self._create_tables()
+        except sqlite3.Error as e:
+            print('Case catalog not writable (' + str(e) + '), keeping it in memory.')
+            self.catalog_path = ':memory:'
+            self._conn = sqlite3.connect(self.catalog_path, check_same_thread=False)
+            self._create_tables()
+
+    def _create_tables(self):
+        with self._lock, self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            row = self._conn.execute("SELECT value FROM meta WHERE key='version'").fetchone()
+            if row is None or int(row[0])!=CATALOG_VERSION:
+                self._conn.execute('DROP TABLE IF EXISTS cases')
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(CATALOG_VERSION),))
+            cols = ', '.join(k+' '+t for k, t in CATALOG_FIELDS)
+            self._conn.execute('CREATE TABLE IF NOT EXISTS cases (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, ' + cols + ')')
+
+    def _relpath(self, path):
+        return os.path.relpath(os.path.normpath(os.path.abspath(str(path))), self.folder)
+
+    def _stat_files(self):
+        stats = dict()
+        for p in case_paths(self.folder):
+            try: st = os.stat(p)
+            except OSError: continue
+            stats[self._relpath(p)] = (st.st_size, st.st_mtime_ns)
+        return stats
+
+    def _upsert(self, entry, size, mtime):
+        vals = [json.dumps(entry[k]) if k=='types' else entry[k] for k, _ in CATALOG_FIELDS]
+        vals = [None if isinstance(v, float) and np.isnan(v) else v for v in vals]
+        with self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO cases VALUES (' + ','.join(['?']*(3+len(CATALOG_FIELDS))) + ')',
+                               [self._relpath(entry['path']), size, mtime] + vals)
+
+    def add(self, case, path):
+        """Adds or replaces the entry of a stored case
+
+        Args:
+            case (LazyLuna.Containers.Case): case
+            path (str):                      path to case file
+        """
+        st = os.stat(path)
+        with self._lock: self._upsert(catalog_entry(case, path), st.st_size, st.st_mtime_ns)
+
+    def update(self, debug=False):
+        """Adds new and changed case files (loading them once) and removes deleted ones
+
+        Returns:
+            int: number of cases that were loaded
+        """
+        from LazyLuna.Containers import load_case
+        with self._lock:
+            stats   = self._stat_files()
+            catalog = {p:(s,m) for p,s,m in self._conn.execute('SELECT path, size, mtime FROM cases')}
+            changed = [p for p, sm in stats.items() if catalog.get(p)!=sm]
+            removed = [p for p in catalog.keys() if p not in stats]
+            with self._conn: self._conn.executemany('DELETE FROM cases WHERE path=?', [(p,) for p in removed])
+            for p in changed:
+                path = os.path.join(self.folder, p)
+                try:
+                    self._upsert(catalog_entry(load_case(path), path), *stats[p])
+                except Exception as e: print('Failed cataloging case: ', path, e)
+            if debug: print('Case catalog read ', len(changed), ' of ', len(stats), ' cases.')
+            return len(changed)
+
+    def entries(self, update=True, debug=False):
+        """Returns catalog entries of all cases in folder
+
+        Args:
+            update (bool): whether to update the catalog first (see update)
+
+        Returns:
+            list of dict: entries with keys: path (absolute), case_name, reader, studyuid, types (list of str), age, gender, weight, height, creation_date
+        """
+        if update: self.update(debug)
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM cases ORDER BY path').fetchall()
+        entries = []
+        for row in rows:
+            entry = {'path': os.path.join(self.folder, row[0])}
+            for (k, t), v in zip(CATALOG_FIELDS, row[3:]):
+                if   k=='types': v = json.loads(v)
+                elif v is None and k in ['age', 'gender', 'weight', 'height', 'creation_date']: v = np.nan
+                entry[k] = v
+            entries.append(entry)
+        return entries
+
+    def close(self):
+        with self._lock: self._conn.close()
+
+
+_catalogs      = dict()
+_catalogs_lock = threading.Lock()
+
+def get_case_catalog(folder):
+    """Returns the process-wide Case_Catalog for a folder"""
+    key = os.path.normpath(os.path.abspath(str(folder)))
+    with _catalogs_lock:
+        if key not in _catalogs: _catalogs[key] = Case_Catalog(key)
+        return _catalogs[key]
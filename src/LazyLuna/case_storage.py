@@ -0,0 +1,165 @@
+import os
+import io
+import json
+import pickle
+import zipfile
+import threading
+from pathlib import Path
+
+
+################
+# Case Storage #
+################
+
+# A stored case is a zip archive with a json manifest and separately pickled sections:
+#   manifest.json            format version, case attributes and section names
+#   file_maps.pickle         all_imgs_sop2filepath, imgs_sop2filepath, annos_sop2filepath
+#   headers.pickle           header store
+#   categories/<type>.pickle categories of one view type (other_categories[type])
+#   state.pickle             remaining attributes (current categories, clinical results, ...)
+# Sections are unpickled on first access of one of their attributes.
+CASE_FORMAT    = 'LazyLuna case'
+CASE_VERSION   = 1
+CASE_SUFFIX    = '.llcase'
+# legacy cases are whole-object pickles
+LEGACY_SUFFIX  = '.pickle'
+MANIFEST_ATTRIBUTES = ['imgs_path', 'annos_path', 'case_name', 'reader_name', 'type', 'studyinstanceuid']
+SECTIONS            = {'file_maps': ['all_imgs_sop2filepath', 'imgs_sop2filepath', 'annos_sop2filepath'],
+                       'headers':   ['headers']}
+# session state that is never stored
+TRANSIENT_ATTRIBUTES = ['_anno_cache', '_anno_state', '_lazy_attributes', '_storage_path']
+
+_load_lock = threading.RLock()
+
+
+def is_case_archive(path):
+    """Returns True if path is a case stored in the sectioned format (False for legacy pickles)"""
+    return zipfile.is_zipfile(str(path))
+
+def case_paths(folder):
+    """Returns paths of all stored cases in folder (searched recursively), sectioned and legacy"""
+    paths = []
+    for suffix in [CASE_SUFFIX, LEGACY_SUFFIX]: paths += [str(p) for p in Path(folder).glob('**/*'+suffix)]
+    return sorted(paths)
+
+
+class _Section_Pickler(pickle.Pickler):
+    """Pickles a section, objects of other sections (case, categories) are stored as references"""
+    def __init__(self, f, refs):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.refs = refs
+    def persistent_id(self, obj):
+        return self.refs.get(id(obj))
+
+class _Section_Unpickler(pickle.Unpickler):
+    def __init__(self, f, case):
+        super().__init__(f)
+        self.case = case
+    def persistent_load(self, pid):
+        if pid[0]=='case':     return self.case
+        if pid[0]=='category': return self.case.other_categories[pid[1]][pid[2]]
+        raise pickle.UnpicklingError('Unknown reference in case section: ' + str(pid))
+
+
+class Lazy_Categories(dict):
+    """Lazy_Categories maps view types to category lists that are unpickled on first access"""
+    def __init__(self, case, types):
+        super().__init__({t:None for t in types})
+        self._case, self._pending = case, set(types)
+    def __getitem__(self, key):
+        if key in self._pending:
+            with _load_lock:
+                if key in self._pending:
+                    dict.__setitem__(self, key, _read_section(self._case, 'categories/'+key+'.pickle'))
+                    self._pending.discard(key)
+        return dict.__getitem__(self, key)
+    def __setitem__(self, key, value):
+        self._pending.discard(key)
+        dict.__setitem__(self, key, value)
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+    def values(self): return [self[k] for k in self.keys()]
+    def items(self):  return [(k, self[k]) for k in self.keys()]
+    def __reduce__(self): return (dict, (dict(self.items()),))
+
+
+def write_case(case, path):
+    """Writes case to path in the sectioned case format
+
+    Args:
+        case (LazyLuna.Containers.Case): case
+        path (str):                      path to case file
+    """
+    state = {k:v for k, v in case.__getstate__().items() if k not in TRANSIENT_ATTRIBUTES}
+    other_categories = state.pop('other_categories', dict())
+    manifest = {'format': CASE_FORMAT, 'version': CASE_VERSION,
+                'available_types': sorted(state.pop('available_types', set())),
+                'category_types': sorted(other_categories.keys()), 'categories_type': None}
+    for k in MANIFEST_ATTRIBUTES: manifest[k] = state.pop(k, None)
+    # current categories are usually one of the stored category lists
+    for t, cats in other_categories.items():
+        if state.get('categories') is cats: manifest['categories_type'] = t; state.pop('categories')
+    refs = {id(case): ('case',)}
+    for t, cats in other_categories.items():
+        for i, c in enumerate(cats): refs[id(c)] = ('category', t, i)
+    def dump(obj, exclude=()):
+        f = io.BytesIO()
+        _Section_Pickler(f, {k:v for k, v in refs.items() if k not in exclude}).dump(obj)
+        return f.getvalue()
+    tmp = str(path) + '.tmp'
+    with zipfile.ZipFile(tmp, 'w', compression=zipfile.ZIP_DEFLATED) as z:
+        for name, attributes in SECTIONS.items():
+            z.writestr(name+'.pickle', dump({k:state.pop(k) for k in attributes if k in state}))
+        for t, cats in other_categories.items():
+            z.writestr('categories/'+t+'.pickle', dump(cats, exclude=set(id(c) for c in cats)))
+        z.writestr('state.pickle', dump(state))
+        manifest['state_attributes'] = sorted(state.keys())
+        z.writestr('manifest.json', json.dumps(manifest))
+    os.replace(tmp, str(path))
+
+def read_manifest(path):
+    """Returns the manifest (dict) of a case stored in the sectioned format"""
+    with zipfile.ZipFile(str(path), 'r') as z: manifest = json.loads(z.read('manifest.json'))
+    if manifest.get('format')!=CASE_FORMAT or manifest.get('version', 0)>CASE_VERSION:
+        raise ValueError('Unsupported case format: ' + str(manifest.get('format')) + ' version ' + str(manifest.get('version')))
+    return manifest
+
+def read_case(case, path):
+    """Initializes an empty case from a case file, sections are read on first access
+
+    Args:
+        case (LazyLuna.Containers.Case): case created without __init__
+        path (str):                      path to case file
+    """
+    manifest = read_manifest(path)
+    for k in MANIFEST_ATTRIBUTES: case.__dict__[k] = manifest[k]
+    case.__dict__['available_types'] = set(manifest['available_types'])
+    case.__dict__['_storage_path']   = str(path)
+    lazy = {a:name for name, attributes in SECTIONS.items() for a in attributes}
+    lazy.update({a:'state' for a in manifest['state_attributes']})
+    case.__dict__['_lazy_attributes'] = lazy
+    if len(manifest['category_types'])>0:
+        case.__dict__['other_categories'] = Lazy_Categories(case, manifest['category_types'])
+    if manifest['categories_type'] is not None:
+        case.__dict__['categories'] = case.other_categories[manifest['categories_type']]
+
+def _read_section(case, name):
+    with zipfile.ZipFile(case.__dict__['_storage_path'], 'r') as z:
+        with z.open(name) as f: return _Section_Unpickler(f, case).load()
+
+def load_lazy_attribute(case, attribute):
+    """Reads the section holding attribute of a case read with read_case and sets its attributes"""
+    with _load_lock:
+        lazy = case.__dict__.get('_lazy_attributes', dict())
+        if attribute not in lazy: return
+        name    = lazy[attribute]
+        section = _read_section(case, name+'.pickle')
+        for k in [a for a, n in lazy.items() if n==name]:
+            lazy.pop(k)
+            if k in section and k not in case.__dict__: case.__dict__[k] = section[k]
+
+def load_all(case):
+    """Reads all remaining sections of a case read with read_case"""
+    for a in list(case.__dict__.get('_lazy_attributes', dict()).keys()): load_lazy_attribute(case, a)
+    if isinstance(case.__dict__.get('other_categories'), Lazy_Categories):
+        case.__dict__['other_categories'] = dict(case.__dict__['other_categories'].items())
@@ -0,0 +1,155 @@
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas
+from pandas import DataFrame
+
+from LazyLuna.profiling import span
+
+
+##################
+# Cohort Results #
+##################
+
+def _as_float(val):
+    try:    return float(val)
+    except: return np.nan
+
+def _is_int(val):
+    return isinstance(val, (int, np.integer)) and not isinstance(val, bool)
+
+def _case_values(case):
+    # (name, unit, tol_range, value, value is integer) of all clinical results of a case, in the order of case.crs
+    vals = [(cr, cr.get_val()) for cr in case.crs]
+    return [(cr.name, cr.unit, getattr(cr, 'tol_range', np.nan), _as_float(v), _is_int(v)) for cr, v in vals]
+
+def _comparison_diffs(cc):
+    # (get_val_diff, difference is integer) of the clinical results of a case comparison by name
+    # (some differences are not plain subtractions, e.g. phases)
+    crs2, diffs = {cr.name: cr for cr in cc.case2.crs}, dict()
+    for cr1 in cc.case1.crs:
+        if cr1.name not in crs2: continue
+        try:
+            d = cr1.get_val_diff(crs2[cr1.name])
+            diffs[cr1.name] = (_as_float(d), _is_int(d))
+        except: print(traceback.format_exc()); diffs[cr1.name] = (np.nan, False)
+    return diffs
+
+
+class Cohort_Results:
+    """Cohort_Results evaluates all clinical results of a list of case comparisons once into typed long format tables
+
+    Note:
+        Tables and figures on clinical results aggregate these tables instead of collecting the values themselves.
+        Clinical results are paired by name, in the order of the first case's clinical results.
+
+    Args:
+        case_comparisons (list of LazyLuna.Containers.Case_Comparison): case comparisons after View.customize_case(case) (for any View)
+        workers (int): number of threads the cases are evaluated with, 1 evaluates in this thread
+        debug (bool): if True prints the evaluation time
+
+    Attributes:
+        df (pandas.DataFrame):    one row per case and clinical result with columns: comparison (index of the case comparison), case, studyuid,
+                                  reader, reader_nr (1 | 2), cr, unit, tol_range, value
+        pairs (pandas.DataFrame): one row per case comparison and clinical result with columns: comparison, case, studyuid, reader1, reader2,
+                                  cr, unit, tol_range, value1, value2, diff (Clinical_Result.get_val_diff), avg
+        cr_names (list of str):   names of the clinical results in order
+        integer_columns (set of tuple): (cr, 'value1' | 'value2' | 'diff') of pairs whose values are all integers (e.g. phases),
+                                  restored as integer columns by wide
+        case_names, readers1, readers2 (list of str): per case comparison
+    """
+    def __init__(self, case_comparisons, workers=1, debug=False):
+        with span('Cohort_Results.__init__', debug=debug):
+            case_comparisons = list(case_comparisons)
+            cases = [c for cc in case_comparisons for c in (cc.case1, cc.case2)]
+            if workers==1 or len(cases)<=1:
+                values = [_case_values(c) for c in cases]
+                diffs  = [_comparison_diffs(cc) for cc in case_comparisons]
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as ex:
+                    values = list(ex.map(_case_values, cases))
+                    diffs  = list(ex.map(_comparison_diffs, case_comparisons))
+            # no references to the cases are kept, the tables are picklable (e.g. for export worker processes)
+            self.case_names = [cc.case1.case_name   for cc in case_comparisons]
+            self.readers1   = [cc.case1.reader_name for cc in case_comparisons]
+            self.readers2   = [cc.case2.reader_name for cc in case_comparisons]
+            self.cr_names   = [cr.name for cr in case_comparisons[0].case1.crs] if len(case_comparisons)>0 else []
+            self._build(case_comparisons, values, diffs)
+
+    def _build(self, case_comparisons, values, diffs):
+        rows, ints = [], dict()
+        for i, cc in enumerate(case_comparisons):
+            for nr, case, vals in [(1, cc.case1, values[2*i]), (2, cc.case2, values[2*i+1])]:
+                for name, unit, tol_range, val, is_int in vals:
+                    rows.append((i, cc.case1.case_name, cc.case1.studyinstanceuid, case.reader_name, nr, name, unit, tol_range, val))
+                    ints[(name, 'value'+str(nr))] = ints.get((name, 'value'+str(nr)), True) and is_int
+            for name, (d, is_int) in diffs[i].items(): ints[(name, 'diff')] = ints.get((name, 'diff'), True) and is_int
+        self.integer_columns = set(k for k, is_int in ints.items() if is_int)
+        columns = ['comparison', 'case', 'studyuid', 'reader', 'reader_nr', 'cr', 'unit', 'tol_range', 'value']
+        df = DataFrame(rows, columns=columns)
+        df = df.astype({'comparison': np.int64, 'reader_nr': np.int8, 'tol_range': np.float64, 'value': np.float64})
+        for c in ['case', 'studyuid', 'reader', 'unit']: df[c] = df[c].astype('category')
+        df['cr'] = pandas.Categorical(df['cr'], categories=list(dict.fromkeys(self.cr_names + list(df['cr'].unique()))), ordered=True)
+        self.df = df
+        # pairs of values by comparison and name
+        keys  = ['comparison', 'cr']
+        first = df[df['reader_nr']==1].drop(columns='reader_nr').rename(columns={'reader': 'reader1', 'value': 'value1'})
+        other = df[df['reader_nr']==2][keys+['reader', 'value']].rename(columns={'reader': 'reader2', 'value': 'value2'})
+        pairs = first.merge(other, on=keys, how='inner', sort=False)
+        diff  = {(i, n): d for i, ds in enumerate(diffs) for n, d in ds.items()}
+        pairs['diff'] = np.array([diff.get(k, (np.nan, False))[0] for k in zip(pairs['comparison'], pairs['cr'])], dtype=np.float64)
+        pairs['avg']  = (pairs['value1'] + pairs['value2']) / 2.0
+        self.pairs = pairs[['comparison', 'case', 'studyuid', 'reader1', 'reader2', 'cr', 'unit', 'tol_range', 'value1', 'value2', 'diff', 'avg']]
+
+    def get_pairs(self, cr_name):
+        """Returns the rows of pairs of one clinical result (see Attributes)"""
+        return self.pairs[self.pairs['cr']==cr_name]
+
+    def summary(self):
+        """Aggregates the pairs per clinical result
+
+        Returns:
+            pandas.DataFrame: one row per clinical result (index cr, in order) with columns: unit, tol_range, n (number of case comparisons),
+                              mean1, std1, mean2, std2, mean_diff, std_diff (nan values skipped, population standard deviations),
+                              ci (1.96 * std_diff / sqrt(n)), loa_lower, loa_upper (Bland-Altman limits of agreement: mean_diff ∓ 1.96 * sample standard deviation of diff)
+        """
+        g = self.pairs.groupby('cr', observed=True, sort=True)
+        s = DataFrame({'unit':      g['unit'].first().astype(str),
+                       'tol_range': g['tol_range'].first(),
+                       'n':         g.size(),
+                       'mean1':     g['value1'].mean(), 'std1':     g['value1'].std(ddof=0),
+                       'mean2':     g['value2'].mean(), 'std2':     g['value2'].std(ddof=0),
+                       'mean_diff': g['diff'].mean(),   'std_diff': g['diff'].std(ddof=0)})
+        s['ci'] = 1.96 * s['std_diff'] / np.sqrt(s['n'])
+        sample_std     = g['diff'].std(ddof=1)
+        s['loa_lower'] = s['mean_diff'] - 1.96 * sample_std
+        s['loa_upper'] = s['mean_diff'] + 1.96 * sample_std
+        return s
+
+    def wide(self):
+        """Returns one row per case comparison with columns: case, reader1, reader2 and per clinical result: '<cr> <reader1>', '<cr> <reader2>', '<cr> difference'
+
+        Note:
+            Columns of integer clinical results (e.g. phases, see integer_columns) without missing values are integer columns.
+        """
+        r1, r2 = self.readers1[0], self.readers2[0]
+        df = DataFrame({'case': self.case_names, 'reader1': self.readers1, 'reader2': self.readers2})
+        piv = self.pivot(['value1', 'value2', 'diff'])
+        columns, vals = [], []
+        for n in self.cr_names:
+            for v, s in [('value1', ' '+r1), ('value2', ' '+r2), ('diff', ' difference')]:
+                col = piv[n+' '+v]
+                if (n, v) in self.integer_columns and col.notna().all(): col = col.astype(np.int64)
+                columns.append(n+s); vals.append(col.values)
+        # built column by column (reader names may coincide, so columns are named after construction)
+        crs = DataFrame(dict(enumerate(vals)), index=df.index)
+        crs.columns = columns
+        return pandas.concat([df, crs], axis=1)
+
+    def pivot(self, values=['avg', 'diff'], cr_names=None):
+        """Returns one row per case comparison with columns '<cr> <value>' for the clinical results (default: all) and values (columns of pairs)"""
+        cr_names = self.cr_names if cr_names is None else cr_names
+        pairs = self.pairs[self.pairs['cr'].isin(cr_names)]
+        piv   = pairs.pivot(index='comparison', columns='cr', values=values).reindex(range(len(self.case_names)))
+        return DataFrame({n+' '+v: piv[(v, n)].values if (v, n) in piv.columns else np.full(len(piv), np.nan) for n in cr_names for v in values})
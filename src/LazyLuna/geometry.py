@@ -0,0 +1,65 @@
+import numpy as np
+
+
+##################
+# Image Geometry #
+##################
+
+# Image planes are resolved from header attributes alone (ImagePositionPatient, ImageOrientationPatient, PixelSpacing, Rows, Columns),
+# headers can be LazyLuna.header_index.Header or pydicom datasets. Patient coordinates are in mm.
+
+def image_plane(header):
+    """Returns the image plane of a dicom image in patient coordinates
+
+    Args:
+        header (Header | pydicom dataset): header with ImagePositionPatient, ImageOrientationPatient, PixelSpacing, Rows, Columns
+
+    Returns:
+        dict: origin (center of the first pixel), row_dir (direction of increasing column index), col_dir (direction of increasing row index),
+              normal (ndarray (3,)), spacing (ndarray (2,), row and column spacing), width, height (float, extent of the pixel centers along row_dir and col_dir)
+    """
+    origin  = np.asarray(header.ImagePositionPatient,    dtype=np.float64)
+    iop     = np.asarray(header.ImageOrientationPatient, dtype=np.float64)
+    spacing = np.asarray(header.PixelSpacing,            dtype=np.float64)
+    row_dir = iop[:3] / np.linalg.norm(iop[:3])
+    col_dir = iop[3:] / np.linalg.norm(iop[3:])
+    normal  = np.cross(row_dir, col_dir)
+    return {'origin': origin, 'row_dir': row_dir, 'col_dir': col_dir, 'normal': normal / np.linalg.norm(normal), 'spacing': spacing,
+            'width': (int(header.Columns)-1) * spacing[1], 'height': (int(header.Rows)-1) * spacing[0]}
+
+def image_to_patient(header, points):
+    """Transforms pixel coordinates of an image into patient coordinates
+
+    Note:
+        Equals LazyLuna.utils.transform_ics_to_rcs for points given as (row, column), without reading the dicom dataset
+
+    Args:
+        header (Header | pydicom dataset): image header (see image_plane)
+        points (ndarray (n,2) of float):   pixel coordinates (row, column)
+
+    Returns:
+        ndarray (n,3) of float: points in patient coordinates
+    """
+    p      = image_plane(header)
+    points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+    return p['origin'] + np.outer(points[:,1] * p['spacing'][1], p['row_dir']) + np.outer(points[:,0] * p['spacing'][0], p['col_dir'])
+
+def distance_to_image(points, header):
+    """Returns the minimal distances of points to the bounded image plane (the rectangle of its pixel centers)
+
+    Note:
+        The closest point of the rectangle is the projection onto the image plane, clamped to the rectangle.
+        No pixel data is read, the cost is independent of the image size.
+
+    Args:
+        points (ndarray (n,3) | (3,) of float): points in patient coordinates
+        header (Header | pydicom dataset):      image header (see image_plane)
+
+    Returns:
+        ndarray (n,) of float | float: distances in mm
+    """
+    p = image_plane(header)
+    d = np.atleast_2d(np.asarray(points, dtype=np.float64)) - p['origin']
+    u, v, n = d @ p['row_dir'], d @ p['col_dir'], d @ p['normal']
+    dist = np.sqrt((u - np.clip(u, 0, p['width']))**2 + (v - np.clip(v, 0, p['height']))**2 + n**2)
+    return dist if np.ndim(points)>1 else dist[0]
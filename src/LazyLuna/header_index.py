@@ -0,0 +1,384 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import multiprocessing
+from time import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pydicom
+from pydicom.tag import Tag
+
+from LazyLuna.tag_manifest import get_manifest_tags
+
+
+##################
+# Header Indexes #
+##################
+
+# dicom attributes stored per file, (keyword, sqlite column type)
+HEADER_FIELDS = [('StudyInstanceUID',        'TEXT'),
+                 ('SOPInstanceUID',          'TEXT'),
+                 ('SeriesDescription',       'TEXT'),
+                 ('SeriesInstanceUID',       'TEXT'),
+                 ('LL_tag',                  'TEXT'),
+                 ('SliceLocation',           'REAL'),
+                 ('InstanceNumber',          'INTEGER'),
+                 ('ImagePositionPatient',    'TEXT'),
+                 ('ImageOrientationPatient', 'TEXT'),
+                 ('PixelSpacing',            'TEXT'),
+                 ('Rows',                    'INTEGER'),
+                 ('Columns',                 'INTEGER'),
+                 ('SliceThickness',          'REAL'),
+                 ('SpacingBetweenSlices',    'REAL'),
+                 ('PatientAge',              'TEXT'),
+                 ('PatientSex',              'TEXT'),
+                 ('PatientWeight',           'REAL'),
+                 ('PatientSize',             'REAL'),
+                 ('InstanceCreationDate',    'TEXT')]
+# multi-valued attributes are stored as json lists
+LIST_FIELDS   = ['ImagePositionPatient', 'ImageOrientationPatient', 'PixelSpacing']
+FLOAT_FIELDS  = ['SliceLocation', 'SliceThickness', 'SpacingBetweenSlices', 'PatientWeight', 'PatientSize']
+INDEX_VERSION = 3
+INDEX_NAME    = '.LL_header_index.sqlite'
+# (optional) folder for the header indexes (e.g. for read-only or shared archives), by default they are hidden files in the dicom folders
+INDEX_DIR     = os.environ.get('LAZYLUNA_INDEX_DIR')
+# only these tags are parsed, the LL tag is the private creator (0x000b, 0x0010)
+HEADER_TAGS   = [Tag(0x000b, 0x0010)] + [k for k, _ in HEADER_FIELDS if k!='LL_tag']
+
+# scan engine defaults: workers=None uses os.cpu_count(), executor is 'process', 'thread' or 'serial'
+# process pools are opt-in: the GUI must not fork and conversion workers (LazyLuna.bulk_converter) must not start nested pools
+SCAN_WORKERS   = None
+SCAN_CHUNKSIZE = 64
+SCAN_EXECUTOR  = 'thread'
+
+
+class Header(dict):
+    """Header is a dictionary of dicom keywords to values of a single dicom file
+
+    Header offers attribute access like a pydicom dataset (header.SOPInstanceUID). Missing attributes raise an AttributeError as in pydicom.
+
+    Attributes:
+        path (str): path to dicom file
+    """
+    def __getattr__(self, key):
+        try: v = self[key]
+        except KeyError: raise AttributeError(key)
+        if v is None: raise AttributeError(key)
+        return v
+
+
+def read_header(path):
+    """Reads the indexed attributes of a dicom file
+
+    Args:
+        path (str): path to dicom file
+
+    Returns:
+        Header: header of dicom file
+    """
+    dcm = pydicom.dcmread(path, stop_before_pixels=True, specific_tags=HEADER_TAGS)
+    return header_from_dataset(dcm, path)
+
+def _read_headers(paths):
+    """Reads headers for a chunk of paths, unreadable files get None values"""
+    headers = []
+    for p in paths:
+        try:    headers.append(read_header(p))
+        except: headers.append(Header(path=p, **{k:None for k, _ in HEADER_FIELDS}))
+    return headers
+
+def map_chunks(func, items, workers=None, chunksize=None, executor=None, debug=False):
+    """Applies func to chunks of items on a process or thread pool and concatenates the results
+    
+    Note:
+        func must be a module level function returning a list. Falls back to threads if the process pool cannot be started. Small jobs (a single chunk) run serially,
+        as do process pools requested from worker processes (no nested pools).
+    
+    Args:
+        func (function):  maps a list of items to a list of results
+        items (list):     items to process
+        workers (int):    number of workers, defaults to SCAN_WORKERS (None: os.cpu_count())
+        chunksize (int):  number of items per task, defaults to SCAN_CHUNKSIZE
+        executor (str):   'process', 'thread' or 'serial', defaults to SCAN_EXECUTOR
+        
+    Returns:
+        (list, int, str): results in order of items, number of workers used, executor used
+    """
+    workers   = workers   or SCAN_WORKERS or os.cpu_count() or 1
+    chunksize = chunksize or SCAN_CHUNKSIZE
+    executor  = executor  or SCAN_EXECUTOR
+    chunks    = [items[i:i+chunksize] for i in range(0, len(items), chunksize)]
+    if len(chunks)<=1 or workers==1: executor = 'serial'
+    if executor=='process' and multiprocessing.parent_process() is not None: executor = 'serial'
+    workers   = min(workers, max(len(chunks), 1))
+    if executor=='process':
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                return [r for rs in ex.map(func, chunks) for r in rs], workers, executor
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            if debug: print('Process pool failed (' + str(e) + '), continuing with threads.')
+            executor = 'thread'
+    if executor=='thread':
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            return [r for rs in ex.map(func, chunks) for r in rs], workers, executor
+    return func(items), 1, 'serial'
+
+def scan_headers(paths, workers=None, chunksize=None, executor=None, debug=False):
+    """Reads headers of many dicom files on a process or thread pool
+    
+    Args:
+        paths (list of str): paths to dicom files
+        workers, chunksize, executor: pool settings (see map_chunks)
+        
+    Returns:
+        (list of Header, dict): headers in order of paths, throughput report (files, seconds, files_per_second, workers, executor)
+    """
+    st    = time()
+    paths = [str(p) for p in paths]
+    headers, workers, executor = map_chunks(_read_headers, paths, workers, chunksize, executor, debug)
+    t      = time()-st
+    report = {'files': len(paths), 'seconds': t, 'files_per_second': len(paths)/t if t>0 else float('inf'),
+              'workers': workers, 'executor': executor}
+    if debug: print('Scanned {files} headers in {seconds:.2f}s ({files_per_second:.1f} files/s, {workers} {executor} workers)'.format(**report))
+    return headers, report
+
+def header_from_dataset(dcm, path):
+    """Converts a pydicom dataset into a Header
+
+    Args:
+        dcm (dicom dataset): dicom dataset
+        path (str):          path to dicom file
+
+    Returns:
+        Header: header of dicom dataset
+    """
+    h = Header(path=str(path))
+    for k, _ in HEADER_FIELDS:
+        if k=='LL_tag':
+            try:    h[k] = str(dcm[0x0b, 0x10].value)
+            except: h[k] = 'None'
+            continue
+        v = getattr(dcm, k, None)
+        try:
+            if v is None or v=='': h[k] = None
+            elif k in LIST_FIELDS:                          h[k] = [float(x) for x in v]
+            elif k in FLOAT_FIELDS:                         h[k] = float(v)
+            elif k in ['InstanceNumber', 'Rows', 'Columns']: h[k] = int(v)
+            else:                                           h[k] = str(v)
+        except (TypeError, ValueError): h[k] = None
+    return h
+
+
+def image_geometry(headers):
+    """Resolves the geometry of a stack of images from their headers alone (no pixel data is decoded)
+
+    Note:
+        In-plane attributes are taken from the first header. Missing attributes are None.
+
+    Args:
+        headers (list of Header): headers of the images ordered by slice
+
+    Returns:
+        dict: height, width (int), pixel_h, pixel_w, slice_thickness, spacing_between_slices (float),
+              slice_locations (list of float), slice_spacings (list of float, rounded distances between neighbouring slice locations), 
+              positions (list of list of float, ImagePositionPatient)
+    """
+    h = headers[0]
+    pixel_h, pixel_w = h['PixelSpacing'] if h['PixelSpacing'] is not None else (None, None)
+    locs = [x['SliceLocation'] for x in headers]
+    try:    spacings = [round(abs(l1 - l2), 2) for l1, l2 in zip(locs[:-1], locs[1:])]
+    except TypeError: spacings = []
+    return {'height': h['Rows'], 'width': h['Columns'], 'pixel_h': pixel_h, 'pixel_w': pixel_w,
+            'slice_thickness': h['SliceThickness'], 'spacing_between_slices': h['SpacingBetweenSlices'],
+            'slice_locations': locs, 'slice_spacings': spacings, 'positions': [x['ImagePositionPatient'] for x in headers]}
+
+
+class Header_Index:
+    """Header_Index is a persistent index of dicom headers for all dicom files in a folder
+
+    The index is an sqlite file in the folder (or in INDEX_DIR). Entries are keyed by path, file size and modification time, so only new or
+    changed files are read again on update. Indexes of folders that are not writable are kept in memory.
+
+    Args:
+        root (str):       path to folder containing dicom files (searched recursively)
+        index_path (str): (optional) path to the sqlite file, defaults to default_index_path(root)
+
+    Attributes:
+        root (str):       path to folder containing dicom files
+        index_path (str): path to the sqlite file (':memory:' if root is not writable)
+        last_report (dict): throughput report of the last update (see scan_headers)
+    """
+    def __init__(self, root, index_path=None):
+        self.root       = os.path.normpath(os.path.abspath(str(root)))
+        self.index_path = index_path if index_path is not None else default_index_path(self.root)
+        self._lock      = threading.RLock()
+        self.last_report = None
+        try:
+            if self.index_path!=':memory:' and not os.access(os.path.dirname(self.index_path), os.W_OK):
+                raise sqlite3.OperationalError('folder not writable')
+            self._conn = sqlite3.connect(self.index_path, timeout=60, check_same_thread=False)
+            self._create_tables()
+        except sqlite3.Error as e:
+            print('Header index not writable (' + str(e) + '), keeping it in memory.')
+            self.index_path = ':memory:'
+            self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+            self._create_tables()
+
+    def _create_tables(self):
+        with self._lock, self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            row = self._conn.execute("SELECT value FROM meta WHERE key='version'").fetchone()
+            if row is None or int(row[0])!=INDEX_VERSION:
+                self._conn.execute('DROP TABLE IF EXISTS headers')
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+            cols = ', '.join(k+' '+t for k, t in HEADER_FIELDS)
+            self._conn.execute('CREATE TABLE IF NOT EXISTS headers (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, ' + cols + ')')
+
+    def _row_to_header(self, row):
+        h = Header(path=row[0])
+        for (k, _), v in zip(HEADER_FIELDS, row[3:]):
+            h[k] = json.loads(v) if (k in LIST_FIELDS and v is not None) else v
+        return h
+
+    def _header_to_row(self, h, size, mtime):
+        vals = [json.dumps(h[k]) if (k in LIST_FIELDS and h[k] is not None) else h[k] for k, _ in HEADER_FIELDS]
+        return [h['path'], size, mtime] + vals
+
+    def _stat_files(self):
+        stats = dict()
+        for p in Path(self.root).glob('**/*.dcm'):
+            try: st = os.stat(p)
+            except OSError: continue
+            stats[str(p)] = (st.st_size, st.st_mtime_ns)
+        return stats
+
+    def update(self, workers=None, chunksize=None, executor=None, debug=False):
+        """Reads headers of new and changed files and removes deleted files from the index
+
+        Args:
+            workers, chunksize, executor: scan engine settings (see scan_headers)
+
+        Returns:
+            int: number of files that were (re-)read
+        """
+        with self._lock:
+            stats   = self._stat_files()
+            indexed = {p:(s,m) for p,s,m in self._conn.execute('SELECT path, size, mtime FROM headers')}
+            changed = [p for p, sm in stats.items() if indexed.get(p)!=sm]
+            removed = [p for p in indexed.keys() if p not in stats]
+            headers, self.last_report = scan_headers(changed, workers, chunksize, executor, debug)
+            rows = [self._header_to_row(h, *stats[h['path']]) for h in headers]
+            with self._conn:
+                self._conn.executemany('DELETE FROM headers WHERE path=?', [(p,) for p in removed])
+                self._conn.executemany('INSERT OR REPLACE INTO headers VALUES (' + ','.join(['?']*(3+len(HEADER_FIELDS))) + ')', rows)
+            if debug: print('Header index read ', len(changed), ' of ', len(stats), ' files.')
+            return len(changed)
+
+    def headers(self, update=True, **scan_kwargs):
+        """Returns headers of all dicom files in root, ordered by path
+
+        Note:
+            Files that could not be read as dicom have None values for all attributes
+
+        Args:
+            update (bool): if True the index is updated before returning
+            scan_kwargs:   workers, chunksize, executor, debug (see scan_headers)
+
+        Returns:
+            list of Header: headers
+        """
+        if update: self.update(**scan_kwargs)
+        with self._lock:
+            cur = self._conn.execute('SELECT * FROM headers ORDER BY path')
+            return [self._row_to_header(r) for r in cur]
+
+    def get(self, path):
+        """Returns header of a single dicom file, read again if the file changed
+
+        Args:
+            path (str): path to dicom file
+
+        Returns:
+            Header: header of dicom file
+        """
+        path = os.path.normpath(os.path.abspath(str(path)))
+        st   = os.stat(path)
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM headers WHERE path=?', (path,)).fetchone()
+            if row is not None and (row[1], row[2])==(st.st_size, st.st_mtime_ns): return self._row_to_header(row)
+            h = read_header(path)
+            with self._conn:
+                self._conn.execute('INSERT OR REPLACE INTO headers VALUES (' + ','.join(['?']*(3+len(HEADER_FIELDS))) + ')',
+                                   self._header_to_row(h, st.st_size, st.st_mtime_ns))
+            return h
+
+    def close(self):
+        with self._lock: self._conn.close()
+
+
+# indexes by folder, per process: sqlite connections must not be used across fork, forked children start without indexes
+# (the inherited ones are kept, unused and unclosed, in _inherited_indexes)
+_indexes = dict()
+_indexes_lock = threading.Lock()
+_inherited_indexes = []
+
+def _forget_indexes():
+    global _indexes, _indexes_lock
+    _inherited_indexes.extend(_indexes.values())
+    _indexes, _indexes_lock = dict(), threading.Lock()
+
+if hasattr(os, 'register_at_fork'): os.register_at_fork(after_in_child=_forget_indexes)
+
+def close_header_indexes():
+    """Closes the header indexes of this process (e.g. before starting a process pool), they are opened again on use"""
+    with _indexes_lock:
+        for index in _indexes.values(): index.close()
+        _indexes.clear()
+
+def default_index_path(root):
+    """Returns the path of the header index of a folder: a hidden file in root, or a file named after root in INDEX_DIR if set"""
+    root = os.path.normpath(os.path.abspath(str(root)))
+    if INDEX_DIR is None: return os.path.join(root, INDEX_NAME)
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    return os.path.join(INDEX_DIR, hashlib.blake2b(root.encode(), digest_size=16).hexdigest() + INDEX_NAME)
+
+def get_header_index(root, index_path=None):
+    """Returns the process-wide Header_Index for a folder
+
+    Args:
+        root (str):       path to folder containing dicom files
+        index_path (str): (optional) path to the sqlite file if the index is not open yet (see Header_Index)
+
+    Returns:
+        Header_Index: index for root
+    """
+    key = os.path.normpath(os.path.abspath(str(root)))
+    with _indexes_lock:
+        if key not in _indexes: _indexes[key] = Header_Index(key, index_path)
+        return _indexes[key]
+
+def get_headers(root, **scan_kwargs):
+    """Returns headers of all readable dicom files in folder, updating its index
+
+    Note:
+        LL tags are taken from the LL tag manifest first (see LazyLuna.tag_manifest), then from the dicom file
+
+    Args:
+        root (str):  path to folder containing dicom files
+        scan_kwargs: workers, chunksize, executor, debug (see scan_headers)
+
+    Returns:
+        list of Header: headers of dicom files with a SOPInstanceUID
+    """
+    headers, tags_by_dir = [], dict()
+    for h in get_header_index(root).headers(**scan_kwargs):
+        if h['SOPInstanceUID'] is None: continue
+        d = os.path.dirname(h['path'])
+        if d not in tags_by_dir: tags_by_dir[d] = get_manifest_tags(h['path'])
+        h['LL_tag'] = tags_by_dir[d].get(h['SOPInstanceUID'], h['LL_tag'])
+        headers.append(h)
+    return headers
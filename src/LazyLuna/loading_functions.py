@@ -2,26 +2,28 @@ import os
 from pathlib import Path
 import pickle
 import pydicom
-from time import time
-import pandas
+from LazyLuna.profiling import span
 import numpy as np
 import traceback
 
+from LazyLuna.header_index import get_headers, read_header, map_chunks
+from LazyLuna.tag_manifest import LL_Tag_Manifest, get_manifest_tag
+from LazyLuna.case_catalog import get_case_catalog, catalog_entry
+
 def get_study_uid(imgs_path):
     """Returns StudyInstanceUID for Dicom folder
     
     Note: 
         Assumes that there is only one study in folder.
+        Reads the header of the first readable dicom file, the folder is not indexed.
     
     Returns:
         str: StudyInstanceUID
     """
-    for ip, p in enumerate(Path(imgs_path).glob('**/*.dcm')):
-        try:
-            dcm = pydicom.dcmread(str(p), stop_before_pixels=True)
-            study_uid = dcm.StudyInstanceUID
-            return study_uid
-        except: continue
+    for p in Path(imgs_path).glob('**/*.dcm'):
+        try: study_uid = read_header(str(p))['StudyInstanceUID']
+        except Exception: continue
+        if study_uid is not None: return study_uid
 
 def annos_to_table(annos_path):
     """Returns DataFrame with information on annotations in folder
@@ -35,6 +37,7 @@ def annos_to_table(annos_path):
     Returns:
         pandas.DataFrame: table of information on annotations in folder path
     """
+    import pandas
     rows = []
     study_uid = os.path.basename(annos_path)
     columns = ['study_uid', 'sop_uid', 'annotated', 'anno_path']
@@ -46,28 +49,30 @@ def annos_to_table(annos_path):
     df = pandas.DataFrame(rows, columns=columns)
     return df
 
-def dicom_images_to_table(imgs_path):
+def dicom_images_to_table(imgs_path, workers=None, chunksize=None, executor=None, debug=False):
     """Returns DataFrame with on available dicom datasets in folder
     
     Note:
         Columns = (casename, studyinstanceuid, sopinstanceuid, series description, seriesuid, LL_tag, path to dicom dataset)
+        New and changed files are read in parallel with only the required tags (see LazyLuna.header_index.scan_headers)
     
     Args:
         imgs_path (str): folder path to dicom datasets
+        workers (int):   number of scan workers (None: os.cpu_count())
+        chunksize (int): number of files per scan task
+        executor (str):  'process', 'thread' or 'serial'
+        debug (bool):    prints the scan throughput (files/s)
     
     Returns:
         pandas.DataFrame: table of information on dicom datasets in folder path
     """
+    import pandas
     columns    = ['case', 'study_uid', 'sop_uid', 'series_descr', 'series_uid', 'LL_tag', 'dcm_path']
     rows, case = [], os.path.basename(imgs_path)
-    for ip, p in enumerate(Path(imgs_path).glob('**/*.dcm')):
+    for h in get_headers(imgs_path, workers=workers, chunksize=chunksize, executor=executor, debug=debug):
         try:
-            p = str(p)
-            dcm = pydicom.dcmread(p, stop_before_pixels=False)
-            try:    tag = dcm[0x0b, 0x10].value
-            except: tag = 'None'
-            row = [case, dcm.StudyInstanceUID, dcm.SOPInstanceUID, 
-                   dcm.SeriesDescription, dcm.SeriesInstanceUID, tag, p]
+            row = [case, h.StudyInstanceUID, h.SOPInstanceUID, 
+                   h.SeriesDescription, h.SeriesInstanceUID, h.LL_tag, h.path]
             rows.append(row)
         except: continue
     df = pandas.DataFrame(rows, columns=columns)
@@ -87,6 +92,7 @@ def present_nrimages_nr_annos_table(images_df, annotation_df, by_series=False):
     Returns:
         pandas.DataFrame: table of information on dicom datasets and annotations pertaining to them
     """
+    import pandas
     combined = pandas.merge(images_df, annotation_df, on=['sop_uid', 'study_uid'], how='left')
     combined.fillna(0, inplace=True)
     if by_series:
@@ -124,6 +130,7 @@ def present_nrimages_table(images_df, by_series=False):
     Returns:
         pandas.DataFrame: table of information on dicom datasets
     """
+    import pandas
     if by_series: nr_imgs  = images_df[['series_descr','series_uid','LL_tag']].value_counts()
     else:         nr_imgs  = images_df[['series_descr','LL_tag']].value_counts()
     nr_imgs   = nr_imgs.to_dict()
@@ -152,6 +159,7 @@ def get_paths_for_series_descr(imgs_df, annos_df, series_description, series_uid
     Returns:
         (list of str, list of str): list of paths to dicom datasets, list of paths to annotation files
     """
+    import pandas
     if series_uid is not None:
         imgs = imgs_df .loc[imgs_df ['series_descr'].isin([series_description]) & imgs_df ['series_uid'].isin([series_uid])]
     else:
@@ -182,6 +190,9 @@ def get_img_paths_for_series_descr(imgs_df, series_description, series_uid=None)
 def add_LL_tag(store_path, dcm, tag='Lazy Luna: None'): # Lazy Luna: SAX CS
     """Adds a LazyLuna name tag to a dicom dataset and stores it
     
+    Note:
+        The dicom is written to a temporary file first, which then replaces store_path
+    
     Args:
         store_path (str):    dicom dataset path
         dcm (dicom dataset): dicom file to which the tag is added
@@ -189,42 +200,94 @@ def add_LL_tag(store_path, dcm, tag='Lazy Luna: None'): # Lazy Luna: SAX CS
     """
     try:    dcm[0x0b, 0x10].value = tag
     except: dcm.private_block(0x000b, tag, create=True)
-    dcm.save_as(filename=store_path, write_like_original=False)
+    tmp_path = store_path + '.LLtmp'
+    dcm.save_as(tmp_path, write_like_original=False)
+    os.replace(tmp_path, store_path)
 
 def get_LL_tag(dcm): # Lazy Luna: SAX CS
-    """Returns LL tag if available, else 'None' (str)"""
+    """Returns LL tag from the LL tag manifest or the dicom dataset if available, else 'None' (str)"""
+    try:
+        tag = get_manifest_tag(dcm.filename, dcm.SOPInstanceUID)
+        if tag is not None: return tag
+    except: pass
     try:    return dcm[0x0b, 0x10].value
     except: return 'None'
 
-def add_and_store_LL_tags(imgs_df, key2LLtag, overriding_dict=None):
+def store_LL_tags_manifest(imgs_path, sop2tag, study_uid=None):
+    """Stores LL tags in the dicom folder's LL tag manifest without touching the dicom files
+    
+    Args:
+        imgs_path (str):           path to dicom folder
+        sop2tag (dict of str:str): mapping of SOPInstanceUID to LL tag
+        study_uid (str):           StudyInstanceUID (optional)
+    """
+    LL_Tag_Manifest(imgs_path).set_tags(sop2tag, study_uid)
+
+def add_and_store_LL_tags(imgs_df, key2LLtag, overriding_dict=None, imgs_path=None, materialize=False):
     """Stores LL Tags for all images
     
+    Note:
+        LL tags are stored in the LL tag manifest of imgs_path (see LazyLuna.tag_manifest). 
+        With materialize=True they are also written into the dicom files (see materialize_LL_tags).
+    
     Args:
         imgs_df (pandas.DataFrame):           taken from function LazyLuna.loading_functions.dicom_images_to_table
         key2LLtag (dict of (str,(str)): str): mapping of (seriesDescription, (seriesUID)) to LL tag
         overriding_dict (dict of str: str):   mapping of SOPInstanceUID to LL tag
+        imgs_path (str):                      dicom folder path, defaults to the common folder of imgs_df's dicom paths
+        materialize (bool):                   if True writes the tags into the dicom files as well
     """
     # key2LLtag: {(sd,ser_uid):'Lazy Luna: tag name'} or
     # key2LLtag: {(sd,):'Lazy Luna: tag name'}
+    if len(imgs_df)==0: return
     sdAndSeriesUID = isinstance(list(key2LLtag.keys())[0], tuple) and len(list(key2LLtag.keys())[0])>1
-    for ip, p in enumerate(imgs_df['dcm_path'].values):
-        dcm = pydicom.dcmread(p, stop_before_pixels=False)
-        try:
-            if overriding_dict is not None and dcm.SOPInstanceUID in overriding_dict.keys():
-                add_LL_tag(p, dcm, tag=overriding_dict[dcm.SOPInstanceUID])
-            else:
-                k = (dcm.SeriesDescription,dcm.SeriesInstanceUID) if sdAndSeriesUID else (dcm.SeriesDescription,)
-                if k in key2LLtag.keys(): add_LL_tag(p, dcm, tag=key2LLtag[k])
-                else:                     add_LL_tag(p, dcm, tag='Lazy Luna: None')
-        except:
-            print('Failed at case: ', c, '/nDCM', dcm)
-            continue
+    if imgs_path is None: imgs_path = os.path.commonpath([os.path.dirname(p) for p in imgs_df['dcm_path'].values])
+    sop2tag = dict()
+    for sop, sd, ser_uid in imgs_df[['sop_uid', 'series_descr', 'series_uid']].values:
+        if overriding_dict is not None and sop in overriding_dict.keys(): sop2tag[sop] = overriding_dict[sop]; continue
+        k = (sd, ser_uid) if sdAndSeriesUID else (sd,)
+        sop2tag[sop] = key2LLtag[k] if k in key2LLtag.keys() else 'Lazy Luna: None'
+    store_LL_tags_manifest(imgs_path, sop2tag, imgs_df['study_uid'].iloc[0])
+    if materialize: materialize_LL_tags(imgs_path)
+
+def _materialize_LL_tags(path_tag_pairs):
+    failed = []
+    for p, tag in path_tag_pairs:
+        try: add_LL_tag(p, pydicom.dcmread(p, stop_before_pixels=False), tag=tag)
+        except Exception as e: print('Failed materializing LL tag: ', p, e); failed.append(p)
+    return failed
+
+def materialize_LL_tags(imgs_path, workers=None, chunksize=None, executor=None, debug=False):
+    """Writes the LL tags of the manifest into the dicom files
+    
+    Note:
+        Only files whose in-file tag differs from the manifest are rewritten. 
+        Files are written in parallel batches, each through a temporary file that atomically replaces the original.
+    
+    Args:
+        imgs_path (str): path to dicom folder
+        workers, chunksize, executor: pool settings (see LazyLuna.header_index.map_chunks)
+        
+    Returns:
+        list of str: paths that failed
+    """
+    from LazyLuna.header_index import get_header_index
+    index = get_header_index(imgs_path)
+    todo  = []
+    for h in index.headers():
+        if h['SOPInstanceUID'] is None: continue
+        tag = get_manifest_tag(h['path'], h['SOPInstanceUID'])
+        if tag is not None and tag!=h['LL_tag']: todo.append((h['path'], tag))
+    if debug: print('Materializing LL tags for ', len(todo), ' files.')
+    failed, _, _ = map_chunks(_materialize_LL_tags, todo, workers, chunksize, executor, debug)
+    return failed
 
 def get_cases_table(cases, paths, return_dataframe=True, debug=False):
     """Returns a table for Case presentation
     
     Note:
         Columns = [Casename, Readername, Age, Gender, Weight, Height, SAX CINE, SAX CS, LAX CINE, SAX T1 PRE, SAX T1 POST, SAX T2, SAX LGE', Path]
+        Demographics are taken from the cases' header stores (see LazyLuna.case_catalog.get_demographics)
     
     Args:
         cases (list of Case):    List of Case objects
@@ -234,49 +297,35 @@ def get_cases_table(cases, paths, return_dataframe=True, debug=False):
     Returns:
         list | pandas.DataFrame: table to present Cases
     """
-    def get_dcm(case):
-        for k in case.all_imgs_sop2filepath.keys():
-            try: sop = next(iter(case.all_imgs_sop2filepath[k]))
-            except: continue
-            return pydicom.dcmread(case.all_imgs_sop2filepath[k][sop])
-    def get_age(case):
-        try:
-            age = get_dcm(case).data_element('PatientAge').value
-            age = float(age[:-1]) if age!='' else np.nan
-        except: age=np.nan
-        return age
-    def get_gender(case):
-        try:
-            gender = get_dcm(case).data_element('PatientSex').value
-            gender = gender if gender in ['M','F'] else np.nan
-        except: gender=np.nan
-        return gender
-    def get_weight(case):
-        try:
-            weight = get_dcm(case).data_element('PatientWeight').value
-            weight = float(weight) if weight is not None else np.nan
-        except: weight=np.nan
-        return weight
-    def get_height(case):
-        try:
-            h = get_dcm(case).data_element('PatientSize').value
-            h = np.nan if h is None else float(h)/100 if float(h)>3 else float(h)
-        except: h=np.nan
-        return h
-    if debug: st = time()
-    columns = ['Case Name', 'Reader', 'Age (Y)', 'Gender (M/F)', 'Weight (kg)', 'Height (m)', 'SAX CINE', 'SAX CS', 
-               'LAX CINE', 'SAX T1 PRE', 'SAX T1 POST', 'SAX T2', 'SAX LGE', 'Path']
-    #print([c.available_types for c in cases])
-    rows    = sorted([[c.case_name, c.reader_name, get_age(c), get_gender(c), get_weight(c), get_height(c), 
-                       'SAX CINE' in c.available_types, 'SAX CS' in c.available_types, 'LAX CINE' in c.available_types, 
-                       'SAX T1 PRE' in c.available_types, 'SAX T1 POST' in c.available_types, 'SAX T2' in c.available_types, 
-                       'SAX LGE' in c.available_types, paths[i]] 
-                      for i, c in enumerate(cases)],
-                     key=lambda p: str(p[0]))
-    if not return_dataframe: return rows
-    df      = pandas.DataFrame(rows, columns=columns)
-    if debug: print('Took: ', time()-st)
-    return df
+    entries = [catalog_entry(c, paths[i]) for i, c in enumerate(cases)]
+    return _cases_table(entries, return_dataframe, debug)
+
+def get_cases_table_from_catalog(case_folder_path, return_dataframe=True, debug=False):
+    """Returns a table for Case presentation from the case catalog of a folder, without unpickling stored cases
+    
+    Note:
+        Columns as in get_cases_table. Cases missing from the catalog are unpickled once and added (see LazyLuna.case_catalog)
+    
+    Args:
+        case_folder_path (str):  path to folder containing Case pickle files
+        return_dataframe (bool): if True make pandas.DataFrame, else returns list
+        
+    Returns:
+        list | pandas.DataFrame: table to present Cases
+    """
+    return _cases_table(get_case_catalog(case_folder_path).entries(debug=debug), return_dataframe, debug)
+
+def _cases_table(entries, return_dataframe=True, debug=False):
+    import pandas
+    with span('get_cases_table', debug=debug):
+        columns = ['Case Name', 'Reader', 'Age (Y)', 'Gender (M/F)', 'Weight (kg)', 'Height (m)', 'SAX CINE', 'SAX CS', 
+                   'LAX CINE', 'SAX T1 PRE', 'SAX T1 POST', 'SAX T2', 'SAX LGE', 'Path']
+        rows    = sorted([[e['case_name'], e['reader'], e['age'], e['gender'], e['weight'], e['height']] +
+                          [t in e['types'] for t in ['SAX CINE', 'SAX CS', 'LAX CINE', 'SAX T1 PRE', 'SAX T1 POST', 'SAX T2', 'SAX LGE']] +
+                          [e['path']] for e in entries],
+                         key=lambda p: str(p[0]))
+        if not return_dataframe: return rows
+        return pandas.DataFrame(rows, columns=columns)
 
 
 
@@ -293,35 +342,34 @@ def read_annos_into_sop2filepaths(path, debug=False):
     Returns:
         (dict of str: str): Mapping of SOPInstanceUID to filepath
     """
-    if debug: st = time()
-    paths = [f for f in os.listdir(path) if 'case' not in f]
-    anno_sop2filepath = dict()
-    for p in paths:
-        anno_sop2filepath[p.replace('.pickle','')] = os.path.join(path, p)
-    if debug: print('Reading annos took: ', time()-st)
+    with span('read_annos_into_sop2filepaths', debug=debug):
+        paths = [f for f in os.listdir(path) if 'case' not in f]
+        anno_sop2filepath = dict()
+        for p in paths:
+            anno_sop2filepath[p.replace('.pickle','')] = os.path.join(path, p)
     return anno_sop2filepath
 
-def read_dcm_images_into_sop2filepaths(path, debug=False):
+def read_dcm_images_into_sop2filepaths(path, debug=False, headers=None):
     """Returns nested dictionary mapping of LL type to SOPInstanceUIDs to filepaths
     
     Args:
         path (str): path to dicom dataset files
+        headers (list of Header): (optional) headers of path, as returned by LazyLuna.header_index.get_headers
         
     Returns:
         (dict of str: dict of str: str): Nested mapping of LL type to SOPInstanceUID to filepath
     """
-    if debug: st = time()
-    sop2filepath = dict()
-    for n in ['SAX CINE', 'SAX CS', 'SAX T1 PRE', 'SAX T1 POST', 'SAX T2', 'LAX CINE 2CV', 'LAX CINE 3CV', 'LAX CINE 4CV', 'SAX LGE', 'None']:
-        sop2filepath[n] = dict()
-    for p in Path(path).glob('**/*.dcm'):
-        try:
-            dcm = pydicom.dcmread(str(p), stop_before_pixels=True)
-            name = str(dcm[0x0b, 0x10].value).replace('Lazy Luna: ', '') # LL Tag
-            sop2filepath[name][dcm.SOPInstanceUID] = str(p)
-        except Exception as e:
-            if debug: print(dcm, '\nException: ', e)
-    if debug: print('Reading images took: ', time()-st)
+    with span('read_dcm_images_into_sop2filepaths', debug=debug):
+        sop2filepath = dict()
+        for n in ['SAX CINE', 'SAX CS', 'SAX T1 PRE', 'SAX T1 POST', 'SAX T2', 'LAX CINE 2CV', 'LAX CINE 3CV', 'LAX CINE 4CV', 'SAX LGE', 'None']:
+            sop2filepath[n] = dict()
+        if headers is None: headers = get_headers(path)
+        for h in headers:
+            try:
+                name = h.LL_tag.replace('Lazy Luna: ', '') # LL Tag
+                sop2filepath[name][h.SOPInstanceUID] = h.path
+            except Exception as e:
+                if debug: print(h, '\nException: ', e)
     return sop2filepath
 
 # returns the base paths for Cases
@@ -352,12 +400,10 @@ def get_imgs_and_annotation_paths(bp_imgs, bp_annos):
     img_folders = os.listdir(bp_imgs)
     for i, img_f in enumerate(img_folders):
         case_path = os.path.join(bp_imgs, img_f)
-        for p in Path(case_path).glob('**/*.dcm'):
-            try: dcm = pydicom.dcmread(str(p), stop_before_pixels=True)
-            except Exception as e: print(traceback.format_exc()); continue
-            if not hasattr(dcm, 'StudyInstanceUID'): continue
-            imgpaths_annopaths_tuples += [(os.path.normpath(case_path), os.path.normpath(os.path.join(bp_annos, dcm.StudyInstanceUID)))]
-            break
+        if not os.path.isdir(case_path): continue
+        study_uid = get_study_uid(case_path)
+        if study_uid is None: continue
+        imgpaths_annopaths_tuples += [(os.path.normpath(case_path), os.path.normpath(os.path.join(bp_annos, study_uid)))]
     return imgpaths_annopaths_tuples
 
 
@@ -0,0 +1,158 @@
+import os
+import json
+import threading
+from time import perf_counter
+
+
+#############
+# Profiling #
+#############
+
+# Conversion and analysis steps are wrapped in named spans: with span('SAX_CINE_View.initialize_case', view=..., case=...):
+# Spans nest, child spans inherit the attributes (case, view) of their parents. Spans are recorded while the profiler is
+# enabled (otherwise span returns a shared no-op context), debug=True prints the duration of a span as the former
+# `if debug: print('... took: ', time()-st)` did. Recorded spans are summarized per name (and per case, view) or exported
+# as Chrome trace (chrome://tracing, https://ui.perfetto.dev).
+
+class Profiler:
+    """Profiler records nested named spans with their durations and attributes
+
+    Args:
+        name (str): name for display
+
+    Attributes:
+        enabled (bool):          whether spans are recorded
+        spans (list of tuple):   recorded spans (name, start, duration, self duration, pid, thread id, depth, attributes),
+                                 start and durations in seconds (perf_counter)
+    """
+    def __init__(self, name='profiler'):
+        self.name    = name
+        self.enabled = False
+        self.spans   = []
+        self._lock   = threading.Lock()
+        self._local  = threading.local()
+
+    def span(self, name, debug=False, **attributes):
+        """Returns a context manager that records its duration under name (a no-op if not enabled and not debug)
+
+        Args:
+            name (str):   span name, like 'Class.method'
+            debug (bool): prints the duration when the span ends
+            attributes:   attributes of the span and its children, like case=case_name, view=view_name
+        """
+        if not (self.enabled or debug): return NULL_SPAN
+        return _Span(self, name, debug, attributes)
+
+    def _stack(self):
+        try: return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def enable(self):  self.enabled = True
+
+    def disable(self): self.enabled = False
+
+    def reset(self):
+        with self._lock: self.spans = []
+
+    def take(self):
+        """Returns the recorded spans and removes them from the profiler (e.g. to return them from a worker process)"""
+        with self._lock: spans, self.spans = self.spans, []
+        return spans
+
+    def add(self, spans):
+        """Adds spans recorded by another profiler (e.g. returned from worker processes)"""
+        with self._lock: self.spans.extend([tuple(s) for s in spans])
+
+    def summary(self, by=('name',)):
+        """Returns a table of span durations aggregated by name or attributes
+
+        Note:
+            Total durations of nested spans include their children, self durations exclude them (self durations add up to
+            the profiled time). Spans without an attribute in by are grouped under ''.
+
+        Args:
+            by (tuple of str): 'name' and/or attribute names, like ('view', 'name') or ('case',)
+
+        Returns:
+            pandas.DataFrame: columns by + count, total (s), self (s), mean (s), max (s), self share (%), sorted by self time
+        """
+        import pandas
+        rows = dict()
+        for name, _, duration, self_duration, _, _, _, attributes in self.spans:
+            key = tuple(name if b=='name' else str(attributes.get(b, '')) for b in by)
+            row = rows.setdefault(key, [0, 0.0, 0.0, 0.0])
+            row[0] += 1; row[1] += duration; row[2] += self_duration; row[3] = max(row[3], duration)
+        profiled = sum(r[2] for r in rows.values()) or 1.0
+        df = pandas.DataFrame([list(k) + [r[0], r[1], r[2], r[1]/r[0], r[3], 100*r[2]/profiled] for k, r in rows.items()],
+                              columns=list(by) + ['count', 'total (s)', 'self (s)', 'mean (s)', 'max (s)', 'self share (%)'])
+        return df.sort_values('self (s)', ascending=False).reset_index(drop=True)
+
+    def print_summary(self, by=('name',), n=30):
+        """Prints the n spans (or groups) with the largest self time"""
+        print(self.name, 'recorded', len(self.spans), 'spans.')
+        if len(self.spans)>0: print(self.summary(by).head(n).to_string(float_format='{:.4f}'.format))
+
+    def chrome_trace(self):
+        """Returns the recorded spans as Chrome trace (dict with 'traceEvents' of complete events, microseconds)"""
+        t0 = min([s[1] for s in self.spans], default=0.0)
+        events = [{'name': name, 'cat': str(attributes.get('view', 'LazyLuna')), 'ph': 'X', 'ts': (start-t0)*1e6,
+                   'dur': duration*1e6, 'pid': pid, 'tid': tid, 'args': {k: str(v) for k, v in attributes.items()}}
+                  for name, start, duration, _, pid, tid, _, attributes in self.spans]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def store_chrome_trace(self, path):
+        """Stores the recorded spans as Chrome trace json file at path"""
+        with open(path, 'w') as f: json.dump(self.chrome_trace(), f)
+        return path
+
+    def __str__(self):
+        return '{}: {}, {} spans'.format(self.name, 'enabled' if self.enabled else 'disabled', len(self.spans))
+
+
+class _Span:
+    __slots__ = ['profiler', 'name', 'debug', 'attributes', 'start', 'children']
+
+    def __init__(self, profiler, name, debug, attributes):
+        self.profiler, self.name, self.debug, self.attributes = profiler, name, debug, attributes
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        if len(stack)>0 and len(stack[-1].attributes)>0: self.attributes = {**stack[-1].attributes, **self.attributes}
+        stack.append(self)
+        self.children = 0.0
+        self.start    = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = perf_counter() - self.start
+        stack    = self.profiler._stack()
+        stack.pop()
+        if len(stack)>0: stack[-1].children += duration
+        if self.debug: print(self.name, 'took: ', duration)
+        if self.profiler.enabled:
+            record = (self.name, self.start, duration, duration-self.children, os.getpid(), threading.get_ident(),
+                      len(stack), self.attributes)
+            with self.profiler._lock: self.profiler.spans.append(record)
+        return False
+
+
+class _Null_Span:
+    __slots__ = []
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+NULL_SPAN = _Null_Span()
+
+
+# process-wide profiler, used by LazyLuna's conversion and analysis steps
+PROFILER = Profiler(name='LazyLuna profiler')
+
+span               = PROFILER.span
+enable             = PROFILER.enable
+disable            = PROFILER.disable
+reset              = PROFILER.reset
+summary            = PROFILER.summary
+print_summary      = PROFILER.print_summary
+store_chrome_trace = PROFILER.store_chrome_trace
@@ -0,0 +1,81 @@
+import sys
+import types
+import importlib
+from collections.abc import Mapping
+
+
+############
+# Registry #
+############
+
+# Figures, Tables, Views and the GUI tabs of Views are registered by name with the path of the module that defines them,
+# they are imported when they are first requested. Importing LazyLuna.Figures, LazyLuna.Tables or LazyLuna.Views, or
+# instantiating a View, thereby only imports what is used (which also keeps the start of worker processes cheap).
+
+class Registry(Mapping):
+    """Registry maps names to objects that are imported on first request
+
+    Note:
+        A Registry is a read-only mapping in registration order: registry[name] imports the object, iterating over the
+        registry or registry.names() does not import anything (registry.items() and registry.values() import all).
+
+    Args:
+        entries (dict of str: str): names to paths 'module:attribute' ('module' if the attribute is called like the name)
+    """
+    def __init__(self, entries=None):
+        self._paths, self._loaded = dict(), dict()
+        for name, path in (entries or dict()).items(): self.register(name, path)
+
+    def register(self, name, path):
+        """Registers the object at path ('module:attribute' or 'module') under name (replaces a previous registration of name)"""
+        self._paths[name] = path if ':' in path else path + ':' + name
+        self._loaded.pop(name, None)
+
+    def names(self):
+        """Returns the registered names (list of str) without importing anything"""
+        return list(self._paths)
+
+    def path(self, name):
+        """Returns the path 'module:attribute' of name"""
+        return self._paths[name]
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            module, attribute = self._paths[name].split(':')
+            self._loaded[name] = getattr(importlib.import_module(module), attribute)
+        return self._loaded[name]
+
+    def __iter__(self): return iter(self._paths)
+
+    def __len__(self):  return len(self._paths)
+
+    def __repr__(self): return 'Registry(' + ', '.join(self._paths) + ')'
+
+    def install(self, module_name):
+        """Makes the registered names attributes of a module (a package's __init__) that are imported on first access
+
+        Note:
+            `from <module> import *` imports all registered names. Importing a submodule that is called like a registered
+            name does not replace the registered object on the module (as the former star imports in __init__ did).
+        """
+        module = sys.modules[module_name]
+        module.__class__, module.registry = _Registry_Module, self
+
+
+class _Registry_Module(types.ModuleType):
+    def __getattr__(self, name):
+        registry = self.__dict__['registry']
+        if name=='__all__': return registry.names()
+        if name not in registry: raise AttributeError("module '" + self.__name__ + "' has no attribute '" + name + "'")
+        return registry[name]
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(self.__dict__['registry'].names()))
+
+    def __setattr__(self, name, value):
+        # the import system binds submodules to their package
+        if isinstance(value, types.ModuleType) and name in self.__dict__.get('registry', ()): return
+        super().__setattr__(name, value)
@@ -0,0 +1,380 @@
+import os
+import sys
+import pickle
+import argparse
+
+import numpy as np
+from shapely.geometry import Point, Polygon, MultiPoint
+from shapely import affinity
+
+from LazyLuna import utils
+
+
+#########################
+# Synthetic CMR Cohorts #
+#########################
+
+# Synthetic cohorts stand in for patient data in benchmarks and tests of the data paths. Each case is a parametric heart
+# (ellipsoidal left ventricle with a contracting myocardium, right ventricle, atria and for LGE a myocardial scar), which is
+# rendered into dicom series with consistent geometry (ImagePositionPatient, ImageOrientationPatient, PixelSpacing, SliceLocation)
+# and annotated by readers in the LazyLuna annotation format (dicts of contour names to shapely geometries in pixel coordinates).
+# The first reader annotates the true geometry, further readers deviate from it by a controllable disagreement.
+# Patient coordinates: the LV long axis is the z axis (base at z=0, apex at z=-length), the septum and RV lie towards -x.
+
+# LL tag: (series description, plane, contrast)
+SERIES = {'SAX CINE':     ('cine_sax',     'sax', 'cine'),
+          'SAX CS':       ('cs_cine_sax',  'sax', 'cine'),
+          'LAX CINE 2CV': ('cine_2cv',     '2cv', 'cine'),
+          'LAX CINE 4CV': ('cine_4cv',     '4cv', 'cine'),
+          'SAX T1 PRE':   ('t1map_native', 'map', 't1 pre'),
+          'SAX T1 POST':  ('t1map_post',   'map', 't1 post'),
+          'SAX T2':       ('t2map',        'map', 't2'),
+          'SAX LGE':      ('lge_psir_sax', 'sax', 'lge')}
+
+# signal per contrast (pixel values, relaxation times in ms for maps): background, tissue, blood, myocardium, scar, noreflow, noise
+SIGNALS = {'cine':    (0, 150,  700, 200,  200,  200, 20),
+           't1 pre':  (0, 800, 1600, 1000, 1000, 1000, 25),
+           't1 post': (0, 350,  300, 450,  450,  450, 15),
+           't2':      (0,  40,  180, 50,   50,   50,  3),
+           'lge':     (0, 100,  400, 40,   700,  30,  25)}
+
+SLICE_SPACING  = 10.0 # mm
+SLICE_THICK    = 8.0  # mm
+MAP_DEPTHS     = [0.25, 0.5, 0.75] # of the LV length, base, mid and apical slices of the maps
+
+
+class Synthetic_Heart:
+    """Synthetic_Heart is the parametric anatomy of a synthetic case
+
+    Note:
+        Shapes are returned in mm, in plane coordinates (u, v) of the image plane relative to the image center.
+        Short axis slices are at depth z (mm, <= 0), long axis planes contain the LV axis (u is x for 4CV, y for 2CV; v is z).
+
+    Args:
+        rng (numpy.random.Generator): random generator for the anatomical parameters
+        nr_phases (int):              number of cardiac phases of the cine series
+
+    Attributes:
+        radius, length, thickness (float):  LV endocardial radius at the base, LV length and myocardial thickness at end-diastole in mm
+        shortening (float):                 radial shortening of the endocardium at end-systole (fraction)
+        rv_radius, rv_center (float):       RV radius and x position of its center in mm
+        la_radius, la_length (float):       LA radius and maximal length in mm
+        scar (tuple of float):              angle, angular width (rad), transmurality and relative depth range (start, end) of the LGE scar
+    """
+    def __init__(self, rng, nr_phases=20):
+        self.nr_phases  = nr_phases
+        self.radius     = rng.uniform(22, 28)
+        self.length     = rng.uniform(80, 95)
+        self.thickness  = rng.uniform(8, 11)
+        self.shortening = rng.uniform(0.25, 0.35)
+        self.rv_radius  = 1.1 * self.radius
+        self.rv_center  = -(self.radius + self.thickness) * 1.2
+        self.la_radius  = rng.uniform(17, 21)
+        self.la_length  = rng.uniform(45, 55)
+        start           = rng.uniform(0.2, 0.5)
+        self.scar       = (rng.uniform(0, 2*np.pi), rng.uniform(0.6, 1.4), rng.uniform(0.3, 0.9), (start, start+0.3))
+
+    def contraction(self, phase):
+        """Returns the endocardial radius scale of a phase (1 at end-diastole, phase 0; minimal at end-systole, phase nr_phases/2)"""
+        return 1 - self.shortening * (1 - np.cos(2*np.pi*phase/self.nr_phases)) / 2
+
+    def atrial_filling(self, phase):
+        """Returns the atrial length scale of a phase (maximal at ventricular end-systole)"""
+        return 1 - 0.3 * (1 + np.cos(2*np.pi*phase/self.nr_phases)) / 2
+
+    def endo_radius(self, z, phase):
+        return self.radius * self.contraction(phase) * np.sqrt(np.clip(1 - (z/self.length)**2, 0, None))
+
+    def epi_radius(self, z, phase):
+        # the myocardial area is preserved through the cardiac cycle
+        epi_ed  = (self.radius+self.thickness) * np.sqrt(np.clip(1 - (z/(self.length+self.thickness))**2, 0, None))
+        endo_ed = self.endo_radius(z, 0)
+        return np.sqrt(self.endo_radius(z, phase)**2 + epi_ed**2 - endo_ed**2)
+
+    def rv_radius_at(self, z, phase):
+        rv_length = 0.85 * self.length
+        return self.rv_radius * (1 - self.shortening*(1 - np.cos(2*np.pi*phase/self.nr_phases))/2) * \
+               np.sqrt(np.clip(1 - (z/rv_length)**2, 0, None))
+
+    def sax_shapes(self, z, phase, scar=False):
+        """Returns the shapes of a short axis slice at depth z (dict of contour name: shapely geometry, mm)"""
+        shapes = dict()
+        r_endo, r_epi, r_rv = self.endo_radius(z, phase), self.epi_radius(z, phase), self.rv_radius_at(z, phase)
+        if r_epi < 2: return shapes
+        epi = Point(0, 0).buffer(r_epi, 32)
+        if r_endo >= 2:
+            endo = Point(0, 0).buffer(r_endo, 32)
+            shapes['lv_endo'] = endo
+            shapes['lv_myo']  = epi.difference(endo)
+            if r_endo > 10:
+                shapes['lv_pamu'] = Point(0.55*r_endo, 0.45*r_endo).buffer(2.5, 8).union(Point(-0.15*r_endo, 0.65*r_endo).buffer(2.5, 8))
+        else: shapes['lv_myo'] = epi
+        if r_rv >= 4:
+            rv = Point(self.rv_center, 0).buffer(r_rv, 32)
+            rv_endo = rv.difference(epi.buffer(1.0))
+            if not rv_endo.is_empty and rv_endo.geom_type=='Polygon':
+                shapes['rv_endo'] = rv_endo
+                shapes['rv_myo']  = rv.buffer(3.0).difference(rv).difference(epi)
+                # anterior RV insertion point
+                insertion = rv.exterior.intersection(epi.exterior)
+                points = [insertion] if insertion.geom_type=='Point' else list(getattr(insertion, 'geoms', []))
+                if len(points)>0: shapes['sax_ref'] = min(points, key=lambda p: p.y)
+        if scar and 'lv_endo' in shapes:
+            angle, width, transmurality, (start, end) = self.scar
+            if start <= -z/self.length <= end:
+                r_scar = r_endo + transmurality * (r_epi - r_endo)
+                shapes['scar'] = _sector(r_endo, r_scar, angle, width)
+                if -z/self.length <= start + 0.1:
+                    shapes['noreflow'] = _sector(r_endo, r_endo + 0.5*(r_scar-r_endo), angle+0.3*width, 0.4*width)
+        return shapes
+
+    def lax_shapes(self, plane, phase):
+        """Returns the shapes of a long axis plane ('2cv' or '4cv', dict of contour or point name: shapely geometry, mm)"""
+        zs_endo = -np.linspace(0, self.length, 40)
+        zs_epi  = -np.linspace(0, self.length+self.thickness, 40)
+        endo = _half_ellipse(self.endo_radius(zs_endo, phase), zs_endo)
+        epi  = _half_ellipse(self.epi_radius(zs_epi, phase),   zs_epi)
+        r_base = self.endo_radius(0, phase)
+        la_length = self.la_length * self.atrial_filling(phase)
+        la = affinity.scale(Point(0, 0).buffer(1, 32), self.la_radius, la_length/2, origin=(0, 0))
+        shapes = {'lv_lax_endo': endo, 'lv_lax_myo': epi.difference(endo),
+                  'lv_extent':   MultiPoint([(-r_base, 0), (r_base, 0), (0, -self.length)])}
+        la_center = 0.15*self.radius if plane=='4cv' else 0.0
+        shapes['la']        = affinity.translate(la, la_center, la_length/2).difference(epi)
+        shapes['la_extent'] = MultiPoint([(la_center-0.8*self.la_radius, 0), (la_center+0.8*self.la_radius, 0), (la_center, la_length)])
+        if plane=='4cv':
+            zs_rv = -np.linspace(0, 0.85*self.length, 40)
+            rv = _half_ellipse(self.rv_radius_at(zs_rv, phase), zs_rv, center=self.rv_center)
+            shapes['rv_lax_endo'] = rv.difference(epi.buffer(1.0))
+            ra_length = 0.9 * la_length
+            ra = affinity.scale(Point(0, 0).buffer(1, 32), 0.9*self.la_radius, ra_length/2, origin=(0, 0))
+            shapes['ra']        = affinity.translate(ra, self.rv_center, ra_length/2).difference(epi).difference(shapes['la'])
+            shapes['ra_extent'] = MultiPoint([(self.rv_center-0.7*self.la_radius, 0), (self.rv_center+0.7*self.la_radius, 0),
+                                              (self.rv_center, ra_length)])
+        return shapes
+
+def _half_ellipse(radii, zs, center=0.0):
+    # region |u-center| <= radius(z) between the base (zs[0]) and the apex (zs[-1])
+    right = [(center+r, z) for r, z in zip(radii, zs)]
+    left  = [(center-r, z) for r, z in zip(radii[::-1], zs[::-1])]
+    return Polygon(right + left).buffer(0)
+
+def _sector(r_inner, r_outer, angle, width, n=16):
+    angles = np.linspace(angle, angle+width, n)
+    inner  = [(r_inner*np.cos(a), r_inner*np.sin(a)) for a in angles]
+    outer  = [(r_outer*np.cos(a), r_outer*np.sin(a)) for a in angles[::-1]]
+    return Polygon(inner + outer).buffer(0)
+
+
+##########
+# Images #
+##########
+
+class _Plane:
+    # image plane: geometry tags and the transform of in-plane mm coordinates (relative to the image center) to pixels
+    def __init__(self, plane, size, pixel_spacing, position):
+        self.size, self.spacing = size, pixel_spacing
+        c = (size-1) / 2 * pixel_spacing
+        if plane=='4cv':
+            self.orientation = [1, 0, 0, 0, 0, -1]
+            self.origin      = [-c, 0.0, position+c]
+        elif plane=='2cv':
+            self.orientation = [0, 1, 0, 0, 0, -1]
+            self.origin      = [0.0, -c, position+c]
+        else:
+            self.orientation = [1, 0, 0, 0, 1, 0]
+            self.origin      = [-c, -c, position]
+        self.slice_location = position if plane not in ['2cv', '4cv'] else 0.0
+        # long axis planes: v (z) increases towards the top of the image
+        self.flip = plane in ['2cv', '4cv']
+        self.center_offset = position if self.flip else 0.0
+
+    def to_pixels(self, geo):
+        c = (self.size-1) / 2
+        if self.flip: geo = affinity.affine_transform(geo, [1/self.spacing, 0, 0, -1/self.spacing, c, c+self.center_offset/self.spacing])
+        else:         geo = affinity.affine_transform(geo, [1/self.spacing, 0, 0,  1/self.spacing, c, c])
+        return geo
+
+def render(shapes, size, contrast, rng):
+    """Renders pixel shapes into an image (ndarray (size, size) of np.uint16) with the signals of contrast"""
+    background, tissue, blood, myo, scar, noreflow, noise = SIGNALS[contrast]
+    img = np.full((size, size), float(background))
+    body = Point((size-1)/2, (size-1)/2).buffer(0.45*size, 32)
+    layers = [(body, tissue)] + [(shapes.get(n), v) for n, v in [('lv_lax_myo', myo), ('lv_myo', myo), ('rv_myo', myo),
+              ('lv_endo', blood), ('lv_lax_endo', blood), ('rv_endo', blood), ('rv_lax_endo', blood), ('la', blood), ('ra', blood),
+              ('lv_pamu', myo), ('scar', scar), ('noreflow', noreflow)]]
+    for geo, value in layers:
+        if geo is None or geo.is_empty or geo.geom_type not in ['Polygon', 'MultiPolygon']: continue
+        img[utils.to_mask(geo, size, size).astype(bool)] = value
+    img += rng.normal(0, noise, img.shape)
+    return np.clip(img, 0, 2**16-1).astype(np.uint16)
+
+def write_dicom(path, img, plane, tags, ll_tag=None):
+    """Writes an MR image with geometry (see _Plane) and tags (dict of dicom keyword: value) to path, returns its SOPInstanceUID"""
+    from pydicom.dataset import FileDataset, FileMetaDataset
+    from pydicom.uid import generate_uid, ExplicitVRLittleEndian, MRImageStorage
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID    = MRImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID          = ExplicitVRLittleEndian
+    ds = FileDataset(path, {}, file_meta=meta, preamble=b'\0'*128)
+    ds.SOPClassUID, ds.SOPInstanceUID, ds.Modality = MRImageStorage, meta.MediaStorageSOPInstanceUID, 'MR'
+    for k, v in tags.items(): setattr(ds, k, v)
+    ds.ImagePositionPatient    = [round(float(x), 4) for x in plane.origin]
+    ds.ImageOrientationPatient = plane.orientation
+    ds.SliceLocation           = round(float(plane.slice_location), 4)
+    ds.PixelSpacing            = [plane.spacing, plane.spacing]
+    ds.SliceThickness, ds.SpacingBetweenSlices = SLICE_THICK, SLICE_SPACING
+    ds.Rows, ds.Columns        = img.shape
+    ds.BitsAllocated, ds.BitsStored, ds.HighBit, ds.PixelRepresentation = 16, 16, 15, 0
+    ds.SamplesPerPixel, ds.PhotometricInterpretation = 1, 'MONOCHROME2'
+    ds.RescaleSlope, ds.RescaleIntercept = 1, 0
+    ds.WindowCenter, ds.WindowWidth      = int(img.mean()), int(4*img.std())+1
+    ds.PixelData = img.tobytes()
+    if ll_tag is not None: ds.private_block(0x000b, 'Lazy Luna: ' + ll_tag, create=True)
+    ds.save_as(path, enforce_file_format=True)
+    return ds.SOPInstanceUID
+
+
+###############
+# Annotations #
+###############
+
+def annotation(shapes, size, pixel_spacing):
+    """Returns a LazyLuna annotation dict of pixel shapes (see LazyLuna.Annotation.Annotation)"""
+    return {name: {'cont': geo, 'contType': 'POINT' if geo.geom_type in ['Point', 'MultiPoint'] else 'FREE',
+                   'subpixelResolution': 1, 'imageSize': (size, size), 'pixelSize': (pixel_spacing, pixel_spacing)}
+            for name, geo in shapes.items() if not geo.is_empty}
+
+def reader_shapes(shapes, scale, jitter, rng, pixel_spacing, center):
+    """Returns the shapes as annotated by a reader deviating from them
+
+    Note:
+        All shapes of an image are scaled around center by scale*(1+jitter*N(0,1)) and shifted by jitter*20mm*N(0,1),
+        scale 1 and jitter 0 return the shapes unchanged.
+    """
+    if scale==1 and jitter==0: return shapes
+    s      = max(0.2, scale * (1 + jitter*rng.normal()))
+    du, dv = jitter * 20.0 / pixel_spacing * rng.normal(size=2)
+    return {n: affinity.translate(affinity.scale(g, s, s, origin=center), du, dv) for n, g in shapes.items()}
+
+
+##########
+# Cohort #
+##########
+
+def write_case(path, reader_paths, case_name, series=SERIES, disagreement=0.05, nr_slices=10, nr_phases=20,
+               image_size=128, pixel_spacing=2.0, seed=0, ll_tags='dicom'):
+    """Writes the dicom series of a synthetic case and the annotations of its readers
+
+    Args:
+        path (str):                 path to the case's dicom folder (created)
+        reader_paths (list of str): reader folders, annotations are written to <reader folder>/<StudyInstanceUID>
+        case_name (str):            case name (PatientName and PatientID)
+        series (list of str):       LL tags of the series to write (see SERIES)
+        disagreement (float):       deviation of the second and further readers from the true shapes: a systematic scale of
+                                    1+disagreement*N(0,1) per case and series and a jitter of disagreement/4 per image (see reader_shapes)
+        nr_slices (int):            number of short axis slices (cine and LGE, maps have base, mid and apical slices)
+        nr_phases (int):            number of cine phases
+        image_size (int):           rows and columns
+        pixel_spacing (float):      mm
+        seed (int):                 random seed of anatomy, images and annotations
+        ll_tags (str):              'dicom' writes the LL tag into the files, 'manifest' into the folder's LL tag manifest, None omits them
+
+    Returns:
+        dict: case_name, study_uid, nr_images, nr_annotations
+    """
+    from pydicom.uid import generate_uid
+    rng   = np.random.default_rng(seed)
+    heart = Synthetic_Heart(rng, nr_phases)
+    study = generate_uid()
+    rngs  = [np.random.default_rng([seed, r]) for r in range(len(reader_paths))]
+    annos = [os.path.join(r, study) for r in reader_paths]
+    for a in [path] + annos: os.makedirs(a, exist_ok=True)
+    sex = ['M', 'F'][int(rng.integers(2))]
+    patient = {'PatientName': case_name, 'PatientID': case_name, 'PatientAge': '{:03d}Y'.format(int(rng.integers(20, 80))),
+               'PatientSex': sex, 'PatientWeight': round(float(rng.uniform(55, 100)), 1),
+               'PatientSize': round(float(rng.uniform(1.55, 1.95)), 2), 'StudyInstanceUID': study,
+               'InstanceCreationDate': '20240101', 'StudyDate': '20240101'}
+    lax_center = (heart.la_length - heart.length) / 2
+    nr_images, nr_annos, sop2tag = 0, 0, dict()
+    for ll_tag in series:
+        description, plane_type, contrast = SERIES[ll_tag]
+        tags = dict(patient, SeriesInstanceUID=generate_uid(), SeriesDescription=description, SeriesNumber=list(SERIES).index(ll_tag)+1)
+        if plane_type=='sax':   positions = [(-(d+0.5)*SLICE_SPACING, p) for d in range(nr_slices) for p in range(nr_phases if contrast=='cine' else 1)]
+        elif plane_type=='map': positions = [(-f*heart.length, 0) for f in MAP_DEPTHS]
+        else:                   positions = [(lax_center, p) for p in range(nr_phases)]
+        folder = os.path.join(path, description)
+        scales = [1.0] + [1 + disagreement*reader_rng.normal() for reader_rng in rngs[1:]]
+        os.makedirs(folder, exist_ok=True)
+        for i, (position, phase) in enumerate(positions):
+            plane  = _Plane(plane_type, image_size, pixel_spacing, position)
+            if plane_type in ['2cv', '4cv']: shapes = heart.lax_shapes(plane_type, phase)
+            else:                            shapes = heart.sax_shapes(position, phase, scar=contrast=='lge')
+            shapes = {n: plane.to_pixels(g) for n, g in shapes.items()}
+            tags.update(InstanceNumber=(phase+1) if plane_type in ['2cv', '4cv'] else i+1,
+                        TriggerTime=round(1000.0*phase/nr_phases, 1))
+            sop = write_dicom(os.path.join(folder, '{:04d}.dcm'.format(i)), render(shapes, image_size, contrast, rng), plane, tags,
+                              ll_tag if ll_tags=='dicom' else None)
+            sop2tag[sop] = 'Lazy Luna: ' + ll_tag
+            nr_images += 1
+            center = plane.to_pixels(Point(0, 0))
+            for r, (anno_path, reader_rng) in enumerate(zip(annos, rngs)):
+                reader = reader_shapes(shapes, scales[r], 0 if r==0 else disagreement/4, reader_rng, pixel_spacing, center)
+                if len(reader)==0: continue
+                with open(os.path.join(anno_path, sop + '.pickle'), 'wb') as f:
+                    pickle.dump(annotation(reader, image_size, pixel_spacing), f)
+                nr_annos += 1
+    if ll_tags=='manifest':
+        from LazyLuna.loading_functions import store_LL_tags_manifest
+        store_LL_tags_manifest(path, sop2tag, study)
+    return {'case_name': case_name, 'study_uid': study, 'nr_images': nr_images, 'nr_annotations': nr_annos}
+
+def write_cohort(path, nr_cases=4, readers=('reader1', 'reader2'), series=SERIES, disagreement=0.05, seed=0, **kwargs):
+    """Writes a synthetic cohort: dicom cases and reader annotations
+
+    Note:
+        The layout is the one expected by LazyLuna.loading_functions.get_imgs_and_annotation_paths and LazyLuna.bulk_converter:
+        path/imgs/<case name>/<series>/*.dcm and path/<reader>/<StudyInstanceUID>/<SOPInstanceUID>.pickle
+
+    Args:
+        path (str):             path to cohort folder (created)
+        nr_cases (int):         number of cases
+        readers (list of str):  reader names, the first annotates the true shapes
+        series (list of str):   LL tags of the series to write (see SERIES)
+        disagreement (float):   deviation of the further readers (see reader_shapes)
+        seed (int):             random seed, case i uses seed+i
+        kwargs:                 further arguments of write_case (nr_slices, nr_phases, image_size, pixel_spacing, ll_tags)
+
+    Returns:
+        dict: imgs_path (str), reader_paths (list of str), cases (list of dict, see write_case)
+    """
+    imgs_path    = os.path.join(path, 'imgs')
+    reader_paths = [os.path.join(path, r) for r in readers]
+    cases = [write_case(os.path.join(imgs_path, 'case_{:03d}'.format(i)), reader_paths, 'case_{:03d}'.format(i), series,
+                        disagreement, seed=seed+i, **kwargs) for i in range(nr_cases)]
+    return {'imgs_path': imgs_path, 'reader_paths': reader_paths, 'cases': cases}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Writes a synthetic cohort of dicom cases and reader annotations.')
+    parser.add_argument('path', help='cohort folder (imgs/ and one folder per reader)')
+    parser.add_argument('-n', '--cases',  type=int, default=4, help='number of cases (default: %(default)s)')
+    parser.add_argument('--readers',      nargs='+', default=['reader1', 'reader2'], help='reader names (default: %(default)s)')
+    parser.add_argument('--series',       nargs='+', default=list(SERIES), choices=list(SERIES), metavar='LL_TAG', help='series (default: all)')
+    parser.add_argument('--disagreement', type=float, default=0.05, help='reader disagreement (default: %(default)s)')
+    parser.add_argument('--slices',       type=int, default=10,  help='short axis slices (default: %(default)s)')
+    parser.add_argument('--phases',       type=int, default=20,  help='cine phases (default: %(default)s)')
+    parser.add_argument('--size',         type=int, default=128, help='image rows and columns (default: %(default)s)')
+    parser.add_argument('--seed',         type=int, default=0)
+    parser.add_argument('--ll-tags',      default='dicom', choices=['dicom', 'manifest', 'none'], help='where to store LL tags (default: %(default)s)')
+    args = parser.parse_args(argv)
+    info = write_cohort(args.path, args.cases, args.readers, args.series, args.disagreement, args.seed, nr_slices=args.slices,
+                        nr_phases=args.phases, image_size=args.size, ll_tags=None if args.ll_tags=='none' else args.ll_tags)
+    print('Wrote {} cases with {} images and {} annotations to {}'.format(len(info['cases']), sum(c['nr_images'] for c in info['cases']),
+          sum(c['nr_annotations'] for c in info['cases']), args.path))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import os
+import json
+import threading
+
+
+####################
+# LL Tag Manifests #
+####################
+
+# A manifest is a json file in a dicom folder mapping SOPInstanceUIDs to LL tags.
+# It replaces rewriting every dicom file with the private LL tag (0x000b, 0x0010).
+MANIFEST_NAME = '.LL_tags.json'
+
+
+class LL_Tag_Manifest:
+    """LL_Tag_Manifest is a sidecar file mapping SOPInstanceUIDs to LL tags for a dicom folder
+
+    Args:
+        folder (str): path to dicom folder in which the manifest is stored
+
+    Attributes:
+        path (str):             path to manifest file
+        study_uid (str):        StudyInstanceUID of the dicoms in folder (None if unknown)
+        tags (dict of str:str): mapping of SOPInstanceUID to LL tag (like 'Lazy Luna: SAX CINE')
+    """
+    def __init__(self, folder):
+        self.path      = os.path.join(folder, MANIFEST_NAME)
+        self.study_uid = None
+        self.tags      = dict()
+        if os.path.exists(self.path): self.load()
+
+    def load(self):
+        with open(self.path, 'r') as f: d = json.load(f)
+        self.study_uid = d.get('StudyInstanceUID')
+        self.tags      = d.get('tags', dict())
+
+    def store(self):
+        """Writes the manifest atomically (temporary file and replace)"""
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f: json.dump({'StudyInstanceUID': self.study_uid, 'tags': self.tags}, f)
+        os.replace(tmp, self.path)
+        _clear_cache()
+
+    def set_tags(self, sop2tag, study_uid=None):
+        """Updates tags and stores the manifest
+
+        Args:
+            sop2tag (dict of str:str): mapping of SOPInstanceUID to LL tag
+            study_uid (str):           StudyInstanceUID (optional)
+        """
+        self.tags.update(sop2tag)
+        if study_uid is not None: self.study_uid = study_uid
+        self.store()
+
+
+_tags_by_dir = dict()
+_cache_lock  = threading.Lock()
+
+def _clear_cache():
+    with _cache_lock: _tags_by_dir.clear()
+
+def _manifest_mtime(folder):
+    try:    return os.stat(os.path.join(folder, MANIFEST_NAME)).st_mtime_ns
+    except OSError: return None
+
+def _manifest_folders(folder):
+    folders = [folder]
+    while os.path.dirname(folders[-1])!=folders[-1]: folders.append(os.path.dirname(folders[-1]))
+    return folders
+
+def get_manifest_tags(dcm_path):
+    """Returns the tags of the manifests in the dicom file's folder and its parent folders
+
+    Note:
+        Manifests are merged, for a SOPInstanceUID in several manifests the one nearest to the dicom file wins
+
+    Args:
+        dcm_path (str): path to dicom file
+
+    Returns:
+        dict of str:str: mapping of SOPInstanceUID to LL tag (empty if no manifest exists)
+    """
+    folder = os.path.dirname(os.path.abspath(str(dcm_path)))
+    mtimes = [(f, _manifest_mtime(f)) for f in _manifest_folders(folder)]
+    with _cache_lock:
+        if folder in _tags_by_dir and _tags_by_dir[folder][0]==mtimes: return _tags_by_dir[folder][1]
+    tags = dict()
+    for f, mtime in reversed(mtimes):
+        if mtime is None: continue
+        try:    tags.update(LL_Tag_Manifest(f).tags)
+        except Exception as e: print('Failed reading LL tag manifest: ', f, e)
+    with _cache_lock: _tags_by_dir[folder] = (mtimes, tags)
+    return tags
+
+def get_manifest_tag(dcm_path, sop, default=None):
+    """Returns the manifest LL tag of a SOPInstanceUID or default"""
+    return get_manifest_tags(dcm_path).get(sop, default)
@@ -0,0 +1,196 @@
+import os
+import sys
+import traceback
+import multiprocessing
+from time import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+
+##############
+# Task Graph #
+##############
+
+# Exports (View.store_information) are declared as graphs of tasks: tables, figures and the report are nodes, edges are data dependencies.
+# Tasks run in worker processes with headless matplotlib, the exported objects (view, case comparisons, folder) are handed to
+# every worker once as Export_Context (inherited by forking where available) and referenced by the tasks through Ref.
+
+class Export_Context:
+    """Export_Context holds the objects an export works on
+
+    Args:
+        view (LazyLuna.Views.View):                                  the view of the export
+        ccs (list of LazyLuna.Containers.Case_Comparison):           the case comparisons
+        path (str):                                                  the export folder
+    """
+    def __init__(self, view, ccs, path):
+        self.view, self.ccs, self.path = view, ccs, path
+
+    @property
+    def cases1(self): return [cc.case1 for cc in self.ccs]
+
+    @property
+    def cases2(self): return [cc.case2 for cc in self.ccs]
+
+
+class Ref:
+    """Ref is a placeholder for an attribute of the Export_Context (view, ccs, cases1, cases2, path) in task arguments"""
+    def __init__(self, name): self.name = name
+    def __repr__(self): return 'Ref('+self.name+')'
+
+def resolve(args, context, obj=None):
+    """Replaces Refs in args by the attributes of context, or of obj for other names (e.g. the 'canvas' of a figure)"""
+    return [(getattr(context, a.name) if hasattr(context, a.name) else getattr(obj, a.name)) if isinstance(a, Ref) else a for a in args]
+
+
+class Task:
+    """Task is a node of a Task_Graph
+
+    Args:
+        name (str):              unique name, the result is handed to dependent tasks as keyword argument of this name
+        function (function):     module level function called as function(context, *args, **kwargs, **dependency results)
+        args (tuple), kwargs (dict): further arguments, must be picklable (use Ref for the exported objects)
+        deps (list of str):      names of the tasks whose results are needed
+        local (bool):            if True runs in the main process (e.g. for the report, or for shared intermediates computed once)
+    """
+    def __init__(self, name, function, args=(), kwargs=None, deps=(), local=False):
+        self.name, self.function, self.args, self.kwargs = name, function, tuple(args), dict(kwargs or {})
+        self.deps, self.local = list(deps), local
+
+# worker process state
+_CONTEXT = None
+
+def _init_worker(context):
+    global _CONTEXT
+    _CONTEXT = context
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+def _run_task(function, args, kwargs, context=None):
+    # returns (result, error traceback, start, end, process id), failed tasks have result None
+    st = time()
+    try:    result, error = function(_CONTEXT if context is None else context, *args, **kwargs), None
+    except Exception as e: result, error = None, traceback.format_exc()
+    return result, error, st, time(), os.getpid()
+
+
+class Task_Graph:
+    """Task_Graph runs tasks in the order of their dependencies, independent tasks in parallel worker processes
+
+    Note:
+        Tasks are started in the order they were added whenever their dependencies are done. Local tasks run in the main process
+        before further tasks are handed to the workers, so shared intermediates are computed once. Their results are pickled
+        to every task that depends on them.
+        Failed tasks print their traceback and hand None to their dependents.
+
+    Attributes:
+        tasks (OrderedDict of str: Task): the tasks by name
+        timings (OrderedDict of str: dict): per task: start, end (seconds since the start of run), seconds, pid, failed
+    """
+    def __init__(self):
+        self.tasks   = OrderedDict()
+        self.timings = OrderedDict()
+
+    def add(self, name, function, *args, deps=(), local=False, **kwargs):
+        """Adds a task (see Task), returns its name"""
+        if name in self.tasks: raise ValueError('Task '+name+' exists already')
+        self.tasks[name] = Task(name, function, args, kwargs, deps, local)
+        return name
+
+    def run(self, context, workers=None, debug=False):
+        """Runs all tasks
+
+        Args:
+            context (Export_Context): the objects of the export
+            workers (int):            number of worker processes, defaults to os.cpu_count(), 1 runs all tasks in this process
+            debug (bool):             if True prints the timings
+
+        Returns:
+            dict of str: object: results by task name
+        """
+        workers = os.cpu_count() if workers is None else workers
+        for t in self.tasks.values():
+            for d in t.deps:
+                if d not in self.tasks: raise ValueError('Task '+t.name+' depends on unknown task '+d)
+        st, results, pending, running, ex = time(), dict(), list(self.tasks.values()), dict(), None
+        self.timings = OrderedDict()
+        try:
+            while len(pending)>0 or len(running)>0:
+                ready = [t for t in pending if all(d in results for d in t.deps)]
+                local = [t for t in ready if t.local or workers<=1]
+                if len(local)>0:
+                    t = local[0]
+                    pending.remove(t)
+                    self._done(t, _run_task(t.function, t.args, self._kwargs(t, results), context), results, st)
+                    continue
+                for t in ready:
+                    if ex is None: ex = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context(), initializer=_init_worker, initargs=(context,))
+                    pending.remove(t)
+                    running[ex.submit(_run_task, t.function, t.args, self._kwargs(t, results))] = t
+                if len(running)==0: raise ValueError('Tasks with cyclic dependencies: '+', '.join(t.name for t in pending))
+                done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for f in done:
+                    t = running.pop(f)
+                    try:    outcome = f.result()
+                    except Exception as e: outcome = (None, traceback.format_exc(), time(), time(), None)
+                    self._done(t, outcome, results, st)
+        finally:
+            if ex is not None: ex.shutdown()
+        if debug: print(self.report())
+        return results
+
+    def _kwargs(self, task, results):
+        kwargs = dict(task.kwargs)
+        for d in task.deps: kwargs[d] = results[d]
+        return kwargs
+
+    def _done(self, task, outcome, results, st):
+        result, error, start, end, pid = outcome
+        if error is not None: print('Task ' + task.name + ' failed:\n' + error)
+        results[task.name] = result
+        self.timings[task.name] = {'start': start-st, 'end': end-st, 'seconds': end-start, 'pid': pid, 'failed': error is not None}
+
+    def report(self):
+        """Returns the timings as string, one line per task"""
+        lines = ['{:<32} {:8.2f} s  (from {:7.2f} s, pid {}){}'.format(n, t['seconds'], t['start'], t['pid'], ' FAILED' if t['failed'] else '')
+                 for n, t in self.timings.items()]
+        if len(self.timings)>0: lines.append('{:<32} {:8.2f} s'.format('Total', max(t['end'] for t in self.timings.values())))
+        return '\n'.join(lines)
+
+def _qt_application_running():
+    qtcore = sys.modules.get('PyQt5.QtCore')
+    return qtcore is not None and qtcore.QCoreApplication.instance() is not None
+
+def _mp_context():
+    # forked workers inherit the Export_Context (with the cases' memoized clinical results), other workers receive a pickled copy
+    # once. Dependency results are pickled to every task in either case. A Qt application runs threads (exports run in a QThread,
+    # see CCs_Overview_Tab), forking it can deadlock the workers: its workers are started by a fork server or spawned.
+    methods = multiprocessing.get_all_start_methods()
+    if 'fork' in methods and not _qt_application_running(): return multiprocessing.get_context('fork')
+    if 'forkserver' in methods: return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+################
+# Export Tasks #
+################
+
+def cohort_results_task(context):
+    """Evaluates the clinical results of the export's case comparisons (LazyLuna.cohort_results.Cohort_Results)"""
+    from LazyLuna.cohort_results import Cohort_Results
+    return Cohort_Results(context.ccs)
+
+def store_table(context, table_class, filename, *args, **kwargs):
+    """Calculates a table with args and kwargs and stores it as filename in the export folder, returns the file path"""
+    table = table_class()
+    table.calculate(*resolve(args, context), **kwargs)
+    path = os.path.join(context.path, filename)
+    table.store(path)
+    return path
+
+def store_figure(context, figure_class, *args, set_values=None, **kwargs):
+    """Visualizes a figure with args and kwargs (after set_values(*set_values) if given) and stores it in the export folder, returns the file path"""
+    figure = figure_class()
+    if set_values is not None: figure.set_values(*resolve(set_values, context, figure))
+    figure.visualize(*resolve(args, context), **kwargs)
+    return figure.store(context.path)
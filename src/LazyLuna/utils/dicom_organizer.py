@@ -7,7 +7,8 @@ from operator import getitem
 
 import numpy as np
 
-from LazyLuna.loading_functions import add_LL_tag
+from LazyLuna.loading_functions import store_LL_tags_manifest, materialize_LL_tags
+from LazyLuna.header_index import get_header_index, get_headers
 
 
 def get_values_from_nested_dict(d):
@@ -34,12 +35,8 @@ class Dicom_Organizer:
             
     def get_anno_folder_path(self):
         if self.reader_folder_path is None: return None
-        for p in Path(self.dcm_folder_path).glob('**/*.dcm'):
-            try:
-                dcm = pydicom.dcmread(str(p), stop_before_pixels=True)
-                study_uid = dcm.StudyInstanceUID
-                break
-            except: continue
+        for h in get_headers(self.dcm_folder_path):
+            if h['StudyInstanceUID'] is not None: study_uid = h['StudyInstanceUID']; break
         return os.path.join(self.reader_folder_path, study_uid)
     
     def load_images_and_annos(self):
@@ -52,14 +49,11 @@ class Dicom_Organizer:
         # GET DCMS
         self.dcms = dict()
         self.has_annotations = dict()
-        for p in Path(self.dcm_folder_path).glob('**/*.dcm'):
+        for dcm in get_headers(self.dcm_folder_path):
             try:
-                # LOAD DCM
-                p = str(p)
-                dcm   = pydicom.dcmread(p, stop_before_pixels=True)
-                # GET RELEVANT KEYS
-                try:    lltag = str(dcm[0x0b, 0x10].value).replace('Lazy Luna: ', '')
-                except: lltag = 'None'
+                # GET RELEVANT KEYS FROM HEADER INDEX
+                p = dcm.path
+                lltag = dcm.LL_tag.replace('Lazy Luna: ', '')
                 seriessdescr = dcm.SeriesDescription
                 series_uid   = dcm.SeriesInstanceUID
                 # INITIATE KEYS IN DICT IN MISSING
@@ -141,7 +135,7 @@ class Dicom_Organizer:
         old_sections, new_sections = [], []
         for p, ol, nl in zip(dcm_paths, old_lltags, new_lltags):
             if ol==nl: continue
-            dcm = pydicom.dcmread(p, stop_before_pixels=True)
+            dcm = get_header_index(self.dcm_folder_path).get(p)
             seriesdescr = dcm.SeriesDescription
             series_uid  = dcm.SeriesInstanceUID
             # remove from old key's list
@@ -175,7 +169,7 @@ class Dicom_Organizer:
         paths = self.get_paths_from_section(origin_key)
         lltag = destination_key[0]
         for i_p, p in enumerate(paths):
-            dcm = pydicom.dcmread(p, stop_before_pixels=True)
+            dcm = get_header_index(self.dcm_folder_path).get(p)
             seriesdescr = dcm.SeriesDescription
             series_uid  = dcm.SeriesInstanceUID
             self.dcms[lltag][seriesdescr][series_uid].append(p)
@@ -229,17 +223,19 @@ class Dicom_Organizer:
             lltag2paths[key[0]] = lltag2paths[key[0]].union(set(paths))
         return lltag2paths
         
-    def store_dicoms_with_tags(self):
+    def store_dicoms_with_tags(self, materialize=False):
+        """Stores changed LL tags in the folder's LL tag manifest, with materialize=True also in the dicom files"""
         new_lltag2pathset = self.get_lltag_to_path_set()
         all_keys = set(new_lltag2pathset.keys()).union(self.original_lltag2pathset.keys())
         for k in all_keys:
             if k not in new_lltag2pathset:           new_lltag2pathset[k]           = set()
             if k not in self.original_lltag2pathset: self.original_lltag2pathset[k] = set()
+        sop2tag, index = dict(), get_header_index(self.dcm_folder_path)
         for lltag in all_keys:
             paths = new_lltag2pathset[lltag].difference(self.original_lltag2pathset[lltag])
-            for p in paths:
-                dcm = pydicom.dcmread(p, stop_before_pixels=False)
-                add_LL_tag(p, dcm, lltag)
+            for p in paths: sop2tag[index.get(p).SOPInstanceUID] = lltag
+        if len(sop2tag)>0: store_LL_tags_manifest(self.dcm_folder_path, sop2tag)
+        if materialize: materialize_LL_tags(self.dcm_folder_path)
         
     def make_section_ifnotexists(self, key):
         if len(key)>0 and key[0] not in self.dcms.keys():                 self.dcms[key[0]] = dict()
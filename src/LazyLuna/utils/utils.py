@@ -1,18 +1,14 @@
+import hashlib
 from time import time
 
 import numpy as np
-from scipy.ndimage import morphology
+import shapely
 from shapely.geometry import Polygon, MultiPolygon, LineString, GeometryCollection, Point, MultiPoint, shape
-from skimage.measure import find_contours
 from rasterio import features
 
-from PIL import Image, ImageDraw
-from matplotlib.patches import PathPatch
-import matplotlib
-import matplotlib.pyplot as plt
+from LazyLuna.caches import MASK_CACHE, pack_mask, unpack_mask
 
-from PyQt5.QtWidgets import QMainWindow, QApplication
-from matplotlib.backends import backend_qt as mpl_backend
+# scipy, matplotlib and PyQt5 are imported by the functions that use them, the analysis core imports without them
 
 
 ##################
@@ -47,6 +43,30 @@ def to_mask(polygons, height, width):
     else: mask = np.zeros((height, width), np.uint8)
     return mask
 
+def to_mask_cached(geo, height, width, sop=None, cont_name=None):
+    """Convert to mask through the process-wide mask cache (see to_mask)
+    
+    Note:
+        Masks are kept as packed bits in LazyLuna.caches.MASK_CACHE, keyed by sop, cont_name, height, width and a digest of the geometry's wkb
+        (fixed size keys, the cache budget counts the masks only). 
+        Every call returns a new array.
+    
+    Args:
+        geo (shapely.geometry. Polygon | Multipolygon): geometry to be burned into mask
+        height (int):    output mask height
+        width (int):     output mask width
+        sop (str):       (optional) SOPInstanceUID of the image the geometry belongs to
+        cont_name (str): (optional) contour name
+        
+    Returns:
+        ndarray (2D array of np.uint8): binarized mask of polygon
+    """
+    if isinstance(geo, list): return to_mask(geo, height, width)
+    key  = (sop, cont_name, int(height), int(width), hashlib.blake2b(geo.wkb, digest_size=16).digest())
+    bits = MASK_CACHE.get(key)
+    if bits is None: bits = MASK_CACHE.put(key, pack_mask(to_mask(geo, height, width)))
+    return unpack_mask(bits, height, width)
+
 
 
 def to_polygon(mask):
@@ -92,6 +112,44 @@ def dice(geo1, geo2):
     overlap = geo1.intersection(geo2)
     return 100.0 * (2*overlap.area) / (geo1.area + geo2.area)
 
+def dice_batch(geos1, geos2):
+    """Calculates Dice metric values for arrays of geometry pairs with shapely's vectorized operations
+    
+    Note:
+        Same values as dice for every pair. If both geometries are empty the value is 100, pairs that cannot be intersected get np.nan
+    
+    Args:
+        geos1 (array of shapely.geometry): first geometries
+        geos2 (array of shapely.geometry): second geometries, same length as geos1
+        
+    Returns:
+        ndarray (1D array of float): Dice values in [0, 100]%
+    """
+    geos1, geos2 = geometry_array(geos1), geometry_array(geos2)
+    areas   = shapely.area(geos1) + shapely.area(geos2)
+    overlap = intersection_areas(geos1, geos2)
+    with np.errstate(divide='ignore', invalid='ignore'): m = 100.0 * (2*overlap) / areas
+    m[areas==0] = np.nan
+    m[shapely.is_empty(geos1) & shapely.is_empty(geos2)] = 100.0
+    return m
+
+def intersection_areas(geos1, geos2):
+    """Calculates intersection areas for arrays of geometry pairs, pairs that cannot be intersected get np.nan"""
+    geos1, geos2 = geometry_array(geos1), geometry_array(geos2)
+    try: return shapely.area(shapely.intersection(geos1, geos2))
+    except shapely.errors.GEOSException:
+        areas = np.full(len(geos1), np.nan)
+        for i, (g1, g2) in enumerate(zip(geos1, geos2)):
+            try: areas[i] = g1.intersection(g2).area
+            except shapely.errors.GEOSException: pass
+        return areas
+
+def geometry_array(geos):
+    """Returns geometries as 1D object array (as required by shapely's vectorized operations)"""
+    arr = np.empty(len(geos), dtype=object)
+    arr[:] = list(geos)
+    return arr
+
 def hausdorff(geo1, geo2):
     """Calculates Hausdorff distance
     
@@ -110,6 +168,135 @@ def hausdorff(geo1, geo2):
     if geo1.is_empty and geo2.is_empty: return 0.0
     return geo1.hausdorff_distance(geo2)
 
+def hausdorff_batch(geos1, geos2, step=2.0):
+    """Calculates Hausdorff distances for arrays of geometry pairs
+    
+    Note:
+        Equals hausdorff per pair (up to floating point precision), see surface_distances_batch. 
+        Pairs with few vertices are passed to GEOS directly.
+    
+    Args:
+        geos1 (array of shapely.geometry): first geometries, like Polygons and Multipolygons
+        geos2 (array of shapely.geometry): second geometries, same length as geos1
+        step (float):                      maximal distance between boundary samples for candidate search (in pixels), does not affect results
+        
+    Returns:
+        ndarray: HD per pair
+    """
+    return _surface_distances(geos1, geos2, step, None)[0]
+
+def surface_distances_batch(geos1, geos2, step=0.5, percentile=95):
+    """Calculates Hausdorff distances, percentile Hausdorff distances and average symmetric surface distances for arrays of geometry pairs
+    
+    Note:
+        Distances are measured between the boundaries of the geometries, as by shapely's hausdorff_distance.
+        - HD equals hausdorff (up to floating point precision): distances from the vertices of one geometry to the boundary segments of the other 
+          are computed exactly for the few vertices that a KD-tree query on boundary samples cannot rule out
+        - percentile HD and ASD are distributions over the boundary length of both geometries (ASD is the mean distance). They are
+          calculated between boundary samples weighted by the boundary length they represent. Samples are at most step/2 from any boundary point 
+          they represent and from the closest point of the other boundary, so ASD and percentile HD deviate at most step from their exact values
+        - if both geometries are empty: 0, if only one is empty: np.nan, non-polygonal geometries get HD only (by GEOS)
+        - all pairs are queried in one KD-tree, pairs are shifted apart so that nearest neighbours always belong to the same pair
+    
+    Args:
+        geos1 (array of shapely.geometry): first geometries, like Polygons and Multipolygons
+        geos2 (array of shapely.geometry): second geometries, same length as geos1
+        step (float):                      maximal distance between boundary samples (in pixels)
+        percentile (float):                percentile of the surface distances (95 for HD95)
+        
+    Returns:
+        (ndarray, ndarray, ndarray): HD, percentile HD, ASD per pair
+    """
+    return _surface_distances(geos1, geos2, step, percentile)
+
+def _surface_distances(geos1, geos2, step, percentile, direct_below=20000):
+    geos1, geos2 = geometry_array(geos1), geometry_array(geos2)
+    n = len(geos1)
+    hd, hdp, asd = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+    empty1, empty2 = shapely.is_empty(geos1), shapely.is_empty(geos2)
+    hd[empty1 & empty2], hdp[empty1 & empty2], asd[empty1 & empty2] = 0.0, 0.0, 0.0
+    polygonal = np.isin(shapely.get_type_id(geos1), [3, 6]) & np.isin(shapely.get_type_id(geos2), [3, 6])
+    todo = np.where(~empty1 & ~empty2 & polygonal)[0]
+    # GEOS compares all vertices with all segments, which is faster for pairs with few vertices
+    direct = ~empty1 & ~empty2 & ~polygonal
+    direct[todo] = shapely.get_num_coordinates(geos1[todo]) * shapely.get_num_coordinates(geos2[todo]) < direct_below
+    hd[direct] = shapely.hausdorff_distance(geos1[direct], geos2[direct])
+    if percentile is None: todo = todo[~direct[todo]]
+    if len(todo)==0: return hd, hdp, asd
+    b1, b2 = _boundaries(geos1[todo], step), _boundaries(geos2[todo], step)
+    # pairs are shifted apart in x, so that nearest neighbours always belong to the same pair
+    offset = 3 * np.ptp(np.vstack([b1['vertices'], b2['vertices']]), axis=0).max() + 1.0
+    def shifted(points, pair): return points + np.stack([pair*offset, np.zeros(len(pair))], axis=1)
+    from scipy.spatial import cKDTree
+    tree1 = cKDTree(shifted(b1['samples'], b1['sample_pair']))
+    tree2 = cKDTree(shifted(b2['samples'], b2['sample_pair']))
+    u12 = tree2.query(shifted(b1['vertices'], b1['vertex_pair']))[0]
+    u21 = tree1.query(shifted(b2['vertices'], b2['vertex_pair']))[0]
+    hd[todo] = np.maximum(_directed_hausdorff(b1, u12, b2, len(todo)), _directed_hausdorff(b2, u21, b1, len(todo)))
+    if percentile is None: return hd, hdp, asd
+    d    = np.concatenate([tree2.query(shifted(b1['samples'], b1['sample_pair']))[0],
+                           tree1.query(shifted(b2['samples'], b2['sample_pair']))[0]])
+    pair = np.concatenate([b1['sample_pair'],   b2['sample_pair']])
+    w    = np.concatenate([b1['sample_weight'], b2['sample_weight']])
+    total     = np.bincount(pair, weights=w, minlength=len(todo))
+    asd[todo] = np.bincount(pair, weights=w*d, minlength=len(todo)) / total
+    # smallest distance at which the boundary length with smaller distances reaches the percentile
+    order  = np.lexsort((d, pair))
+    d, cum = d[order], np.cumsum(w[order])
+    counts = np.bincount(pair, minlength=len(todo))
+    before = np.concatenate([[0], cum[np.cumsum(counts)-1]])[:-1]
+    first  = np.cumsum(counts) - counts
+    idx    = np.searchsorted(cum, before + percentile/100 * total * (1-1e-12))
+    hdp[todo] = d[np.clip(idx, first, first+counts-1)]
+    return hd, hdp, asd
+
+def _boundaries(geos, step):
+    """Returns vertices, segments and samples (at most step apart, weighted by boundary length) of the rings of (Multi)Polygons, with the index of their geometry (pair)"""
+    parts,  part_idx  = shapely.get_parts(geos, return_index=True)
+    rings,  ring_idx  = shapely.get_rings(parts, return_index=True)
+    coords, coord_idx = shapely.get_coordinates(rings, return_index=True)
+    pair = part_idx[ring_idx[coord_idx]]
+    same = coord_idx[1:]==coord_idx[:-1]
+    starts, ends, seg_pair = coords[:-1][same], coords[1:][same], pair[:-1][same]
+    # segments are split into pieces of at most step length, samples are the pieces' midpoints
+    length = np.linalg.norm(ends-starts, axis=1)
+    n      = np.maximum(np.ceil(length / step).astype(int), 1)
+    seg    = np.repeat(np.arange(len(starts)), n)
+    t      = (np.arange(n.sum()) - np.repeat(np.cumsum(n)-n, n) + 0.5) / np.repeat(n, n)
+    return {'vertices': coords, 'vertex_pair': pair, 'starts': starts, 'ends': ends, 'segment_pair': seg_pair,
+            'samples': starts[seg] + t[:,None] * (ends-starts)[seg], 'sample_pair': seg_pair[seg], 'sample_weight': (length/n)[seg]}
+
+def _directed_hausdorff(b1, upper, b2, n):
+    """Exact maximal distances (per pair) of the vertices of b1 to the segments of b2, upper are upper bounds of the vertices' distances"""
+    # the exact distance of the vertex with the largest upper bound is a lower bound of the maximum, 
+    # only vertices with larger upper bounds are candidates
+    pair  = b1['vertex_pair']
+    order = np.lexsort((upper, pair))
+    top   = order[np.cumsum(np.bincount(pair, minlength=n)) - 1]
+    best  = _min_segment_distances(b1['vertices'][top], pair[top], b2, n)
+    cand  = np.where(upper > best[pair] - 1e-9)[0]
+    np.maximum.at(best, pair[cand], _min_segment_distances(b1['vertices'][cand], pair[cand], b2, n))
+    return best
+
+def _min_segment_distances(points, pair, b, n, chunk=2**21):
+    """Returns distances of points to the closest segment of the same pair"""
+    seg_count = np.bincount(b['segment_pair'], minlength=n)
+    seg_first = np.cumsum(seg_count) - seg_count
+    dists = np.empty(len(points))
+    ends  = np.cumsum(seg_count[pair])
+    p = 0
+    while p < len(points):
+        q = max(p+1, np.searchsorted(ends, ends[p-1]+chunk if p>0 else chunk, side='right'))
+        counts = seg_count[pair[p:q]]
+        pt  = np.repeat(np.arange(p, q), counts)
+        sg  = np.arange(counts.sum()) - np.repeat(np.cumsum(counts)-counts, counts) + np.repeat(seg_first[pair[p:q]], counts)
+        a, ab = b['starts'][sg], b['ends'][sg] - b['starts'][sg]
+        ap    = points[pt] - a
+        denom = np.einsum('ij,ij->i', ab, ab)
+        t     = np.clip(np.einsum('ij,ij->i', ap, ab) / np.where(denom==0, 1, denom), 0, 1)
+        dists[p:q] = np.minimum.reduceat(np.linalg.norm(ap - t[:,None]*ab, axis=1), np.cumsum(counts)-counts)
+        p = q
+    return dists
 
 #######################
 # geometry operations #
@@ -137,6 +324,45 @@ def get_geometry_comparison(geo1, geo2):
     diff2 = get_geometry_diff2(geo1, geo2)
     return overlapping, diff1, diff2
 
+#####################
+# segment functions #
+#####################
+def angles_to_point(rows, cols, x, y):
+    """Returns angles of pixels around a point (counterclockwise in degrees in [0, 360), 0 pointing along the image columns)
+    
+    Note:
+        rows and cols broadcast, e.g. np.arange(h)[:,None] and np.arange(w)[None,:] for an angle image
+    
+    Args:
+        rows (ndarray of int): pixel rows
+        cols (ndarray of int): pixel columns
+        x, y (float, float):   point (column, row)
+        
+    Returns:
+        ndarray of float: angles
+    """
+    return np.degrees(np.arctan2(y - rows, cols - x)) % 360
+
+def segment_stats(values, labels, nr_bins):
+    """Returns means, standard deviations and counts of values by segment label in one pass
+    
+    Args:
+        values (ndarray of float): values, like pixel values
+        labels (ndarray of int):   segment label per value, labels outside [0, nr_bins) are ignored
+        nr_bins (int):             number of segments
+        
+    Returns:
+        (ndarray, ndarray, ndarray): means, stds (np.nan for empty segments) and counts per segment
+    """
+    values, labels = np.asarray(values, dtype=np.float64).ravel(), np.asarray(labels).ravel()
+    valid  = (labels>=0) & (labels<nr_bins)
+    values, labels = values[valid], labels[valid].astype(np.intp)
+    counts = np.bincount(labels, minlength=nr_bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.bincount(labels, weights=values, minlength=nr_bins) / counts
+        stds  = np.sqrt(np.bincount(labels, weights=(values-means[labels])**2, minlength=nr_bins) / counts)
+    return means, stds, counts
+
 
 
 #####################
@@ -144,9 +370,13 @@ def get_geometry_comparison(geo1, geo2):
 #####################
 
 def PolygonPatch_Outline(polygon, c=(1,1,1,1.0), alpha=1.0):
+    import matplotlib.path
+    from matplotlib.patches import PathPatch
     return PathPatch(matplotlib.path.Path.make_compound_path(matplotlib.path.Path(np.asarray(polygon.exterior.coords)[:,:2]), *[matplotlib.path.Path(np.asarray(ring.coords)[:,:2]) for ring in polygon.interiors]), ec=c, alpha=alpha, fill=False)
 
 def PolygonPatch(polygon, c=None, alpha=1.0):
+    import matplotlib.path
+    from matplotlib.patches import PathPatch
     return PathPatch(matplotlib.path.Path.make_compound_path(
         matplotlib.path.Path(np.asarray(polygon.exterior.coords)[:, :2]),
         *[matplotlib.path.Path(np.asarray(ring.coords)[:, :2]) for ring in polygon.interiors]
@@ -253,6 +483,8 @@ def sort_dcms(dcms):
 
 def findMainWindow():
     # Global function to find the (open) QMainWindow in application
+    from PyQt5.QtWidgets import QMainWindow, QApplication
+    from matplotlib.backends import backend_qt as mpl_backend
     app = QApplication.instance()
     for widget in app.topLevelWidgets():
         if isinstance(widget, QMainWindow) and not isinstance(widget, mpl_backend.MainWindow): 
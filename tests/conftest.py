@@ -0,0 +1,10 @@
+import pytest
+
+from LazyLuna.synthetic import SERIES, write_cohort
+
+
+@pytest.fixture(scope='session')
+def cohort(tmp_path_factory):
+    """A small synthetic cohort (2 cases, 2 readers) with SAX CINE, LAX CINE 2CV/4CV and SAX T1 PRE series"""
+    series = {k: SERIES[k] for k in ['SAX CINE', 'LAX CINE 2CV', 'LAX CINE 4CV', 'SAX T1 PRE']}
+    return write_cohort(str(tmp_path_factory.mktemp('cohort')), nr_cases=2, series=series, nr_slices=6, nr_phases=8)
@@ -0,0 +1,45 @@
+import os
+import pickle
+
+from shapely import affinity
+
+from LazyLuna.synthetic import SERIES, write_case
+from LazyLuna.Containers import Case
+from LazyLuna.Views import get_view_classes
+
+
+def _lvedv(case):
+    return [cr for cr in case.crs if cr.name=='LVEDV'][0].get_val()
+
+def _scale_annotations(case, ll_tag, factor, center=(64, 64)):
+    sops = set(case.all_imgs_sop2filepath[ll_tag]) & set(case.annos_sop2filepath)
+    for sop in sops:
+        path = case.annos_sop2filepath[sop]
+        with open(path, 'rb') as f: anno = pickle.load(f)
+        for a in anno.values(): a['cont'] = affinity.scale(a['cont'], factor, factor, origin=center)
+        with open(path, 'wb') as f: pickle.dump(anno, f)
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+def _case(tmp_path, views):
+    imgs_path, reader_path = str(tmp_path/'imgs'), str(tmp_path/'reader')
+    info  = write_case(imgs_path, [reader_path], 'case', series={k: SERIES[k] for k in ['SAX CINE', 'SAX CS']},
+                       nr_slices=6, nr_phases=8)
+    case  = Case(imgs_path, os.path.join(reader_path, info['study_uid']), 'case', 'reader')
+    case.anno_check_interval = 0
+    for v in views: case = v.initialize_case(case)
+    return case
+
+
+def test_annotation_change_invalidates_categories_of_other_views(tmp_path):
+    cine, cs = [v() for v in get_view_classes(['SAX_CINE_View', 'SAX_CS_View'])]
+    case = _case(tmp_path, [cine, cs])
+    case = cs.customize_case(case)
+    before = _lvedv(case)
+    case = cine.customize_case(case)
+    _scale_annotations(case, 'SAX CS', 1.2)
+    case.get_annotation_generation()
+    case = cs.customize_case(case)
+    fresh = cs.customize_case(cs.initialize_case(Case(case.imgs_path, case.annos_path, 'case', 'reader')))
+    assert abs(_lvedv(case) - _lvedv(fresh)) < 1e-6
+    assert _lvedv(case) > 1.2 * before
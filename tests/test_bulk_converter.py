@@ -0,0 +1,20 @@
+import os
+import multiprocessing
+
+from LazyLuna import header_index
+from LazyLuna.bulk_converter import get_conversion_jobs, convert_cases, read_ledger, LEDGER_NAME
+
+
+def _nr_indexes(): return len(header_index._indexes)
+
+def test_forked_children_start_without_header_indexes(cohort):
+    for j in get_conversion_jobs(cohort['imgs_path'], cohort['reader_paths']): header_index.get_headers(j['imgs_path'])
+    assert len(header_index._indexes)>0
+    with multiprocessing.get_context('fork').Pool(1) as pool: assert pool.apply(_nr_indexes)==0
+
+def test_convert_cases_in_pool(cohort, tmp_path):
+    records = convert_cases(cohort['imgs_path'], cohort['reader_paths'], str(tmp_path), workers=2, view_names=['SAX_CINE_View'])
+    assert sorted(r['status'] for r in records)==['converted']*4
+    assert len(read_ledger(os.path.join(str(tmp_path), LEDGER_NAME)))==4
+    # resumes from the ledger
+    assert convert_cases(cohort['imgs_path'], cohort['reader_paths'], str(tmp_path), workers=2)==[]
@@ -0,0 +1,38 @@
+import os
+import pickle
+
+from LazyLuna import case_storage
+from LazyLuna.case_catalog import get_case_catalog, CATALOG_NAME
+from LazyLuna.Containers import Case
+from LazyLuna.Views import get_view_classes
+
+
+def _case(cohort, i, views):
+    info = cohort['cases'][i]
+    case = Case(os.path.join(cohort['imgs_path'], info['case_name']), os.path.join(cohort['reader_paths'][0], info['study_uid']),
+                info['case_name'], 'reader1')
+    for v in get_view_classes(views): case = v().initialize_case(case)
+    return case
+
+def test_catalog_update_adds_changed_and_removes(cohort, tmp_path):
+    folder  = str(tmp_path)
+    catalog = get_case_catalog(folder)
+    stored  = _case(cohort, 0, ['SAX_CINE_View']).store(folder)
+    assert os.path.exists(os.path.join(folder, CATALOG_NAME))
+    # stored cases are cataloged without loading them again
+    assert catalog.update()==0 and [e['path'] for e in catalog.entries()]==[stored]
+    # new: a legacy pickle copied into the folder
+    legacy = os.path.join(folder, 'legacy_LL_case.pickle')
+    with open(legacy, 'wb') as f: pickle.dump(_case(cohort, 1, ['SAX_CINE_View']), f)
+    assert catalog.update()==1
+    entries = {e['path']:e for e in catalog.entries(update=False)}
+    assert set(entries)=={stored, legacy} and entries[legacy]['case_name']==cohort['cases'][1]['case_name']
+    # changed: the case file rewritten with another view type
+    case_storage.write_case(_case(cohort, 0, ['SAX_CINE_View', 'LAX_CINE_View']), stored)
+    st = os.stat(stored)
+    os.utime(stored, ns=(st.st_atime_ns, st.st_mtime_ns+10**9))
+    assert catalog.update()==1
+    assert {e['path']:e for e in catalog.entries(update=False)}[stored]['types']==['LAX CINE', 'SAX CINE']
+    # removed
+    os.remove(legacy)
+    assert catalog.update()==0 and [e['path'] for e in catalog.entries()]==[stored]
@@ -0,0 +1,55 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from LazyLuna import case_storage
+from LazyLuna.Containers import Case, load_case
+from LazyLuna.Views import get_view_classes
+
+
+def _values(case):
+    return [cr.get_val() for cr in case.crs]
+
+@pytest.fixture
+def case(cohort):
+    info = cohort['cases'][0]
+    case = Case(os.path.join(cohort['imgs_path'], info['case_name']), os.path.join(cohort['reader_paths'][0], info['study_uid']),
+                info['case_name'], 'reader1')
+    for v in get_view_classes(['SAX_CINE_View', 'LAX_CINE_View']): case = v().initialize_case(case)
+    return get_view_classes(['SAX_CINE_View'])[0]().customize_case(case)
+
+def test_case_file_sections_are_read_lazily(case, tmp_path):
+    path   = case.store(str(tmp_path))
+    assert path.endswith(case_storage.CASE_SUFFIX) and case_storage.is_case_archive(path)
+    loaded = load_case(path)
+    assert loaded.case_name==case.case_name and loaded.available_types==case.available_types
+    for a in ['headers', 'all_imgs_sop2filepath', 'crs']: assert a not in loaded.__dict__
+    # the current categories are read with their type, the other types stay pending
+    assert isinstance(loaded.__dict__['other_categories'], case_storage.Lazy_Categories)
+    assert loaded.other_categories._pending==set(case.other_categories.keys())-{'SAX CINE'}
+    assert len(loaded.headers)==len(case.headers) and 'all_imgs_sop2filepath' not in loaded.__dict__
+    assert loaded.all_imgs_sop2filepath==case.all_imgs_sop2filepath
+    assert [type(c) for c in loaded.other_categories['LAX CINE']]==[type(c) for c in case.other_categories['LAX CINE']]
+
+def test_clinical_results_reference_stored_categories(case, tmp_path):
+    loaded = load_case(case.store(str(tmp_path)))
+    cats   = loaded.other_categories['SAX CINE']
+    assert loaded.categories is cats
+    for cr in loaded.crs:
+        if hasattr(cr, 'cat'): assert any(cr.cat is c for c in cats)
+        assert cr.case is loaded
+    assert np.allclose(_values(loaded), _values(case), equal_nan=True)
+
+def test_legacy_pickle_is_read(case, tmp_path):
+    path = str(tmp_path/'legacy_LL_case.pickle')
+    with open(path, 'wb') as f: pickle.dump(case, f)
+    assert not case_storage.is_case_archive(path) and case_storage.case_paths(str(tmp_path))==[path]
+    loaded = load_case(path)
+    assert '_lazy_attributes' not in loaded.__dict__ and type(loaded.other_categories) is dict
+    assert np.allclose(_values(loaded), _values(case), equal_nan=True)
+    # a stored legacy case is replaced by its case file
+    os.rename(path, os.path.join(str(tmp_path), case.reader_name+'_'+case.case_name+'_'+case.studyinstanceuid+'_LL_case.pickle'))
+    stored = loaded.store(str(tmp_path))
+    assert case_storage.case_paths(str(tmp_path))==[stored]
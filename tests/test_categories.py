@@ -0,0 +1,29 @@
+import os
+import pickle
+
+import numpy as np
+from shapely.geometry import MultiPoint
+
+from LazyLuna.synthetic import SERIES, write_case, annotation
+from LazyLuna.Containers import Case
+from LazyLuna.Views import get_view_classes
+
+
+def _t1_case(tmp_path):
+    imgs_path, reader_path = str(tmp_path/'imgs'), str(tmp_path/'reader')
+    info = write_case(imgs_path, [reader_path], 'case', series={k: SERIES[k] for k in ['SAX T1 PRE', 'LAX CINE 4CV']},
+                      nr_slices=6, nr_phases=8)
+    return imgs_path, os.path.join(reader_path, info['study_uid'])
+
+def test_orphan_lax_extent_annotation_is_skipped(tmp_path):
+    imgs_path, annos_path = _t1_case(tmp_path)
+    # an lv_extent annotation without image in the case
+    orphan = annotation({'lv_extent': MultiPoint([(40, 50), (80, 50), (60, 110)])}, 128, 2.0)
+    with open(os.path.join(annos_path, '1.2.3.4.5.6.7.8.9.pickle'), 'wb') as f: pickle.dump(orphan, f)
+    view = get_view_classes(['SAX_T1_PRE_View'])[0]()
+    case = view.customize_case(view.initialize_case(Case(imgs_path, annos_path, 'case', 'reader')))
+    assert '1.2.3.4.5.6.7.8.9' in case.annos_sop2filepath
+    cat  = case.categories[0]
+    dists = cat.get_slice_distances_to_extent_points()
+    assert all(sop!='1.2.3.4.5.6.7.8.9' for sop, _, _, _ in cat.lax_sop_fps)
+    assert dists is not None and dists.shape==(cat.nr_slices, 3) and np.isfinite(dists).all()
@@ -0,0 +1,24 @@
+import os
+
+import numpy as np
+import pydicom
+
+from LazyLuna.Containers import Case
+
+
+def test_get_img_raw_values_are_writable_copies(cohort):
+    info = cohort['cases'][0]
+    case = Case(os.path.join(cohort['imgs_path'], info['case_name']), os.path.join(cohort['reader_paths'][0], info['study_uid']),
+                info['case_name'], 'reader1')
+    case.imgs_sop2filepath = case.all_imgs_sop2filepath['SAX CINE']
+    sop  = next(iter(case.imgs_sop2filepath))
+    raw  = pydicom.dcmread(case.imgs_sop2filepath[sop]).pixel_array
+    for _ in range(2): # uncached and cached
+        img = case.get_img(sop, value_normalize=False, window_normalize=False)
+        assert img.dtype==raw.dtype and img.flags.writeable and np.array_equal(img, raw)
+        img[:] = 0
+        windowed = case.get_img(sop, value_normalize=False)
+        assert windowed.dtype==np.float32 and windowed.flags.writeable
+        windowed[:] = 0
+        normalized = case.get_img(sop)
+        assert normalized.dtype==np.float32 and not normalized.flags.writeable
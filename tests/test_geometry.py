@@ -0,0 +1,44 @@
+import numpy as np
+import pydicom
+
+from LazyLuna import geometry
+from LazyLuna.utils import transform_ics_to_rcs
+
+
+def _header(rows=40, columns=96, spacing=(1.5, 2.0)):
+    # oblique non-square plane
+    row_dir = np.array([0.8, 0.6, 0.0])
+    col_dir = np.array([0.0, 0.6, -0.8]); col_dir = col_dir - (col_dir @ row_dir) * row_dir; col_dir /= np.linalg.norm(col_dir)
+    ds = pydicom.Dataset()
+    ds.ImagePositionPatient, ds.ImageOrientationPatient = [-30.0, 12.5, 40.0], list(row_dir) + list(col_dir)
+    ds.PixelSpacing, ds.Rows, ds.Columns = list(spacing), rows, columns
+    return ds
+
+def _pixel_centers(header):
+    # all pixel centers as (row, column) in patient coordinates, the meshgrid before distance_to_image
+    rows, cols = np.meshgrid(np.arange(header.Rows), np.arange(header.Columns), indexing='ij')
+    return transform_ics_to_rcs(header, np.stack((rows.ravel(), cols.ravel())).T)
+
+def test_image_to_patient_equals_transform_ics_to_rcs():
+    header = _header()
+    points = np.array([[0, 0], [39, 0], [0, 95], [12.5, 70.25]])
+    assert np.allclose(geometry.image_to_patient(header, points), transform_ics_to_rcs(header, points))
+
+def test_distance_to_image_on_non_square_plane():
+    header  = _header()
+    centers = _pixel_centers(header)
+    rng     = np.random.default_rng(0)
+    points  = geometry.image_to_patient(header, rng.uniform(-40, 140, size=(50, 2))) + rng.normal(scale=20, size=(50, 3))
+    exact   = np.array([np.linalg.norm(centers - p, axis=1).min() for p in points])
+    # the bounded plane is continuous, pixel centers are at most half a pixel diagonal apart from it
+    dists   = geometry.distance_to_image(points, header)
+    assert (dists <= exact + 1e-9).all() and (exact - dists <= np.hypot(*header.PixelSpacing)/2 + 1e-9).all()
+
+def test_distance_to_image_differs_from_swapped_meshgrid():
+    # before distance_to_image, pixel indices were passed as (column, row), covering a transposed rectangle on non-square images
+    header  = _header()
+    cols, rows = np.meshgrid(np.arange(header.Columns), np.arange(header.Rows))
+    swapped = transform_ics_to_rcs(header, np.stack((cols.ravel(), rows.ravel())).T)
+    point   = geometry.image_to_patient(header, [[20, 90]])[0]
+    assert geometry.distance_to_image(point, header) < 1e-9
+    assert np.linalg.norm(swapped - point, axis=1).min() > 10
@@ -0,0 +1,58 @@
+import os
+import glob
+
+import pytest
+import pydicom
+
+from LazyLuna import header_index
+from LazyLuna.header_index import Header_Index, get_headers, default_index_path, INDEX_NAME
+from LazyLuna.loading_functions import get_study_uid, get_imgs_and_annotation_paths
+from LazyLuna.synthetic import SERIES, write_case
+
+
+@pytest.fixture
+def case_path(tmp_path):
+    path = str(tmp_path/'case')
+    info = write_case(path, [str(tmp_path/'reader')], 'case', series={'SAX CINE': SERIES['SAX CINE']}, nr_slices=3, nr_phases=4)
+    return path, info
+
+def test_listing_cases_does_not_index(case_path, tmp_path):
+    path, info = case_path
+    assert get_study_uid(path)==info['study_uid']
+    assert get_imgs_and_annotation_paths(str(tmp_path), str(tmp_path/'reader'))[0][1].endswith(info['study_uid'])
+    assert glob.glob(os.path.join(str(tmp_path), '**', INDEX_NAME), recursive=True)==[]
+
+def test_index_dir(case_path, tmp_path, monkeypatch):
+    path, info = case_path
+    monkeypatch.setattr(header_index, 'INDEX_DIR', str(tmp_path/'indexes'))
+    index = Header_Index(path)
+    assert index.index_path==default_index_path(path) and index.index_path.startswith(str(tmp_path/'indexes'))
+    assert len(index.headers())==info['nr_images']
+    assert not os.path.exists(os.path.join(path, INDEX_NAME))
+    index.close()
+
+def test_changed_files_are_read_again(case_path, tmp_path):
+    path, info = case_path
+    index = Header_Index(path, index_path=str(tmp_path/'index.sqlite'))
+    assert index.update()==info['nr_images'] and index.update()==0
+    paths = sorted(glob.glob(os.path.join(path, '**', '*.dcm'), recursive=True))
+    dcm   = pydicom.dcmread(paths[0])
+    dcm.SeriesDescription = 'changed'
+    st    = os.stat(paths[0])
+    dcm.save_as(paths[0])
+    os.utime(paths[0], ns=(st.st_atime_ns, st.st_mtime_ns+10**9))
+    os.remove(paths[1])
+    assert index.update()==1
+    headers = {h['path']:h for h in index.headers(update=False)}
+    assert len(headers)==info['nr_images']-1 and paths[1] not in headers
+    assert headers[paths[0]]['SeriesDescription']=='changed' and index.get(paths[0])['SeriesDescription']=='changed'
+    index.close()
+
+@pytest.mark.skipif(hasattr(os, 'geteuid') and os.geteuid()==0, reason='folders are writable for root')
+def test_read_only_folder_is_indexed_in_memory(case_path):
+    path, info = case_path
+    os.chmod(path, 0o555)
+    try:
+        index = Header_Index(path)
+        assert index.index_path==':memory:' and len(index.headers())==info['nr_images']
+    finally: os.chmod(path, 0o755)
@@ -0,0 +1,86 @@
+import numpy as np
+import shapely
+from shapely.geometry import Polygon, MultiPolygon
+
+from LazyLuna import utils
+from LazyLuna.utils.utils import _surface_distances
+from LazyLuna.Metrics import DiceMetric, HausdorffMetric
+
+
+def _star(rng, n, center, radius):
+    angles = np.sort(rng.uniform(0, 2*np.pi, n))
+    radii  = radius * rng.uniform(0.6, 1.0, n)
+    return Polygon(np.stack([center[0] + radii*np.cos(angles), center[1] + radii*np.sin(angles)], axis=1)).buffer(0)
+
+def _pairs(n=40, vertices=(8, 300), seed=0):
+    # overlapping pairs of star shaped polygons (every fifth a MultiPolygon) of few and many vertices
+    rng, geos1, geos2 = np.random.default_rng(seed), [], []
+    for i in range(n):
+        k = int(rng.integers(*vertices))
+        c = rng.uniform(30, 90, 2)
+        g1, g2 = _star(rng, k, c, rng.uniform(5, 25)), _star(rng, k, c + rng.normal(scale=4, size=2), rng.uniform(5, 25))
+        if i%5==0: g1 = MultiPolygon([g1, _star(rng, 12, c + 60, 5)])
+        geos1.append(g1); geos2.append(g2)
+    return geos1, geos2
+
+def _segments(geo, length=0.02):
+    # midpoints and lengths of the boundary, split into pieces of at most length
+    coords, idx = shapely.get_coordinates(shapely.get_rings(shapely.get_parts(shapely.segmentize(geo, length))), return_index=True)
+    same = idx[1:]==idx[:-1]
+    a, b = coords[:-1][same], coords[1:][same]
+    return (a+b)/2, np.linalg.norm(b-a, axis=1)
+
+def _reference(geo1, geo2, percentile=95):
+    # percentile HD and ASD by dense sampling of both boundaries, exact distances to the other boundary
+    d, w = [], []
+    for g, other in [(geo1, geo2), (geo2, geo1)]:
+        mid, lengths = _segments(g)
+        d.append(shapely.distance(shapely.points(mid), other.boundary)); w.append(lengths)
+    d, w  = np.concatenate(d), np.concatenate(w)
+    order = np.argsort(d)
+    cum   = np.cumsum(w[order])
+    return d[order][np.searchsorted(cum, percentile/100*cum[-1])], (w*d).sum()/w.sum()
+
+
+def test_hausdorff_batch_equals_shapely():
+    geos1, geos2 = _pairs()
+    exact = shapely.hausdorff_distance(utils.geometry_array(geos1), utils.geometry_array(geos2))
+    assert np.allclose(utils.hausdorff_batch(geos1, geos2), exact, rtol=1e-9, atol=1e-9)
+    # all pairs through the KD-tree candidate search
+    assert np.allclose(_surface_distances(geos1, geos2, 2.0, None, direct_below=0)[0], exact, rtol=1e-9, atol=1e-9)
+
+def test_surface_distances_within_step():
+    geos1, geos2 = _pairs(n=15, seed=1)
+    for step in [0.5, 2.0]:
+        hd, hd95, asd = utils.surface_distances_batch(geos1, geos2, step=step)
+        for i, (g1, g2) in enumerate(zip(geos1, geos2)):
+            ref95, ref_asd = _reference(g1, g2)
+            # the reference deviates at most half its sampling length (0.01) from the exact values
+            assert abs(hd95[i] - ref95) <= step + 0.02
+            assert abs(asd[i] - ref_asd) <= step + 0.02
+            assert hd95[i] <= hd[i] + 1e-9
+
+def test_surface_distances_of_empty_and_none_geometries():
+    g, empty = _star(np.random.default_rng(2), 50, (50, 50), 10), Polygon()
+    hd, hd95, asd = utils.surface_distances_batch([empty, g, empty, None, g], [empty, empty, g, g, None])
+    assert (hd[0], hd95[0], asd[0])==(0.0, 0.0, 0.0)
+    assert np.isnan(hd[1:]).all() and np.isnan(hd95[1:]).all() and np.isnan(asd[1:]).all()
+    assert utils.hausdorff_batch([empty], [empty])[0]==0.0
+    assert np.isnan(HausdorffMetric().get_vals([g, None], [empty, g], spacings=[[1, 1], [1, 1]])).all()
+
+def test_dice_batch_equals_get_val():
+    geos1, geos2 = _pairs(seed=3)
+    g, empty = geos1[1], Polygon()
+    geos1 += [empty, g, empty, None]
+    geos2 += [empty, empty, g, g]
+    metric = DiceMetric()
+    per_pair = np.array([metric.get_val(g1, g2) for g1, g2 in zip(geos1, geos2)])
+    batch    = utils.dice_batch(geos1, geos2)
+    assert np.allclose(batch, per_pair, rtol=1e-9, atol=1e-9, equal_nan=True)
+    assert batch[-4]==100.0 and batch[-3]==0.0 and batch[-2]==0.0 and np.isnan(batch[-1])
+    assert np.allclose(metric.get_vals(geos1, geos2), batch, equal_nan=True)
+
+def test_intersection_areas_equal_per_pair():
+    geos1, geos2 = _pairs(seed=4)
+    per_pair = [g1.intersection(g2).area for g1, g2 in zip(geos1, geos2)]
+    assert np.allclose(utils.intersection_areas(geos1, geos2), per_pair, rtol=1e-9, atol=1e-9)
@@ -0,0 +1,44 @@
+import os
+import glob
+
+import pydicom
+
+from LazyLuna.header_index import Header_Index
+from LazyLuna.loading_functions import store_LL_tags_manifest
+from LazyLuna.synthetic import SERIES, write_case
+from LazyLuna.tag_manifest import MANIFEST_NAME, get_manifest_tags
+
+
+def _headers(path, tmp_path):
+    # headers with LL tags as get_headers merges them, on an index outside the case folder
+    index   = Header_Index(path, index_path=str(tmp_path/'index.sqlite'))
+    headers = index.headers()
+    index.close()
+    return {h['SOPInstanceUID']: get_manifest_tags(h['path']).get(h['SOPInstanceUID'], h['LL_tag']) for h in headers}
+
+def test_manifest_round_trip(tmp_path):
+    path = str(tmp_path/'case')
+    info = write_case(path, [str(tmp_path/'reader')], 'case', series={k: SERIES[k] for k in ['SAX CINE', 'LAX CINE 4CV']},
+                      nr_slices=3, nr_phases=4, ll_tags='manifest')
+    tags = _headers(path, tmp_path)
+    assert os.path.exists(os.path.join(path, MANIFEST_NAME)) and len(tags)==info['nr_images']
+    assert set(tags.values())=={'Lazy Luna: SAX CINE', 'Lazy Luna: LAX CINE 4CV'}
+    # dicom files are not touched
+    dcm = pydicom.dcmread(next(os.path.join(r, f) for r, _, fs in os.walk(path) for f in fs if f.endswith('.dcm')))
+    assert (0x0b, 0x10) not in dcm
+
+def test_nested_manifests_are_merged(tmp_path):
+    path = str(tmp_path/'case')
+    write_case(path, [str(tmp_path/'reader')], 'case', series={'SAX CINE': SERIES['SAX CINE']}, nr_slices=3, nr_phases=4,
+               ll_tags='manifest')
+    dcm_path    = sorted(glob.glob(os.path.join(path, '*', '*.dcm')))[0]
+    series_path = os.path.dirname(dcm_path)
+    sop         = pydicom.dcmread(dcm_path, stop_before_pixels=True).SOPInstanceUID
+    # a manifest written in a series folder overrides only its own SOPInstanceUIDs
+    store_LL_tags_manifest(series_path, {sop: 'Lazy Luna: SAX T1 PRE'})
+    tags = get_manifest_tags(dcm_path)
+    assert tags[sop]=='Lazy Luna: SAX T1 PRE'
+    assert len(tags)==len(_headers(path, tmp_path)) and list(tags.values()).count('Lazy Luna: SAX CINE')==len(tags)-1
+    # later changes of the case manifest do not override the series manifest
+    store_LL_tags_manifest(path, {sop: 'Lazy Luna: None', 'other': 'Lazy Luna: None'})
+    assert get_manifest_tags(dcm_path)[sop]=='Lazy Luna: SAX T1 PRE' and 'other' in get_manifest_tags(dcm_path)